@@ -1,6 +1,11 @@
 # src/api/api_client.py
 import requests
+import gzip
 import json
+import logging
+import threading
+import time
+import uuid
 
 
 def make_api_request(url, method="GET", headers=None, data=None, json=None):
@@ -17,11 +22,17 @@ def make_api_request(url, method="GET", headers=None, data=None, json=None):
 
 def get_projects(base_url):
     """
-    Gets all projects from the API.
+    Gets all projects from the API, following the pagination cursor.
     """
     url = f"{base_url}/api/projects"
-    response = make_api_request(url)
-    return response.json()
+    projects = []
+    cursor = None
+    while True:
+        response = make_api_request(url + (f"?cursor={cursor}" if cursor else ""))
+        projects.extend(response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            return projects
 
 
 def create_project(base_url, project_name):
@@ -31,4 +42,87 @@ def create_project(base_url, project_name):
     url = f"{base_url}/api/projects"
     data = {"name": project_name}
     response = make_api_request(url, method="POST", json=data)
-    return response.json()
\ No newline at end of file
+    return response.json()
+
+class RecordingUploader:
+    """
+    Streams a recording to the server as it is made: pass ``add`` as the
+    Recorder's ``on_step``.  Steps are sent in batches of up to
+    ``batch_size`` steps, or whatever arrived within ``max_delay`` seconds,
+    as gzip-compressed NDJSON.  Every batch carries the next sequence
+    number, so a batch whose response was lost is simply resent: the
+    server applies each number once.  Failed sends are retried ``retries``
+    times with exponential backoff; later batches wait in order.
+    ``close`` sends what is left and asks the server to save the test.
+    """
+
+    def __init__(self, base_url, project_id, suite_id, test_id, batch_size=200, max_delay=1.0, retries=5,
+                 backoff=0.5, timeout=10, session_id=None, http=None):
+        self.url = f"{base_url}/api/projects/{project_id}/suites/{suite_id}/tests/{test_id}/record/sessions/" \
+                   f"{session_id or uuid.uuid4().hex}"
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.http = http if http is not None else requests.Session()
+        self.seq = 0
+        self.error = None
+        self._pending = []
+        self._closing = False
+        self._wakeup = threading.Condition()
+        self._sender = threading.Thread(target=self._send_loop, name="recording-uploader", daemon=True)
+        self._sender.start()
+
+    def add(self, step):
+        with self._wakeup:
+            self._pending.append(step)
+            if len(self._pending) >= self.batch_size:
+                self._wakeup.notify()
+
+    def close(self):
+        """Uploads the remaining steps, then finishes the session; returns the server's summary."""
+        with self._wakeup:
+            self._closing = True
+            self._wakeup.notify()
+        self._sender.join()
+        if self.error:
+            raise self.error
+        return self._post(self.url + "/finish", None, {}).json()
+
+    def _send_loop(self):
+        while True:
+            with self._wakeup:
+                if not self._closing and len(self._pending) < self.batch_size:
+                    self._wakeup.wait(self.max_delay)
+                batch, self._pending = self._pending[:self.batch_size], self._pending[self.batch_size:]
+                done = self._closing and not self._pending
+            if batch and not self.error:
+                try:
+                    self._send(batch)
+                except Exception as e:
+                    # Later batches would leave a gap: keep the error for close().
+                    logging.exception(f"Giving up on recording upload batch {self.seq}")
+                    self.error = e
+            if done:
+                return
+
+    def _send(self, batch):
+        body = gzip.compress("".join(json.dumps(step) + "\n" for step in batch).encode())
+        headers = {"Content-Type": "application/x-ndjson", "Content-Encoding": "gzip"}
+        self._post(f"{self.url}/batches/{self.seq}", body, headers)
+        self.seq += 1
+
+    def _post(self, url, body, headers):
+        for attempt in range(self.retries + 1):
+            try:
+                response = self.http.post(url, data=body, headers=headers, timeout=self.timeout)
+                if response.status_code < 500:
+                    response.raise_for_status()
+                    return response
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.retries:
+                    raise
+            if attempt == self.retries:
+                response.raise_for_status()
+            time.sleep(self.backoff * 2 ** attempt)
@@ -1,12 +1,25 @@
+import atexit
+import json
+import os
 import sys
 from pathlib import Path
-from src.ui.app import get_projects
-from flask import Flask, jsonify, request, render_template
-from src.ui.app import get_project, get_suite
+from flask import Flask, Response, g, jsonify, request, render_template, url_for
 import logging
 from functools import wraps
+import time
 import traceback
+import zlib
 from src.utils.project_manager import ProjectManager
+from src.utils.storage import create_storage
+from src.utils.pagination import paginate, paginate_steps, parse_limit, InvalidPageRequest
+from src.utils.response_cache import ResponseCache
+from src.utils.result_cache import ResultCache
+from src.utils.history import RunHistory, InvalidTimeRange, parse_time
+from src.utils.metrics import registry as metrics
+from src.core.runner import Runner, DependencyError, BACKENDS as RUNNER_BACKENDS
+from src.core.jobs import JobManager, JobQueueFull, FINISHED
+from src.core.coordinator import Coordinator, parse_address
+from src.core.ingest import RecordingIngest, SequenceGap, SessionFinished, TooManySessions, UnknownSession
 
 app = Flask(__name__)
 
@@ -14,8 +27,68 @@ app = Flask(__name__)
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 app.logger.setLevel(logging.INFO)
 
-# Initialize project manager
-project_manager = ProjectManager()
+# Initialize project manager; RPA_STORAGE selects the backend (json, journal, sqlite or sharded)
+storage_options = {}
+if os.environ.get('RPA_SAVE_WINDOW'):
+    # Coalesce saves of the JSON store on a background thread
+    storage_options = {'write_behind': True, 'coalesce_window': float(os.environ['RPA_SAVE_WINDOW'])}
+# RPA_RUN_WORKERS and RPA_RUN_BACKEND (thread or process) set the default parallelism of test runs;
+# RPA_RUN_FAIL_FAST=1 stops runs at their first failure by default
+runner = Runner(int(os.environ.get('RPA_RUN_WORKERS', 1)), os.environ.get('RPA_RUN_BACKEND', 'thread'),
+                os.environ.get('RPA_RUN_FAIL_FAST', '0') == '1')
+# RPA_COORDINATOR=HOST:PORT hands runs to worker processes instead (python -m src.core.worker),
+# authenticated with RPA_COORDINATOR_KEY
+if os.environ.get('RPA_COORDINATOR'):
+    runner = Coordinator(parse_address(os.environ['RPA_COORDINATOR']), os.environ['RPA_COORDINATOR_KEY'].encode(),
+                         fail_fast=runner.fail_fast)
+    atexit.register(runner.close)
+# Incremental runs reuse passing results from RPA_RESULT_CACHE for RPA_RESULT_CACHE_TTL seconds
+result_cache = ResultCache(os.environ.get('RPA_RESULT_CACHE', 'result_cache.json'),
+                           float(os.environ.get('RPA_RESULT_CACHE_TTL', 24 * 3600)))
+# Run results are kept per day under RPA_HISTORY_DIR, for RPA_HISTORY_DAYS days if set
+run_history = RunHistory(os.environ.get('RPA_HISTORY_DIR', 'history'),
+                         int(os.environ['RPA_HISTORY_DAYS']) if os.environ.get('RPA_HISTORY_DAYS') else None)
+project_manager = ProjectManager(storage=create_storage(os.environ.get('RPA_STORAGE', 'json'), **storage_options),
+                                 runner=runner, result_cache=result_cache, run_history=run_history)
+# Recordings interrupted by a crash left their event logs in RPA_RECORDING_DIR
+if os.path.isdir(os.environ.get('RPA_RECORDING_DIR', 'recordings')):
+    project_manager.recover_recordings(os.environ.get('RPA_RECORDING_DIR', 'recordings'))
+# Uploaded recordings are logged there too; RPA_UPLOAD_SESSIONS may be open at once, and one
+# that receives nothing for RPA_UPLOAD_IDLE_TIMEOUT seconds is dropped
+recording_ingest = RecordingIngest(project_manager, os.environ.get('RPA_RECORDING_DIR', 'recordings'),
+                                   int(os.environ.get('RPA_UPLOAD_SESSIONS', 1000)),
+                                   float(os.environ.get('RPA_UPLOAD_IDLE_TIMEOUT', 3600)))
+if os.path.isdir(recording_ingest.directory):
+    recording_ingest.resume()
+# Most replays one play request may ask for; each runs on the request thread
+MAX_REPLAY_REPEAT = int(os.environ.get('RPA_MAX_REPLAY_REPEAT', 100))
+# Largest upload batch accepted, in bytes after decompression
+MAX_UPLOAD_BYTES = int(os.environ.get('RPA_UPLOAD_MAX_BYTES', 16 * 1024 * 1024))
+# Runs are queued as jobs; RPA_JOB_WORKERS jobs run at once and RPA_JOB_QUEUE may wait
+job_manager = JobManager(project_manager, workers=int(os.environ.get('RPA_JOB_WORKERS', 1)),
+                         max_queued=int(os.environ.get('RPA_JOB_QUEUE', 100)))
+atexit.register(project_manager.close)
+atexit.register(job_manager.close, timeout=5)
+atexit.register(recording_ingest.close)
+response_cache = ResponseCache()
+
+class InvalidRunRequest(ValueError):
+    pass
+
+# ================= Request Metrics =================
+@app.before_request
+def start_timer():
+    g.request_started = time.perf_counter_ns()
+
+@app.after_request
+def record_request_metrics(response):
+    # Labelled by route template, not path, to keep the number of series bounded.
+    route = request.url_rule.rule if request.url_rule else "unmatched"
+    metrics.inc('rpa_http_requests_total', method=request.method, route=route, status=response.status_code)
+    if 'request_started' in g:
+        metrics.observe('rpa_http_request_duration_seconds', (time.perf_counter_ns() - g.request_started) / 1e9,
+                        method=request.method, route=route)
+    return response
 
 # ================= Helper Decorators =================
 def handle_exceptions(f):
@@ -23,6 +96,8 @@ def handle_exceptions(f):
     def decorated_function(*args, **kwargs):
         try:
             return f(*args, **kwargs)
+        except (InvalidPageRequest, InvalidRunRequest, DependencyError, InvalidTimeRange) as e:
+            return jsonify({'error': str(e)}), 400
         except Exception as e:
             app.logger.error(f"Error in {f.__name__}: {str(e)}\n{traceback.format_exc()}")
             return jsonify({'error': str(e)}), 500
@@ -45,7 +120,7 @@ def validate_suite(f):
         if not project:
             app.logger.warning(f"Project not found: {project_id}")
             return jsonify({'error': 'Project not found'}), 404
-        suite = next((s for s in project.test_suites if s.id == suite_id), None)
+        suite = project_manager.get_test_suite(project_id, suite_id)
         if not suite:
             app.logger.warning(f"Test Suite not found: {suite_id} in project {project_id}")
             return jsonify({'error': 'Test Suite not found'}), 404
@@ -59,11 +134,11 @@ def validate_test(f):
         if not project:
             app.logger.warning(f"Project not found: {project_id}")
             return jsonify({'error': 'Project not found'}), 404
-        suite = next((s for s in project.test_suites if s.id == suite_id), None)
+        suite = project_manager.get_test_suite(project_id, suite_id)
         if not suite:
             app.logger.warning(f"Test Suite not found: {suite_id} in project {project_id}")
             return jsonify({'error': 'Test Suite not found'}), 404
-        test = next((t for t in suite.tests if t.id == test_id), None)
+        test = project_manager.get_test_from_suite(project_id, suite_id, test_id)
         if not test:
             app.logger.warning(f"Test not found: {test_id} in suite {suite_id}, project {project_id}")
             return jsonify({'error': 'Test not found'}), 404
@@ -79,6 +154,63 @@ def require_json(f):
         return f(*args, **kwargs)
     return decorated_function
 
+# ================= Listing Helpers =================
+def summarize_project(project):
+    # Deliberately leaves out suites so lazily loaded projects stay unloaded.
+    return {'id': project.id, 'name': project.name, 'description': project.description}
+
+def summarize_suite(suite):
+    return {'id': suite.id, 'name': suite.name, 'description': suite.description, 'test_count': len(suite.tests)}
+
+def summarize_test(test):
+    return {'id': test.id, 'name': test.name, 'result': test.result, 'step_count': len(test.steps)}
+
+def wants_summary():
+    return request.args.get('view', 'full') == 'summary'
+
+def add_next_link(response, next_cursor):
+    """
+    Lists stay plain JSON arrays; the cursor for the next page travels in the
+    ``X-Next-Cursor`` header and an RFC 8288 ``Link: <...>; rel="next"``.
+    """
+    if next_cursor:
+        args = request.args.to_dict()
+        args['cursor'] = next_cursor
+        next_url = url_for(request.endpoint, **{**args, **request.view_args})
+        response.headers['X-Next-Cursor'] = next_cursor
+        response.headers['Link'] = f'<{next_url}>; rel="next"'
+    return response
+
+def conditional_response(version, build):
+    """
+    Serves a GET whose content is determined by ``version`` (see
+    ProjectManager.version_of).  A matching If-None-Match gets a 304 before
+    anything is serialized; otherwise the JSON bytes for this request and
+    version come from response_cache, so ``build`` runs once per version.
+    ``build`` returns the data, or ``(items, next_cursor)`` for list pages.
+    """
+    key = request.full_path
+    epoch = project_manager.version_epoch
+    etag = f"{epoch}-{version}-{zlib.crc32(key.encode()):08x}"
+    if request.if_none_match.contains_weak(etag):
+        response = app.response_class(status=304)
+    else:
+        body, next_cursor = response_cache.get((epoch, version, key), lambda: render_json(build()))
+        response = add_next_link(app.response_class(body, mimetype='application/json'), next_cursor)
+    response.set_etag(etag)
+    # Let browsers keep the body but always revalidate it.
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def render_json(result):
+    data, next_cursor = result if isinstance(result, tuple) else (result, None)
+    return app.json.response(data).get_data(), next_cursor
+
+def list_page(items):
+    """Applies the limit, cursor, prefix and sort query parameters."""
+    return paginate(items, limit=request.args.get('limit'), cursor=request.args.get('cursor'),
+                    prefix=request.args.get('prefix'), sort=request.args.get('sort'))
+
 # ================= Frontend Routes =================
 @app.route('/')
 @handle_exceptions
@@ -91,7 +223,7 @@ def main():
 @handle_exceptions
 def project_detail(project_id):
     """Render a specific project detail page."""
-    project = get_project(project_id)
+    project = project_manager.get_project(project_id)
     if not project:
         app.logger.warning(f"Project not found for detail page: {project_id}")
         return render_template('error.html', error='Project not found'), 404
@@ -101,21 +233,24 @@ def project_detail(project_id):
 @handle_exceptions
 def suite_detail(project_id, suite_id):
     """Render a specific test suite detail page."""
-    project = ui_get_project(project_id)
+    project = project_manager.get_project(project_id)
     if not project:
         app.logger.warning(f"Project not found for suite detail page: {project_id}")
         return render_template('error.html', error="Project not found"), 404
-    suite = ui_get_suite(project_id, suite_id)
+    suite = project_manager.get_test_suite(project_id, suite_id)
     return render_template('test_suite.html', project=project, suite=suite)
 
 # ================= API Routes =================
 @app.route('/api/projects', methods=['GET'])
 @handle_exceptions
 def get_all_projects():
-    """Get all projects."""
-    """Get all projects."""
-    projects = project_manager.get_all_projects()
-    return jsonify([p.to_dict() for p in projects])
+    """Get a page of projects (see list_page for the query parameters)."""
+    def build():
+        page, next_cursor = list_page(list(project_manager.get_all_projects()))
+        serialize = summarize_project if wants_summary() else project_manager.serialize_project
+        return [serialize(p) for p in page], next_cursor
+    # Any mutation can change a full listing, so lists follow the global version.
+    return conditional_response(project_manager.version, build)
 
 @app.route('/api/projects/<project_id>', methods=['GET'])
 @validate_project
@@ -124,7 +259,9 @@ def get_project(project_id):
     """Get a specific project by ID."""
     """Get a specific project by ID."""
     project = project_manager.get_project(project_id)
-    return jsonify(project.to_dict())
+    with project_manager.reading(project_id):
+        return conditional_response(project_manager.version_of(project_id),
+                                    lambda: summarize_project(project) if wants_summary() else project.to_dict())
 
 @app.route('/api/projects', methods=['POST'])
 @require_json
@@ -137,7 +274,7 @@ def create_project():
         return jsonify({'error': 'Project name is required'}), 400
     new_project = project_manager.create_project(data['name'], data.get('description'))
     app.logger.info(f"Created new project: {new_project.id}")
-    return jsonify(new_project.to_dict()), 201
+    return jsonify(project_manager.serialize_project(new_project)), 201
 
 @app.route('/api/projects/<project_id>', methods=['PUT'])
 @validate_project
@@ -151,7 +288,7 @@ def update_project(project_id):
         return jsonify({'error': 'Project name is required'}), 400
     updated_project = project_manager.update_project(project_id, data['name'])
     app.logger.info(f"Updated project: {project_id}")
-    return jsonify(updated_project.to_dict())
+    return jsonify(project_manager.serialize_project(updated_project))
 
 @app.route('/api/projects/<project_id>', methods=['DELETE'])
 @validate_project
@@ -166,9 +303,14 @@ def delete_project(project_id):
 @validate_project
 @handle_exceptions
 def get_suites(project_id):
-    """Get all test suites for a project."""
+    """Get a page of test suites for a project."""
     project = project_manager.get_project(project_id)
-    return jsonify([s.to_dict() for s in project.test_suites])
+    def build():
+        page, next_cursor = list_page(list(project.test_suites))
+        serialize = summarize_suite if wants_summary() else (lambda s: s.to_dict())
+        return [serialize(s) for s in page], next_cursor
+    with project_manager.reading(project_id):
+        return conditional_response(project_manager.version_of(project_id), build)
 
 @app.route('/api/projects/<project_id>/suites/<suite_id>', methods=['GET'])
 @validate_project
@@ -176,9 +318,10 @@ def get_suites(project_id):
 @handle_exceptions
 def get_suite(project_id, suite_id):
     """Get a specific test suite."""
-    project = project_manager.get_project(project_id)
-    suite = next((s for s in project.test_suites if s.id == suite_id), None)
-    return jsonify(suite.to_dict())
+    suite = project_manager.get_test_suite(project_id, suite_id)
+    with project_manager.reading(project_id):
+        return conditional_response(project_manager.version_of(suite_id),
+                                    lambda: summarize_suite(suite) if wants_summary() else suite.to_dict())
 
 @app.route('/api/projects/<project_id>/suites', methods=['POST'])
 @validate_project
@@ -191,7 +334,8 @@ def create_suite(project_id):
         return jsonify({'error': 'Suite name is required'}), 400
     test_suite = project_manager.create_test_suite(project_id, data['name'])
     app.logger.info(f"Created test suite {test_suite.id} in project {project_id}")
-    return jsonify(test_suite.to_dict()), 201
+    with project_manager.reading(project_id):
+        return jsonify(test_suite.to_dict()), 201
 
 @app.route('/api/projects/<project_id>/suites/<suite_id>', methods=['PUT'])
 @validate_project
@@ -204,7 +348,8 @@ def update_suite(project_id, suite_id):
         return jsonify({'error': 'Suite name is required'}), 400
     updated_suite = project_manager.update_test_suite(project_id, suite_id, data['name'])
     app.logger.info(f"Updated test suite {suite_id} in project {project_id}")
-    return jsonify(updated_suite.to_dict())
+    with project_manager.reading(project_id):
+        return jsonify(updated_suite.to_dict())
 
 @app.route('/api/projects/<project_id>/suites/<suite_id>', methods=['DELETE'])
 @validate_project
@@ -221,10 +366,14 @@ def delete_suite(project_id, suite_id):
 @validate_suite
 @handle_exceptions
 def get_tests(project_id, suite_id):
-    """Get all tests in a test suite."""
-    project = project_manager.get_project(project_id)
-    suite = next((s for s in project.test_suites if s.id == suite_id), None)
-    return jsonify([t.to_dict() for t in suite.tests])
+    """Get a page of tests in a test suite."""
+    suite = project_manager.get_test_suite(project_id, suite_id)
+    def build():
+        page, next_cursor = list_page(list(suite.tests))
+        serialize = summarize_test if wants_summary() else (lambda t: t.to_dict())
+        return [serialize(t) for t in page], next_cursor
+    with project_manager.reading(project_id):
+        return conditional_response(project_manager.version_of(suite_id), build)
 
 @app.route('/api/projects/<project_id>/suites/<suite_id>/tests/<test_id>', methods=['GET'])
 @validate_project
@@ -233,10 +382,9 @@ def get_tests(project_id, suite_id):
 @handle_exceptions
 def get_test(project_id, suite_id, test_id):
     """Get a specific test from a suite."""
-    project = project_manager.get_project(project_id)
-    suite = next((s for s in project.test_suites if s.id == suite_id), None)
-    test = next((t for t in suite.tests if t.id == test_id), None)
-    return jsonify(test.to_dict())
+    test = project_manager.get_test_from_suite(project_id, suite_id, test_id)
+    with project_manager.reading(project_id):
+        return conditional_response(project_manager.version_of(test_id), test.to_dict)
 
 @app.route('/api/projects/<project_id>/suites/<suite_id>/tests', methods=['POST'])
 @validate_project
@@ -244,13 +392,17 @@ def get_test(project_id, suite_id, test_id):
 @require_json
 @handle_exceptions
 def create_test(project_id, suite_id):
-    """Create a new test in a test suite."""
+    """Create a new test in a test suite; optional ``depends_on`` lists tests that must pass first."""
     data = request.get_json()
     if not data or 'name' not in data:
         return jsonify({'error': 'Test name is required'}), 400
-    test = project_manager.create_test(project_id, suite_id, data['name'])
+    depends_on = data.get('depends_on')
+    if depends_on is not None and not (isinstance(depends_on, list) and all(isinstance(d, str) for d in depends_on)):
+        return jsonify({'error': 'depends_on must be a list of test ids'}), 400
+    test = project_manager.create_test(project_id, suite_id, data['name'], depends_on)
     app.logger.info(f"Created test {test.id} in suite {suite_id}")
-    return jsonify(test.to_dict()), 201
+    with project_manager.reading(project_id):
+        return jsonify(test.to_dict()), 201
 
 @app.route('/api/projects/<project_id>/suites/<suite_id>/tests/<test_id>', methods=['PUT'])
 @validate_project
@@ -259,13 +411,17 @@ def create_test(project_id, suite_id):
 @require_json
 @handle_exceptions
 def update_test(project_id, suite_id, test_id):
-    """Update a test."""
+    """Update a test's name and, if given, its ``depends_on`` list."""
     data = request.get_json()
     if not data or 'name' not in data:
         return jsonify({'error': 'Test name is required'}), 400
-    updated_test = project_manager.update_test(project_id, suite_id, test_id, data['name'])
+    depends_on = data.get('depends_on')
+    if depends_on is not None and not (isinstance(depends_on, list) and all(isinstance(d, str) for d in depends_on)):
+        return jsonify({'error': 'depends_on must be a list of test ids'}), 400
+    updated_test = project_manager.update_test(project_id, suite_id, test_id, data['name'], depends_on)
     app.logger.info(f"Updated test {test_id}")
-    return jsonify(updated_test.to_dict())
+    with project_manager.reading(project_id):
+        return jsonify(updated_test.to_dict())
 
 @app.route('/api/projects/<project_id>/suites/<suite_id>/tests/<test_id>', methods=['DELETE'])
 @validate_project
@@ -284,11 +440,11 @@ def delete_test(project_id, suite_id, test_id):
 @validate_test
 @handle_exceptions
 def get_test_steps(project_id, suite_id, test_id):
-    """Get all steps for a specific test."""
-    project = project_manager.get_project(project_id)
-    suite = next((s for s in project.test_suites if s.id == suite_id), None)
-    test = next((t for t in suite.tests if t.id == test_id), None)
-    return jsonify(test.steps)
+    """Get a page of steps for a specific test, in order."""
+    test = project_manager.get_test_from_suite(project_id, suite_id, test_id)
+    with project_manager.reading(project_id):
+        return conditional_response(project_manager.version_of(test_id), lambda: paginate_steps(
+            test.steps, request.args.get('limit'), request.args.get('cursor')))
 
 @app.route('/api/projects/<project_id>/suites/<suite_id>/tests/<test_id>/steps', methods=['POST'])
 @validate_project
@@ -302,11 +458,7 @@ def add_test_step(project_id, suite_id, test_id):
     if not data or 'action' not in data or 'target' not in data:
         return jsonify({'error': 'Action and target are required for a step'}), 400
 
-    project = project_manager.get_project(project_id)
-    suite = next((s for s in project.test_suites if s.id == suite_id), None)
-    test = next((t for t in suite.tests if t.id == test_id), None)
-
-    step = project_manager.add_step_to_test(project_id, suite_id, test_id, data)
+    step = project_manager.add_step(project_id, suite_id, test_id, data)
     app.logger.info(f"Added step to test {test_id}")
     return jsonify(step), 201
 
@@ -322,12 +474,8 @@ def update_test_step(project_id, suite_id, test_id, step_index):
     if not data or 'action' not in data or 'target' not in data:
         return jsonify({'error': 'Action and target are required for a step'}), 400
 
-    project = project_manager.get_project(project_id)
-    suite = next((s for s in project.test_suites if s.id == suite_id), None)
-    test = next((t for t in suite.tests if t.id == test_id), None)
-
     try:
-        updated_step = project_manager.update_step_in_test(project_id, suite_id, test_id, step_index, data)
+        updated_step = project_manager.update_step(project_id, suite_id, test_id, step_index, data)
         app.logger.info(f"Updated step {step_index} in test {test_id}")
         return jsonify(updated_step)
     except IndexError:
@@ -340,7 +488,7 @@ def update_test_step(project_id, suite_id, test_id, step_index):
 @handle_exceptions
 def delete_test_step(project_id, suite_id, test_id, step_index):
     """Delete a step from a test."""
-    project_manager.delete_step_from_test(project_id, suite_id, test_id, step_index)
+    project_manager.delete_step(project_id, suite_id, test_id, step_index)
     app.logger.info(f"Deleted step {step_index} from test {test_id}")
     return jsonify({'message': 'Step deleted successfully'})
 
@@ -390,6 +538,102 @@ def pause_test_recording(project_id, suite_id, test_id):
     app.logger.info(f"Paused recording for test {test_id}")
     return jsonify({'message': 'Recording paused', 'test_id': test_id})
 
+def read_ndjson():
+    """
+    Parses a newline-delimited JSON request body, optionally gzip-encoded,
+    into a list of step dicts.  Returns ``(steps, None)`` or ``(None, error response)``.
+    """
+    body = request.get_data()
+    encoding = request.headers.get('Content-Encoding', 'identity').lower()
+    if encoding == 'gzip':
+        inflater = zlib.decompressobj(wbits=31)
+        try:
+            body = inflater.decompress(body, MAX_UPLOAD_BYTES + 1)
+        except zlib.error:
+            inflater = None
+        if inflater is None or not (inflater.eof or inflater.unconsumed_tail):
+            return None, (jsonify({'error': 'Invalid gzip body'}), 400)
+    elif encoding != 'identity':
+        return None, (jsonify({'error': f'Unsupported Content-Encoding: {encoding}'}), 415)
+    if len(body) > MAX_UPLOAD_BYTES:
+        return None, (jsonify({'error': f'Batch larger than {MAX_UPLOAD_BYTES} bytes'}), 413)
+    steps = []
+    for number, line in enumerate(body.splitlines(), 1):
+        if not line.strip():
+            continue
+        try:
+            step = json.loads(line)
+        except ValueError:
+            return None, (jsonify({'error': f'Line {number} is not valid JSON'}), 400)
+        if not isinstance(step, dict) or not isinstance(step.get('type'), str):
+            return None, (jsonify({'error': f'Line {number} is not a step'}), 400)
+        invalid = invalid_step_field(step)
+        if invalid:
+            return None, (jsonify({'error': f"Line {number}: invalid '{invalid}'"}), 400)
+        steps.append(step)
+    return steps, None
+
+def invalid_step_field(step):
+    """The first of a step's ``time``, ``x``, ``y`` (numbers or null) and ``path`` (a list of numbers) that is not."""
+    is_number = lambda value: isinstance(value, (int, float)) and not isinstance(value, bool)
+    for field in ('time', 'x', 'y'):
+        if step.get(field) is not None and not is_number(step[field]):
+            return field
+    if 'path' in step and not (isinstance(step['path'], list) and all(map(is_number, step['path']))):
+        return 'path'
+    return None
+
+def valid_session_id(session_id):
+    return 0 < len(session_id) <= 64 and all(c.isalnum() or c in '-_' for c in session_id)
+
+@app.route('/api/projects/<project_id>/suites/<suite_id>/tests/<test_id>/record/sessions/<session_id>/batches/<int:seq>',
+           methods=['POST'])
+@validate_project
+@validate_suite
+@validate_test
+@handle_exceptions
+def upload_recording_batch(project_id, suite_id, test_id, session_id, seq):
+    """
+    Appends batch ``seq`` (0, 1, 2, ...) of an uploaded recording: one step
+    per line (application/x-ndjson), optionally with Content-Encoding: gzip.
+    Batch 0 opens the session.  Resending a batch is acknowledged without
+    applying it twice; skipping one answers 409 with the ``expected`` number,
+    as does reusing the id of a finished session.
+    """
+    if not valid_session_id(session_id):
+        return jsonify({'error': 'Invalid session id'}), 400
+    steps, error = read_ndjson()
+    if error:
+        return error
+    try:
+        ack = recording_ingest.append(project_id, suite_id, test_id, session_id, seq, steps)
+    except SequenceGap as e:
+        return jsonify({'error': str(e), 'expected': e.expected}), 409
+    except SessionFinished as e:
+        return jsonify({'error': str(e)}), 409
+    except UnknownSession as e:
+        return jsonify({'error': str(e)}), 404
+    except TooManySessions as e:
+        return jsonify({'error': str(e)}), 503
+    return jsonify(ack)
+
+@app.route('/api/projects/<project_id>/suites/<suite_id>/tests/<test_id>/record/sessions/<session_id>/finish',
+           methods=['POST'])
+@validate_project
+@validate_suite
+@validate_test
+@handle_exceptions
+def finish_recording_upload(project_id, suite_id, test_id, session_id):
+    """Saves an uploaded recording as the test's steps, coalesced like a local recording."""
+    try:
+        result = recording_ingest.finish(project_id, suite_id, test_id, session_id)
+    except SessionFinished as e:
+        return jsonify({'error': str(e)}), 409
+    except UnknownSession as e:
+        return jsonify({'error': str(e)}), 404
+    app.logger.info(f"Saved uploaded recording {session_id} to test {test_id}: {result['steps_recorded']} steps")
+    return jsonify(result)
+
 
 @app.route('/api/projects/<project_id>/suites/<suite_id>/tests/<test_id>/play', methods=['POST'])
 @validate_project
@@ -397,39 +641,67 @@ def pause_test_recording(project_id, suite_id, test_id):
 @validate_test
 @handle_exceptions
 def play_test(project_id, suite_id, test_id):
-    """Play a test."""
-    result = project_manager.play_test(project_id, suite_id, test_id)
+    """
+    Play a test; ?repeat=N replays it N times (e.g. for soak runs, at most
+    MAX_REPLAY_REPEAT) and ?speed=X scales the recorded timing (0 = as fast
+    as possible).  The response carries each replay's actual-vs-recorded timing.
+    """
+    repeat = request.args.get('repeat', 1, type=int)
+    if not 1 <= repeat <= MAX_REPLAY_REPEAT:
+        return jsonify({'error': f'repeat must be between 1 and {MAX_REPLAY_REPEAT}'}), 400
+    speed = request.args.get('speed', type=float)
+    if speed is not None and speed < 0:
+        return jsonify({'error': 'speed must not be negative'}), 400
+    timings = project_manager.play_test(project_id, suite_id, test_id, repeat, speed)
     app.logger.info(f"Played test {test_id}")
     return jsonify({
         'message': 'Test played',
-        'result': 'success' if result else 'failure',
-        'test_id': test_id
+        'result': 'success' if timings is not None else 'failure',
+        'test_id': test_id,
+        'timings': timings
     })
 
+def run_options():
+    """Run settings from the query string or JSON body; unset ones fall back to the runner's."""
+    data = request.get_json(silent=True) or {}
+
+    def flag(name):
+        value = request.args.get(name, data.get(name))
+        if isinstance(value, str):
+            return value.lower() in ('1', 'true', 'yes')
+        return value
+    max_workers = request.args.get('max_workers', data.get('max_workers'))
+    backend = request.args.get('backend', data.get('backend'))
+    if max_workers is not None:
+        try:
+            max_workers = int(max_workers)
+        except (TypeError, ValueError):
+            raise InvalidRunRequest("max_workers must be an integer")
+        if max_workers < 1:
+            raise InvalidRunRequest("max_workers must be positive")
+    if backend is not None and backend not in RUNNER_BACKENDS:
+        raise InvalidRunRequest(f"backend must be one of {', '.join(RUNNER_BACKENDS)}")
+    return {'max_workers': max_workers, 'backend': backend, 'fail_fast': flag('fail_fast'),
+            'incremental': flag('incremental'), 'force': flag('force')}
+
 @app.route('/api/projects/<project_id>/run', methods=['POST'])
 @validate_project
 @handle_exceptions
 def run_all_tests_in_project(project_id):
-    """Run all tests in a project."""
-    results = project_manager.run_all_tests(project_id)
-    app.logger.info(f"Ran all tests for project {project_id}")
-    return jsonify({
-        'message': 'Tests executed',
-        'results': results
-    })
+    """
+    Queue a run of all tests in a project; ?max_workers=N&backend=thread|process runs them in parallel
+    and ?fail_fast=1 skips the remaining tests after the first failure.  ?incremental=1 reuses recent
+    passing results of unchanged tests (marked ``cached``) unless ?force=1.
+    """
+    return submit_job(project_id, **run_options())
 
 @app.route('/api/projects/<project_id>/suites/<suite_id>/run', methods=['POST'])
 @validate_project
 @validate_suite
 @handle_exceptions
 def run_suite_tests(project_id, suite_id):
-    """Run all tests in a specific test suite."""
-    results = project_manager.run_suite_tests(project_id, suite_id)
-    app.logger.info(f"Ran all tests for suite {suite_id}")
-    return jsonify({
-        'message': 'Suite tests executed',
-        'results': results
-    })
+    """Queue a run of all tests in a specific test suite; accepts the same options as a project run."""
+    return submit_job(project_id, suite_id, **run_options())
 
 @app.route('/api/projects/<project_id>/suites/<suite_id>/tests/<test_id>/run', methods=['POST'])
 @validate_project
@@ -437,13 +709,120 @@ def run_suite_tests(project_id, suite_id):
 @validate_test
 @handle_exceptions
 def run_single_test(project_id, suite_id, test_id):
-    """Run a single test."""
-    result = project_manager.run_test(project_id, suite_id, test_id)
-    app.logger.info(f"Ran test {test_id}")
-    return jsonify({
-        'message': 'Test executed',
-        'result': result
-    })
+    """Queue a run of a single test."""
+    return submit_job(project_id, suite_id, test_id)
+
+def submit_job(project_id, suite_id=None, test_id=None, **options):
+    """Queues a run and answers 202 with the job, or 503 when the queue is full."""
+    try:
+        job = job_manager.submit(project_id, suite_id, test_id, **options)
+    except JobQueueFull as e:
+        app.logger.warning(f"Rejected run for project {project_id}: {e}")
+        response = jsonify({'error': 'Too many queued runs, try again later'})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+    status_url = url_for('get_job', job_id=job.id)
+    response = jsonify({'message': 'Run queued', 'job_id': job.id, 'status': job.status, 'status_url': status_url,
+                        'events_url': url_for('stream_job_events', job_id=job.id)})
+    response.headers['Location'] = status_url
+    return response, 202
+
+# ================= Metrics =================
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Step, test, suite, replay and API timings in the Prometheus text format."""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+# ================= History Routes =================
+def time_range():
+    """``?from=&to=`` as epoch seconds or ISO 8601 dates/datetimes (UTC by default)."""
+    start, end = parse_time(request.args.get('from')), parse_time(request.args.get('to'))
+    if start is not None and end is not None and end < start:
+        raise InvalidTimeRange("'to' must not be before 'from'")
+    return start, end
+
+@app.route('/api/projects/<project_id>/history', methods=['GET'])
+@validate_project
+@handle_exceptions
+def get_run_history(project_id):
+    """Recorded test results in ?from=&to=, newest first; ?test_id= narrows it to one test."""
+    start, end = time_range()
+    return jsonify(run_history.runs(project_id, start, end, request.args.get('test_id'),
+                                    parse_limit(request.args.get('limit'))))
+
+@app.route('/api/projects/<project_id>/history/stats', methods=['GET'])
+@validate_project
+@handle_exceptions
+def get_run_history_stats(project_id):
+    """Per-test pass rate, mean/p95 duration and flakiness over ?from=&to=."""
+    start, end = time_range()
+    return jsonify(run_history.stats(project_id, start, end, request.args.get('test_id')))
+
+# ================= Job Routes =================
+@app.route('/api/jobs', methods=['GET'])
+@handle_exceptions
+def get_jobs():
+    """List known run jobs, newest last."""
+    return jsonify([job.to_dict() for job in job_manager.get_all()])
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+@handle_exceptions
+def get_job(job_id):
+    """Get the status, progress and, once finished, the results of a run job."""
+    job = job_manager.get(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/api/jobs/<job_id>/events', methods=['GET'])
+@handle_exceptions
+def stream_job_events(job_id):
+    """
+    Stream a run's progress as Server-Sent Events: run, test and step
+    ``started``/``passed``/``failed`` events with durations, ending with a
+    ``finished`` event.  Reconnecting clients resume via Last-Event-ID.
+    """
+    job = job_manager.get(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    try:
+        after = int(request.headers.get('Last-Event-ID') or 0)
+    except ValueError:
+        after = 0
+    if job.status in FINISHED and not job_manager.events.has_run(job_id):
+        # The event history is gone (e.g. after a restart); report the outcome only.
+        finished = {'id': 1, 'type': 'finished', 'scope': 'run', 'job_id': job.id, 'status': job.status,
+                    'completed': job.completed, 'total': job.total, 'error': job.error}
+        return Response(format_sse(finished), mimetype='text/event-stream')
+    subscription = job_manager.events.subscribe(job_id, after)
+
+    def stream():
+        try:
+            while True:
+                events = subscription.get(timeout=15)
+                for event in events:
+                    yield format_sse(event)
+                if not events:
+                    if subscription.closed:
+                        return
+                    yield ": keep-alive\n\n"
+        finally:
+            subscription.close()
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def format_sse(event):
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+@app.route('/api/jobs/<job_id>', methods=['DELETE'])
+@handle_exceptions
+def cancel_job(job_id):
+    """Cancel a queued or running job."""
+    job = job_manager.cancel(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    app.logger.info(f"Cancel requested for job {job_id}")
+    return jsonify(job.to_dict())
 
 # ================= Status Routes =================
 @app.route('/api/status', methods=['GET'])
@@ -0,0 +1,195 @@
+import math
+
+# Modifier keys as recorded (str(pynput Key)) -> the name used in shortcut steps.
+MODIFIERS = {
+    "Key.ctrl": "ctrl", "Key.ctrl_l": "ctrl", "Key.ctrl_r": "ctrl",
+    "Key.alt": "alt", "Key.alt_l": "alt", "Key.alt_r": "alt", "Key.alt_gr": "alt_gr",
+    "Key.shift": "shift", "Key.shift_l": "shift", "Key.shift_r": "shift",
+    "Key.cmd": "cmd", "Key.cmd_l": "cmd", "Key.cmd_r": "cmd",
+}
+MODIFIER_ORDER = ("ctrl", "alt", "alt_gr", "shift", "cmd")
+# Held while typing, these are already reflected in the recorded character.
+TYPING_MODIFIERS = {"shift", "alt_gr"}
+
+
+def shortcut_keys(key):
+    """The key names of a shortcut step's ``key``, e.g. "ctrl+shift+t" -> ("ctrl", "shift", "t")."""
+    head, _, main = key.rpartition("+")
+    if not main:
+        # The shortcut's own key is "+".
+        head, main = head[:-1], "+"
+    return tuple(head.split("+") if head else ()) + (main,)
+
+
+def _pack(event, base):
+    dt = round(event["time"] - base, 6)
+    if event["type"] == "mouse_click":
+        return [dt, "c", event.get("x"), event.get("y"), event.get("button")]
+    return [dt, "p" if event["type"] == "keyboard_press" else "r", event.get("key")]
+
+
+def _unpack(entry, base):
+    time, kind = base + entry[0], entry[1]
+    if kind == "c":
+        return {"type": "mouse_click", "x": entry[2], "y": entry[3], "button": entry[4], "time": time}
+    return {"type": "keyboard_press" if kind == "p" else "keyboard_release", "key": entry[2], "time": time}
+
+
+def coalesce(steps, max_gap=1.0, double_click_interval=0.5, double_click_distance=4):
+    """
+    Merges recorded key and click events into high-level steps:
+
+    * runs of typed characters become ``{"type": "type_text", "value": "..."}``;
+      a pause over ``max_gap`` seconds starts a new run,
+    * keys pressed while ctrl, alt or cmd is held (or shift, for non-character
+      keys) become ``{"type": "shortcut", "key": "ctrl+shift+t"}``,
+    * two clicks of the same button at most ``double_click_distance`` pixels
+      and ``double_click_interval`` seconds apart become a ``double_click``,
+    * key releases, modifier presses and auto-repeated modifiers are folded
+      into the step they belong to.
+
+    Every merged step keeps the events it replaced in ``raw``, as
+    ``[seconds from its time, "p" | "r" | "c", ...]`` entries, so expand()
+    restores the recording.  Text and double clicks replay in one go, so
+    the time the user spent typing or between the clicks (``saved``) is
+    taken off every later step.  Other steps and untimed steps are kept.
+    """
+    out = []      # [step, raw events, seconds saved, time of its last typed key]
+    pending = []  # modifier presses (and stray releases) not attached to a step yet
+    down = {}     # key -> the entry its press belongs to; None while pending
+    text = click = None
+
+    def add(step, raw):
+        entry = [step, raw, 0.0, None]
+        out.append(entry)
+        return entry
+
+    def attach(entry):
+        for event in pending:
+            if event["type"] == "keyboard_press" and down.get(str(event["key"]), entry) is None:
+                down[str(event["key"])] = entry
+        entry[1].extend(pending)
+        pending.clear()
+
+    def flush():
+        # Pending events that cannot join the next step become steps of their own.
+        events = list(pending)
+        pending.clear()
+        for event in events:
+            key = str(event.get("key"))
+            if event["type"] == "keyboard_press" and key in down and down[key] is None:
+                down[key] = add(event, [event])
+            elif event["type"] == "keyboard_press" and down.get(key):
+                down[key][1].append(event)
+            else:
+                add(event, [event])
+
+    for step in steps:
+        kind = step.get("type")
+        timed = isinstance(step.get("time"), (int, float))
+        if kind == "keyboard_press" and timed:
+            key = str(step.get("key"))
+            if key in MODIFIERS:
+                # A held modifier repeats its press: only the first one counts.
+                if key in down and down[key] is not None:
+                    down[key][1].append(step)
+                else:
+                    if key not in down:
+                        down[key] = None
+                    pending.append(step)
+                continue
+            held = {MODIFIERS[k] for k in down if k in MODIFIERS}
+            char = key if len(key) == 1 else (" " if key == "Key.space" else None)
+            if char and ord(char) < 32 and "ctrl" in held:
+                # Some platforms report ctrl+c as "\x03".
+                char = chr(ord(char) + 96)
+            click = None
+            if char and not held - TYPING_MODIFIERS:
+                if text is None or step["time"] - text[3] > max_gap:
+                    text = add({"type": "type_text", "value": "", "time": step["time"]}, [])
+                text[0]["value"] += char
+                attach(text)
+                text[1].append(step)
+                text[2] = step["time"] - text[0]["time"]
+                text[3] = step["time"]
+                down[key] = text
+                continue
+            text = None
+            if held:
+                name = char.lower() if char and "shift" in held else char or key.partition("Key.")[2] or key
+                mods = [m for m in MODIFIER_ORDER if m in held]
+                entry = add({"type": "shortcut", "key": "+".join(mods + [name]), "time": step["time"]}, [])
+            else:
+                entry = add(step, [])
+            attach(entry)
+            entry[1].append(step)
+            down[key] = entry
+        elif kind == "keyboard_release" and timed:
+            key = str(step.get("key"))
+            if key not in down:
+                # Pressed before the recording started.
+                pending.append(step)
+                continue
+            if down[key] is None:
+                # A modifier tapped on its own.
+                if text is not None and MODIFIERS.get(key) in TYPING_MODIFIERS:
+                    attach(text)
+                else:
+                    text = click = None
+                    flush()
+            down.pop(key)[1].append(step)
+        elif kind == "mouse_click" and timed:
+            text = None
+            flush()
+            if click is not None and click is out[-1] and click[0].get("button") == step.get("button") \
+                    and step["time"] - click[0]["time"] <= double_click_interval \
+                    and math.hypot(step.get("x", 0) - click[0].get("x", 0),
+                                   step.get("y", 0) - click[0].get("y", 0)) <= double_click_distance:
+                click[0] = dict(click[0], type="double_click")
+                click[1].append(step)
+                click[2] = step["time"] - click[0]["time"]
+                click = None
+            else:
+                click = add(step, [step])
+        else:
+            text = click = None
+            flush()
+            add(step, [step])
+    flush()
+
+    coalesced = []
+    shift = 0.0
+    for entry in out:
+        step, raw, saved = entry[:3]
+        if len(raw) == 1 and raw[0] is step:
+            if shift and isinstance(step.get("time"), (int, float)):
+                step = dict(step, time=step["time"] - shift)
+            coalesced.append(step)
+            continue
+        base = step["time"]
+        step = dict(step, time=base - shift, raw=[_pack(event, base) for event in raw])
+        if saved:
+            step["saved"] = round(saved, 6)
+            shift += step["saved"]
+        coalesced.append(step)
+    return coalesced
+
+
+def expand(steps):
+    """Reverses coalesce(): the recorded events, at their recorded times."""
+    events = []
+    shift = 0.0
+    last = 0.0
+    for step in steps:
+        timed = isinstance(step.get("time"), (int, float))
+        if timed:
+            last = step["time"] + shift
+        raw = step.get("raw")
+        if raw is None:
+            events.append((last, len(events), dict(step, time=last) if timed else dict(step)))
+            continue
+        for entry in raw:
+            event = _unpack(entry, last)
+            events.append((event["time"], len(events), event))
+        shift += step.get("saved", 0.0)
+    return [event for _, _, event in sorted(events, key=lambda item: item[:2])]
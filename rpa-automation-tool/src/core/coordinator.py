@@ -0,0 +1,264 @@
+import copy
+import heapq
+import logging
+import os
+import threading
+import uuid
+from collections import Counter, deque
+from multiprocessing.connection import Listener
+from .runner import BACKENDS, Runner, TestResult, dependency_graph, result_events, skipped_result
+
+
+def parse_address(address):
+    """``"host:port"`` -> ``(host, port)``."""
+    host, _, port = address.rpartition(":")
+    return host or "127.0.0.1", int(port)
+
+
+def make_shards(snapshots, count, durations=None):
+    """
+    Splits ``(suite_id, test_data)`` pairs into at most ``count`` shards of
+    snapshot indexes, heaviest first.  Tests connected by dependencies stay
+    in one shard so a worker can run them in order.  Shards are balanced by
+    the tests' known ``durations`` (seconds by test id); tests without one
+    count as the average known duration, so with no history this is a split
+    by test count.
+    """
+    dependencies, _ = dependency_graph(snapshots)
+    parent = list(range(len(snapshots)))
+
+    def root(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+    for i, deps in enumerate(dependencies):
+        for d in deps:
+            parent[root(i)] = root(d)
+    groups = {}
+    for i in range(len(snapshots)):
+        groups.setdefault(root(i), []).append(i)
+
+    durations = durations or {}
+    known = [durations[test_data['id']] for _, test_data in snapshots if test_data['id'] in durations]
+    default = sum(known) / len(known) if known else 1.0
+    weight = lambda i: durations.get(snapshots[i][1]['id'], default)
+    # Longest-processing-time first: each group goes to the lightest shard.
+    bins = [(0.0, n, []) for n in range(max(1, count))]
+    for group in sorted(groups.values(), key=lambda g: -sum(map(weight, g))):
+        total, n, indexes = heapq.heappop(bins)
+        indexes.extend(group)
+        heapq.heappush(bins, (total + sum(map(weight, group)), n, indexes))
+    return [sorted(indexes) for _, _, indexes in sorted(bins, reverse=True) if indexes]
+
+
+class _Run:
+    def __init__(self, snapshots, on_result, emit, fail_fast):
+        self.id = uuid.uuid4().hex
+        self.snapshots = snapshots
+        self.on_result = on_result
+        self.emit = emit
+        self.fail_fast = fail_fast
+        self.results = [None] * len(snapshots)
+        self.positions = {test_data['id']: i for i, (_, test_data) in enumerate(snapshots)}
+        self.open_shards = set()
+        self.failed = None
+        self.cancelled = False
+        self.lock = threading.Lock()
+
+
+class _Shard:
+    def __init__(self, run, indexes):
+        self.run = run
+        self.indexes = indexes
+
+
+class _Worker:
+    def __init__(self, name, conn):
+        self.name = name
+        self.conn = conn
+        self.shard = None
+        self.send_lock = threading.Lock()
+
+    def send(self, message):
+        with self.send_lock:
+            self.conn.send(message)
+
+
+class Coordinator:
+    """
+    Hands test runs out to worker processes (see src/core/worker.py).
+
+    Workers connect over ``multiprocessing.connection`` (TCP, authenticated
+    with ``authkey``), so they can run on this machine or another one.  A
+    run is split into ``shards`` by make_shards; each idle worker is sent the
+    next shard and streams back one result per test, and the run returns
+    once every shard is done.  Durations of finished tests are remembered
+    to balance later runs.  A worker that disconnects mid-shard has the
+    tests it did not finish queued again for the others.
+
+    It has the interface of Runner, so a ProjectManager can be created with
+    ``runner=Coordinator(...)``.  Step events are not streamed live: each
+    test's events are emitted when its result arrives.
+    """
+
+    backend = "distributed"
+
+    def __init__(self, address=("127.0.0.1", 0), authkey=None, shards=8, fail_fast=False):
+        self.authkey = authkey if authkey is not None else os.urandom(16)
+        self.shards = shards
+        self.fail_fast = fail_fast
+        self.durations = {}
+        self.completed = Counter()
+        self._queue = deque()
+        self._workers = []
+        self._cond = threading.Condition()
+        self._closed = False
+        self._listener = Listener(address, authkey=self.authkey)
+        self.address = self._listener.address
+        threading.Thread(target=self._accept, name="coordinator", daemon=True).start()
+        logging.info(f"Coordinator listening on {self.address[0]}:{self.address[1]}")
+
+    @property
+    def max_workers(self):
+        with self._cond:
+            return len(self._workers)
+
+    def with_options(self, max_workers=None, backend=None, fail_fast=None):
+        """A local Runner if ``backend`` names one, else this coordinator with ``fail_fast`` applied."""
+        if backend in BACKENDS:
+            return Runner(max_workers or 1, backend, self.fail_fast if fail_fast is None else fail_fast)
+        coordinator = copy.copy(self)
+        if fail_fast is not None:
+            coordinator.fail_fast = fail_fast
+        return coordinator
+
+    def run_snapshots(self, snapshots, on_result=None, should_stop=None, emit=None):
+        """Same contract as Runner.run_snapshots, with the tests run by the workers."""
+        if not snapshots:
+            return []
+        run = _Run(snapshots, on_result, emit, self.fail_fast)
+        with self._cond:
+            if not self._workers:
+                logging.warning("No workers connected; the run waits for one")
+            for indexes in make_shards(snapshots, self.shards, self.durations):
+                shard = _Shard(run, indexes)
+                run.open_shards.add(shard)
+                self._queue.append(shard)
+            self._cond.notify_all()
+        while True:
+            with self._cond:
+                if not run.open_shards:
+                    break
+                self._cond.wait(0.2)
+            if not run.cancelled and (run.fail_fast and run.failed or should_stop and should_stop()):
+                self._cancel(run)
+        if run.fail_fast and run.failed:
+            reason = f"Fail-fast after {run.failed!r} failed"
+            for i, (suite_id, test_data) in enumerate(snapshots):
+                if run.results[i] is None:
+                    self._collect(run, skipped_result(test_data, suite_id, reason))
+        return [result for result in run.results if result is not None]
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._listener.close()
+
+    def _cancel(self, run):
+        # Drops the run's queued shards and asks workers to stop its running ones.
+        with self._cond:
+            run.cancelled = True
+            for shard in [shard for shard in self._queue if shard.run is run]:
+                self._queue.remove(shard)
+                run.open_shards.discard(shard)
+            busy = [worker for worker in self._workers if worker.shard is not None and worker.shard.run is run]
+            self._cond.notify_all()
+        for worker in busy:
+            try:
+                worker.send({'type': 'cancel', 'run': run.id})
+            except OSError:
+                pass
+
+    def _collect(self, run, result):
+        with run.lock:
+            i = run.positions.get(result.test_id)
+            if i is None or run.results[i] is not None:
+                return
+            run.results[i] = result
+            if result.result not in ("Passed", "Skipped"):
+                run.failed = run.failed or result.name
+            if result.result != "Skipped":
+                self.durations[result.test_id] = result.duration
+            if run.emit:
+                for event in result_events(result):
+                    run.emit(event)
+            if run.on_result:
+                run.on_result(result)
+
+    def _accept(self):
+        while True:
+            try:
+                conn = self._listener.accept()
+            except OSError:
+                if self._closed:
+                    return
+                logging.exception("Rejected a worker connection")
+                continue
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _next_shard(self, worker):
+        with self._cond:
+            while not self._queue and not self._closed:
+                self._cond.wait()
+            if self._closed:
+                return None
+            worker.shard = self._queue.popleft()
+            return worker.shard
+
+    def _finish_shard(self, worker):
+        with self._cond:
+            worker.shard.run.open_shards.discard(worker.shard)
+            worker.shard = None
+            self._cond.notify_all()
+
+    def _serve(self, conn):
+        worker = None
+        try:
+            hello = conn.recv()
+            worker = _Worker(hello.get('name') or f"worker-{id(conn)}", conn)
+            with self._cond:
+                self._workers.append(worker)
+            logging.info(f"Worker {worker.name} connected")
+            while (shard := self._next_shard(worker)) is not None:
+                run = shard.run
+                worker.send({'type': 'shard', 'run': run.id, 'fail_fast': run.fail_fast,
+                             'tests': [run.snapshots[i] for i in shard.indexes]})
+                while (message := conn.recv())['type'] == 'result':
+                    self._collect(run, TestResult.from_dict(message['result']))
+                self.completed[worker.name] += 1
+                self._finish_shard(worker)
+            worker.send({'type': 'stop'})
+        except (EOFError, OSError):
+            logging.warning(f"Worker {worker.name if worker else 'connection'} was lost")
+        finally:
+            if worker is not None:
+                self._drop(worker)
+            conn.close()
+
+    def _drop(self, worker):
+        with self._cond:
+            if worker in self._workers:
+                self._workers.remove(worker)
+            shard = worker.shard
+            if shard is None:
+                return
+            worker.shard = None
+            shard.run.open_shards.discard(shard)
+            unfinished = [i for i in shard.indexes if shard.run.results[i] is None]
+            if unfinished and not shard.run.cancelled:
+                retry = _Shard(shard.run, unfinished)
+                shard.run.open_shards.add(retry)
+                self._queue.appendleft(retry)
+            self._cond.notify_all()
@@ -0,0 +1,286 @@
+import json
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from .coalesce import coalesce as coalesce_steps
+
+MAGIC = b"RPAREC\x00\x01"
+VERSION = 1
+# magic, version, record size, session start (epoch seconds), padding: one record wide.
+HEADER = struct.Struct("<8sHHd12x")
+# kind, flags, name id, extra (path point ms), x, y, time (seconds into the recording).
+RECORD = struct.Struct("<BBHIddd")
+# kind, flags (length of this chunk | MORE), name id, up to 28 bytes of UTF-8 text.
+TEXT = struct.Struct("<BBH28s")
+
+NAME, META, STEP, CLICK, PRESS, RELEASE, PATH = range(1, 8)
+MORE = 0x80    # TEXT flag: the text continues in the next record
+FIRST = 0x01   # PATH flag: first point of a mouse_path step
+CLOSED = 8     # trailer written by EventLog.close once the session is complete
+BATCH = 9      # end of an uploaded batch: its number (extra) and the steps logged so far (x)
+
+
+class EventLog:
+    """
+    Crash-safe, append-only log of one recording session.
+
+    Every recorded step is written as one or more 32-byte records as it
+    arrives (a mouse_path step as one record per point), so a session on
+    disk costs a fixed amount per event and nothing on the heap.  Button
+    and key names are written once as TEXT records and referenced by id;
+    other steps, and any step with fields a record cannot hold exactly,
+    are stored as JSON text.  Writes go straight to the file, which is
+    fsynced at most every ``sync_interval`` seconds and on close.
+    A torn last record from a crash is ignored when reading (see
+    iter_steps and recover).  A session closed once complete ends with a
+    CLOSED record, so recovery can tell it from an interrupted one.
+
+    Steps appended with a ``batch`` number end with a BATCH record.  With
+    ``reopen`` an existing log is opened for appending again, cut back to
+    its last complete batch; ``last_batch`` is then that batch's
+    ``(number, steps so far)``, or None.
+    """
+
+    def __init__(self, path, sync_interval=1.0, reopen=False):
+        self.path = path
+        self.sync_interval = sync_interval
+        self.last_batch = None
+        self._names = {None: 0}
+        self._lock = threading.Lock()
+        if reopen:
+            self._file = open(path, "r+b", buffering=0)
+            self._resume()
+        else:
+            self._file = open(path, "xb", buffering=0)
+            self._file.write(HEADER.pack(MAGIC, VERSION, RECORD.size, time.time()))
+        self._synced = time.monotonic()
+
+    def write_meta(self, **meta):
+        """Stores session details, e.g. the id and name of the test being recorded."""
+        with self._lock:
+            self._write(_text(META, 0, json.dumps(meta)))
+
+    def append(self, step):
+        self.extend([step])
+
+    def extend(self, steps, batch=None):
+        """Appends ``steps`` in one write, followed by a BATCH record if ``batch`` (a number) is given."""
+        chunks = []
+        names = {}  # names first used by these steps, kept only once they are written
+        for step in steps:
+            self._encode(step, chunks, names)
+        last_batch = self.last_batch
+        if batch is not None:
+            last_batch = (batch, (last_batch[1] if last_batch else 0) + len(steps))
+            chunks.append(RECORD.pack(BATCH, 0, 0, batch, last_batch[1], 0, time.time()))
+        with self._lock:
+            self._write(b"".join(chunks))
+            self._names.update(names)
+            self.last_batch = last_batch
+
+    def _encode(self, step, chunks, names):
+        # Steps that do not fit a fixed-width record exactly are stored as JSON.
+        kind = step.get("type")
+        if kind == "mouse_click" and _fits(step, CLICK_FIELDS) and _is_number(step["x"]) and _is_number(step["y"]):
+            chunks.append(RECORD.pack(CLICK, 0, self._name(step["button"], chunks, names), 0,
+                                      step["x"], step["y"], step["time"]))
+        elif kind in ("keyboard_press", "keyboard_release") and _fits(step, KEY_FIELDS):
+            chunks.append(RECORD.pack(PRESS if kind == "keyboard_press" else RELEASE, 0,
+                                      self._name(step["key"], chunks, names), 0, 0, 0, step["time"]))
+        elif kind == "mouse_path" and _fits_path(step):
+            path = step["path"]
+            for i in range(0, len(path), 3):
+                chunks.append(RECORD.pack(PATH, FIRST if i == 0 else 0, 0, path[i + 2], path[i], path[i + 1],
+                                          step["time"]))
+        else:
+            chunks.append(_text(STEP, 0, json.dumps(step)))
+
+    def sync(self):
+        with self._lock:
+            os.fsync(self._file.fileno())
+            self._synced = time.monotonic()
+
+    def close(self, finished=True):
+        """Closes the file; ``finished`` marks the session as complete (see is_closed)."""
+        with self._lock:
+            if self._file.closed:
+                return
+            if finished:
+                self._file.write(RECORD.pack(CLOSED, 0, 0, 0, 0, 0, time.time()))
+            os.fsync(self._file.fileno())
+            self._file.close()
+
+    def _resume(self):
+        # Drops what follows the last complete batch (or the session details, before
+        # the first batch): a torn record or a batch that was never acknowledged.
+        names, end = dict(self._names), HEADER.size
+        for kind, fields, record_end in _scan(self.path):
+            if kind == NAME:
+                names[fields[1]] = fields[0]
+            elif kind == BATCH:
+                self.last_batch = (fields[2], int(fields[3]))
+                self._names, end = dict(names), record_end
+            elif kind == META and self.last_batch is None:
+                end = record_end
+        self._file.truncate(end)
+        self._file.seek(end)
+
+    def _name(self, value, chunks, names):
+        name = self._names.get(value, names.get(value))
+        if name is None:
+            name = names[value] = len(self._names) + len(names)
+            chunks.append(_text(NAME, name, value))
+        return name
+
+    def _write(self, data):
+        self._file.write(data)
+        if time.monotonic() - self._synced >= self.sync_interval:
+            os.fsync(self._file.fileno())
+            self._synced = time.monotonic()
+
+
+CLICK_FIELDS = {"type", "x", "y", "button", "time"}
+KEY_FIELDS = {"type", "key", "time"}
+PATH_FIELDS = {"type", "path", "time"}
+
+
+def _is_number(value):
+    # Numbers a double holds exactly, so they read back unchanged.
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return False
+    return math.isfinite(value) if isinstance(value, float) else abs(value) <= 2 ** 53
+
+
+def _fits(step, fields):
+    """True if a click or key step has exactly ``fields``, with a text name and a numeric time."""
+    name = step.get("button" if "button" in fields else "key")
+    return step.keys() == fields and _is_number(step["time"]) and (name is None or isinstance(name, str))
+
+
+def _fits_path(step):
+    path = step.get("path")
+    if step.keys() != PATH_FIELDS or not _is_number(step["time"]) or not isinstance(path, list) \
+            or not path or len(path) % 3:
+        return False
+    return all(_is_number(path[i]) and _is_number(path[i + 1]) and isinstance(path[i + 2], int)
+               and not isinstance(path[i + 2], bool) and 0 <= path[i + 2] < 2 ** 32 for i in range(0, len(path), 3))
+
+
+def _text(kind, name, text):
+    data = text.encode()
+    chunks = []
+    for start in range(0, max(len(data), 1), 28):
+        chunk = data[start:start + 28]
+        more = MORE if start + 28 < len(data) else 0
+        chunks.append(TEXT.pack(kind, more | len(chunk), name, chunk))
+    return b"".join(chunks)
+
+
+def _number(value):
+    return int(value) if value.is_integer() else value
+
+
+def _records(path):
+    """Yields ``(kind, fields)`` for each complete record, read through a memory map."""
+    for kind, fields, _ in _scan(path):
+        yield kind, fields
+
+
+def _scan(path):
+    # _records, with the file offset each record ends at.
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size < HEADER.size:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            magic, version, record_size, _ = HEADER.unpack_from(mm, 0)
+            if magic != MAGIC or record_size != RECORD.size:
+                raise ValueError(f"Not a recording log: {path}")
+            text = b""
+            for offset in range(HEADER.size, size - (size - HEADER.size) % RECORD.size, RECORD.size):
+                kind = mm[offset]
+                if kind in (NAME, META, STEP):
+                    _, flags, name, chunk = TEXT.unpack_from(mm, offset)
+                    text += chunk[:flags & ~MORE]
+                    if not flags & MORE:
+                        yield kind, (name, text.decode()), offset + RECORD.size
+                        text = b""
+                else:
+                    yield kind, RECORD.unpack_from(mm, offset)[1:], offset + RECORD.size
+
+
+def read_meta(path):
+    """The session details written with EventLog.write_meta."""
+    meta = {}
+    for kind, fields in _records(path):
+        if kind == META:
+            meta.update(json.loads(fields[1]))
+        elif kind != NAME:
+            break
+    return meta
+
+
+def is_closed(path):
+    """True if the session was closed once complete, i.e. its steps were already handed over."""
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        end = size - (size - HEADER.size) % RECORD.size if size >= HEADER.size else 0
+        if end <= HEADER.size:
+            return False
+        f.seek(end - RECORD.size)
+        return f.read(1)[0] == CLOSED
+
+
+def iter_steps(path):
+    """Streams the recorded steps, in the recorder's JSON step format."""
+    names = {0: None}
+    path_step = None
+    for kind, fields in _records(path):
+        if kind == PATH:
+            flags, _, ms, x, y, at = fields
+            if flags & FIRST or path_step is None:
+                if path_step:
+                    yield path_step
+                path_step = {"type": "mouse_path", "time": at, "path": []}
+            path_step["path"] += [_number(x), _number(y), ms]
+            continue
+        if path_step and kind != NAME:
+            yield path_step
+            path_step = None
+        if kind == NAME:
+            names[fields[0]] = fields[1]
+        elif kind == STEP:
+            yield json.loads(fields[1])
+        elif kind == CLICK:
+            _, name, _, x, y, at = fields
+            yield {"type": "mouse_click", "x": _number(x), "y": _number(y), "button": names.get(name), "time": at}
+        elif kind in (PRESS, RELEASE):
+            _, name, _, _, _, at = fields
+            yield {"type": "keyboard_press" if kind == PRESS else "keyboard_release", "key": names.get(name),
+                   "time": at}
+    if path_step:
+        yield path_step
+
+
+def write_json(path, f):
+    """Writes the recorded steps to ``f`` as a JSON list, one step at a time."""
+    f.write("[")
+    for i, step in enumerate(iter_steps(path)):
+        f.write((",\n" if i else "\n") + json.dumps(step))
+    f.write("\n]\n")
+
+
+def recover(path, coalesce=True):
+    """
+    Rebuilds the Test a (possibly interrupted) session was recording, with
+    the steps read so far, coalesced like Recorder.stop_recording does.
+    """
+    # Imported here: src.models imports the recorder, which imports this module.
+    from ..models.step import StepColumns
+    from ..models.test import Test
+    meta = read_meta(path)
+    steps = coalesce_steps(list(iter_steps(path))) if coalesce else iter_steps(path)
+    return Test(meta.get('name'), id=meta.get('test_id'), steps=StepColumns(steps))
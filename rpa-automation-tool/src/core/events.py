@@ -0,0 +1,120 @@
+import threading
+from collections import OrderedDict, deque
+
+
+class Subscription:
+    """
+    One consumer's view of a run.  Its buffer is bounded: when the consumer
+    falls behind, the oldest events are dropped (and counted in
+    ``dropped``) instead of making the publisher wait.
+    """
+
+    def __init__(self, channel, max_buffered):
+        self._channel = channel
+        self._events = deque(maxlen=max_buffered)
+        self.dropped = 0
+
+    def get(self, timeout=None):
+        """
+        Returns the buffered events, waiting up to ``timeout`` seconds for one.
+        An empty list with ``closed`` set means the run is over.
+        """
+        with self._channel.cond:
+            if not self._events and not self._channel.closed:
+                self._channel.cond.wait(timeout)
+            events = list(self._events)
+            self._events.clear()
+            return events
+
+    @property
+    def closed(self):
+        with self._channel.cond:
+            return self._channel.closed and not self._events
+
+    def _push(self, event):
+        # Called with the channel condition held.
+        if len(self._events) == self._events.maxlen:
+            self.dropped += 1
+        self._events.append(event)
+
+    def close(self):
+        with self._channel.cond:
+            if self in self._channel.subscribers:
+                self._channel.subscribers.remove(self)
+
+
+class _Channel:
+    def __init__(self, history):
+        self.cond = threading.Condition()
+        self.history = deque(maxlen=history)
+        self.subscribers = []
+        self.seq = 0
+        self.closed = False
+
+
+class EventBus:
+    """
+    In-memory publish/subscribe for run progress, one channel per run.
+
+    ``publish`` never blocks on consumers: every subscriber has its own
+    bounded buffer.  Each channel also keeps its last ``history`` events so
+    a client that connects late, or reconnects with Last-Event-ID, can catch
+    up.  Only the newest ``max_runs`` channels are kept.
+    """
+
+    def __init__(self, max_buffered=1000, history=1000, max_runs=100):
+        self.max_buffered = max_buffered
+        self.history = history
+        self.max_runs = max_runs
+        self._channels = OrderedDict()
+        self._lock = threading.Lock()
+
+    def publish(self, run_id, event):
+        """Adds ``event`` (a dict) to the run's stream, stamped with a sequence ``id``."""
+        channel = self._channel(run_id)
+        with channel.cond:
+            if channel.closed:
+                return
+            channel.seq += 1
+            event = dict(event, id=channel.seq)
+            channel.history.append(event)
+            for subscriber in channel.subscribers:
+                subscriber._push(event)
+            channel.cond.notify_all()
+
+    def subscribe(self, run_id, after=0):
+        """
+        Returns a Subscription to the run, primed with the buffered events
+        whose id is greater than ``after``.
+        """
+        channel = self._channel(run_id)
+        subscription = Subscription(channel, self.max_buffered)
+        with channel.cond:
+            for event in channel.history:
+                if event['id'] > after:
+                    subscription._push(event)
+            channel.subscribers.append(subscription)
+        return subscription
+
+    def close(self, run_id):
+        """Ends the run's stream; subscribers drain what is buffered and stop."""
+        channel = self._channel(run_id)
+        with channel.cond:
+            channel.closed = True
+            channel.cond.notify_all()
+
+    def has_run(self, run_id):
+        with self._lock:
+            return run_id in self._channels
+
+    def _channel(self, run_id):
+        with self._lock:
+            channel = self._channels.get(run_id)
+            if channel is None:
+                channel = self._channels[run_id] = _Channel(self.history)
+                while len(self._channels) > self.max_runs:
+                    _, evicted = self._channels.popitem(last=False)
+                    with evicted.cond:
+                        evicted.closed = True
+                        evicted.cond.notify_all()
+            return channel
@@ -0,0 +1,212 @@
+import glob
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from .event_log import EventLog, is_closed, read_meta, recover
+
+
+class UnknownSession(Exception):
+    """Raised for a batch of a session that was never started (its first batch must be number 0)."""
+
+
+class SequenceGap(Exception):
+    """Raised for a batch that skips ahead; ``expected`` is the number of the next batch to send."""
+
+    def __init__(self, expected):
+        super().__init__(f"Expected batch {expected}")
+        self.expected = expected
+
+
+class SessionFinished(Exception):
+    """Raised for a session id already used by a finished recording, other than to retry its requests."""
+
+
+class TooManySessions(Exception):
+    """Raised when ``max_sessions`` recordings are already being uploaded."""
+
+
+class _Session:
+    def __init__(self, project_id, suite_id, test_id, log):
+        self.project_id = project_id
+        self.suite_id = suite_id
+        self.test_id = test_id
+        self.log = log
+        self.next_seq = 0
+        self.steps = 0
+        self.finished = False  # or dropped for being idle
+        self.active = time.monotonic()
+        self.lock = threading.Lock()
+
+
+class RecordingIngest:
+    """
+    Receives recordings uploaded in numbered batches (see
+    api_client.RecordingUploader).  Each session appends its steps to its
+    own EventLog in ``directory``, so sessions do not contend with each
+    other or with the project tree, and nothing is saved per event: the
+    test's steps are replaced once, coalesced, when the session finishes.
+
+    Batch numbers make retries idempotent: a batch that was already
+    applied is acknowledged again without being appended twice, and one
+    that skips ahead raises SequenceGap.  Each batch is logged with its
+    number, so after a restart resume() reopens the sessions left in
+    ``directory`` and their uploads continue after the last acknowledged
+    batch.  The test is only changed when its session finishes.  A session
+    that receives nothing for ``idle_timeout`` seconds is dropped with its
+    log (see expire).
+
+    The ids of the last ``max_finished`` finished sessions are kept, and
+    using one again raises SessionFinished; only the results of the last
+    ``max_sessions`` are kept to answer retried requests of their session.
+    """
+
+    def __init__(self, project_manager, directory="recordings", max_sessions=1000, idle_timeout=3600,
+                 max_finished=100000):
+        self.project_manager = project_manager
+        self.directory = directory
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.max_finished = max_finished
+        self._swept = time.monotonic()
+        self._sessions = {}
+        self._finished = OrderedDict()  # finished session id -> (project id, suite id, test id)
+        self._results = OrderedDict()  # session id -> result of finish, for retried requests
+        self._lock = threading.Lock()
+
+    def append(self, project_id, suite_id, test_id, session_id, seq, steps):
+        """Applies batch ``seq`` of a session; returns its acknowledgement."""
+        with self._lock:
+            finished = self._finished_result(session_id, (project_id, suite_id, test_id))
+        if finished is not None:
+            # A retry that arrives after the session was saved.
+            return {'session': session_id, 'acked': seq, 'steps': finished['events'], 'duplicate': True}
+        session = self._session(project_id, suite_id, test_id, session_id, create=seq == 0)
+        with session.lock:
+            if session.finished:
+                raise UnknownSession(f"Recording session {session_id} is closed")
+            session.active = time.monotonic()
+            if seq < session.next_seq:
+                return {'session': session_id, 'acked': seq, 'steps': session.steps, 'duplicate': True}
+            if seq > session.next_seq:
+                raise SequenceGap(session.next_seq)
+            session.log.extend(steps, batch=seq)
+            session.next_seq += 1
+            session.steps += len(steps)
+            return {'session': session_id, 'acked': seq, 'steps': session.steps, 'duplicate': False}
+
+    def finish(self, project_id, suite_id, test_id, session_id):
+        """Saves the uploaded steps as the test's steps; returns a summary."""
+        ids = (project_id, suite_id, test_id)
+        with self._lock:
+            finished = self._finished_result(session_id, ids)
+        if finished is not None:
+            return finished
+        session = self._session(project_id, suite_id, test_id, session_id, create=False)
+        with session.lock:
+            with self._lock:
+                finished = self._finished_result(session_id, ids)
+            if finished is not None:
+                return finished
+            if session.finished:
+                raise UnknownSession(f"Recording session {session_id} was dropped for being idle")
+            session.finished = True
+            test = recover(session.log.path)
+            self.project_manager.set_test_steps(project_id, suite_id, test_id, test.steps)
+            # Closed only once saved: until then a restart resumes the session.
+            session.log.close()
+            os.remove(session.log.path)
+            result = {'session': session_id, 'test_id': test_id, 'events': session.steps,
+                      'steps_recorded': len(test.steps)}
+            with self._lock:
+                self._sessions.pop(session_id, None)
+                self._finished[session_id] = ids
+                self._results[session_id] = result
+                while len(self._finished) > self.max_finished:
+                    self._finished.popitem(last=False)
+                while len(self._results) > self.max_sessions:
+                    self._results.popitem(last=False)
+        logging.info(f"Recording session {session_id} saved {len(test.steps)} steps to test {test_id}")
+        return result
+
+    def resume(self):
+        """Reopens the sessions whose logs were left in ``directory``; returns their ids."""
+        resumed = []
+        for path in sorted(glob.glob(os.path.join(self.directory, "*.rec"))):
+            try:
+                meta = read_meta(path)
+                if 'session' not in meta or is_closed(path):
+                    continue
+                log = EventLog(path, reopen=True)
+            except (OSError, ValueError):
+                logging.exception(f"Could not reopen recording log {path}")
+                continue
+            session = _Session(meta['project_id'], meta['suite_id'], meta['test_id'], log)
+            if log.last_batch is not None:
+                session.next_seq = log.last_batch[0] + 1
+                session.steps = log.last_batch[1]
+            with self._lock:
+                self._sessions[meta['session']] = session
+            resumed.append(meta['session'])
+        if resumed:
+            logging.info(f"Resumed {len(resumed)} recording upload sessions")
+        return resumed
+
+    def expire(self, now=None):
+        """Drops the sessions idle for ``idle_timeout`` seconds, deleting their logs; returns their ids."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._swept = now
+            idle = {session_id: session for session_id, session in self._sessions.items()
+                    if now - session.active >= self.idle_timeout}
+            for session_id in idle:
+                del self._sessions[session_id]
+        for session_id, session in idle.items():
+            with session.lock:
+                if session.finished:
+                    continue
+                session.finished = True
+                session.log.close(finished=False)
+                os.remove(session.log.path)
+            logging.warning(f"Dropped recording session {session_id} of test {session.test_id}: "
+                            f"idle for {self.idle_timeout}s")
+        return list(idle)
+
+    def close(self):
+        """Closes open session logs; resume() reopens them on the next start."""
+        with self._lock:
+            sessions = list(self._sessions.values())
+        for session in sessions:
+            session.log.close(finished=False)
+
+    def _finished_result(self, session_id, ids):
+        # Called with self._lock held: the result of a finished session, for a retry of its requests.
+        if session_id not in self._finished:
+            return None
+        result = self._results.get(session_id)
+        if result is None or self._finished[session_id] != ids:
+            raise SessionFinished(f"Recording session {session_id} is already finished")
+        return result
+
+    def _session(self, project_id, suite_id, test_id, session_id, create):
+        if time.monotonic() - self._swept >= min(self.idle_timeout, 60):
+            self.expire()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                if session_id in self._finished:
+                    raise SessionFinished(f"Recording session {session_id} is already finished")
+                if not create:
+                    raise UnknownSession(f"Unknown recording session: {session_id}")
+                if len(self._sessions) >= self.max_sessions:
+                    raise TooManySessions(f"{self.max_sessions} recording sessions are already open")
+                os.makedirs(self.directory, exist_ok=True)
+                test = self.project_manager.get_test_from_suite(project_id, suite_id, test_id)
+                log = EventLog(os.path.join(self.directory, f"{test_id}.{session_id}.rec"))
+                log.write_meta(project_id=project_id, suite_id=suite_id, test_id=test_id,
+                               name=test.name if test else None, session=session_id)
+                session = self._sessions[session_id] = _Session(project_id, suite_id, test_id, log)
+        if (session.project_id, session.suite_id, session.test_id) != (project_id, suite_id, test_id):
+            raise UnknownSession(f"Recording session {session_id} belongs to another test")
+        return session
@@ -0,0 +1,258 @@
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from .events import EventBus
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class JobQueueFull(Exception):
+    """Raised by JobManager.submit when ``max_queued`` jobs are already waiting."""
+
+
+class Job:
+    """A queued or finished run of a project, a suite or a single test."""
+
+    def __init__(self, project_id, suite_id=None, test_id=None, options=None, id=None, status=QUEUED,
+                 completed=0, total=None, results=None, error=None, created_at=None, started_at=None,
+                 finished_at=None):
+        self.id = id if id is not None else str(uuid.uuid4())
+        self.project_id = project_id
+        self.suite_id = suite_id
+        self.test_id = test_id
+        self.options = options or {}
+        self.status = status
+        self.completed = completed
+        self.total = total
+        self.results = results
+        self.error = error
+        self.created_at = created_at if created_at is not None else time.time()
+        self.started_at = started_at
+        self.finished_at = finished_at
+        self.cancel_requested = threading.Event()
+
+    @property
+    def kind(self):
+        if self.test_id:
+            return "test"
+        return "suite" if self.suite_id else "project"
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'project_id': self.project_id,
+            'suite_id': self.suite_id,
+            'test_id': self.test_id,
+            'options': self.options,
+            'status': self.status,
+            'completed': self.completed,
+            'total': self.total,
+            'results': self.results,
+            'error': self.error,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        data = dict(data)
+        data.pop('kind', None)
+        return cls(**data)
+
+
+class JobManager:
+    """
+    Runs test jobs on background worker threads.
+
+    ``submit`` only queues a job, so run requests return immediately.  At
+    most ``max_queued`` jobs may wait at once; beyond that ``submit`` raises
+    JobQueueFull and the API answers 503 so clients back off.  Job state is
+    saved through the project store (Storage.save_jobs) by a background
+    thread, once per ``save_interval`` seconds at most, so transitions never
+    wait on disk I/O and bursts of them cost one write.  Jobs that were
+    queued or running when the process stopped are queued again on the next
+    start.  Only the newest ``max_finished`` finished jobs are kept.
+
+    Progress is published on ``events`` under the job id: a ``started`` and
+    a ``finished`` event for the run, and the test and step events of
+    runner.result_events in between.
+    """
+
+    def __init__(self, project_manager, workers=1, max_queued=100, max_finished=200, save_interval=0.5):
+        self.project_manager = project_manager
+        self.storage = project_manager.storage
+        self.max_queued = max_queued
+        self.max_finished = max_finished
+        self.save_interval = save_interval
+        self._jobs = OrderedDict()
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._save_lock = threading.Lock()
+        self._save_cond = threading.Condition()
+        self._dirty = False
+        self._closed = False
+        self.events = EventBus()
+        self._recover()
+        self._saver = threading.Thread(target=self._save_loop, name="job-saver", daemon=True)
+        self._saver.start()
+        self._workers = [threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+                         for i in range(max(1, workers))]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, project_id, suite_id=None, test_id=None, **options):
+        """Queues a run and returns its Job; raises JobQueueFull when the queue is full."""
+        options = {key: value for key, value in options.items() if value is not None}
+        job = Job(project_id, suite_id, test_id, options)
+        with self._cond:
+            if len(self._queue) >= self.max_queued:
+                raise JobQueueFull(f"{len(self._queue)} jobs are already queued")
+            self._jobs[job.id] = job
+            self._queue.append(job)
+            self._cond.notify()
+        logging.info(f"Queued {job.kind} job {job.id} for project {project_id}")
+        self._save()
+        return job
+
+    def get(self, job_id):
+        with self._cond:
+            return self._jobs.get(job_id)
+
+    def get_all(self):
+        with self._cond:
+            return list(self._jobs.values())
+
+    def cancel(self, job_id):
+        """
+        Cancels a job.  A queued job is dropped at once; a running one stops
+        before its next test starts.  Returns the job, or None if unknown.
+        """
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or job.status in FINISHED:
+                return job
+            job.cancel_requested.set()
+            if job.status == QUEUED:
+                self._queue.remove(job)
+                self._finish(job, CANCELLED)
+                self._publish_finished(job)
+        self._save()
+        return job
+
+    def flush(self):
+        """Writes the job state now if it changed since the last save."""
+        with self._save_lock:
+            with self._save_cond:
+                if not self._dirty:
+                    return
+                self._dirty = False
+            with self._cond:
+                jobs = [job.to_dict() for job in self._jobs.values()]
+            try:
+                self.storage.save_jobs(jobs)
+            except Exception:
+                logging.exception("Could not persist run jobs; will retry")
+                self._save()
+
+    def close(self, timeout=None):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        for worker in self._workers:
+            worker.join(timeout)
+        with self._save_cond:
+            self._save_cond.notify()
+        self._saver.join(timeout)
+        self.flush()
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                job = self._queue.popleft()
+                job.status = RUNNING
+                job.started_at = time.time()
+            self._save()
+            self.events.publish(job.id, {'type': 'started', 'scope': 'run', 'job_id': job.id})
+            try:
+                results = self._run(job)
+            except Exception as e:
+                logging.exception(f"Job {job.id} failed")
+                with self._cond:
+                    job.error = str(e)
+                    self._finish(job, FAILED)
+            else:
+                with self._cond:
+                    job.results = results
+                    self._finish(job, CANCELLED if job.cancel_requested.is_set() else SUCCEEDED)
+            self._save()
+            self._publish_finished(job)
+
+    def _run(self, job):
+        def progress(done, total):
+            job.completed, job.total = done, total
+
+        pm = self.project_manager
+        hooks = {'progress': progress, 'should_stop': job.cancel_requested.is_set,
+                 'emit': lambda event: self.events.publish(job.id, event)}
+        if job.test_id:
+            result = pm.run_test(job.project_id, job.suite_id, job.test_id, **hooks)
+            return [result] if result else []
+        if job.suite_id:
+            return pm.run_suite_tests(job.project_id, job.suite_id, **job.options, **hooks)
+        return pm.run_all_tests(job.project_id, **job.options, **hooks)
+
+    def _publish_finished(self, job):
+        self.events.publish(job.id, {'type': 'finished', 'scope': 'run', 'job_id': job.id, 'status': job.status,
+                                     'completed': job.completed, 'total': job.total, 'error': job.error})
+        self.events.close(job.id)
+
+    def _finish(self, job, status):
+        # Called with self._cond held.
+        job.status = status
+        job.finished_at = time.time()
+        finished = [j for j in self._jobs.values() if j.status in FINISHED]
+        for old in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[old.id]
+
+    def _recover(self):
+        for data in self.storage.load_jobs():
+            job = Job.from_dict(data)
+            if job.status not in FINISHED:
+                # Interrupted by a restart: run it again from the start.
+                job.status, job.started_at, job.completed = QUEUED, None, 0
+                self._queue.append(job)
+            self._jobs[job.id] = job
+        if self._queue:
+            logging.info(f"Re-queued {len(self._queue)} unfinished jobs")
+
+    def _save(self):
+        # Marks the job state changed; the saver thread writes it.
+        with self._save_cond:
+            self._dirty = True
+            self._save_cond.notify()
+
+    def _save_loop(self):
+        while True:
+            with self._save_cond:
+                while not self._dirty and not self._closed:
+                    self._save_cond.wait()
+                if self._closed:
+                    return
+                # Let the transitions of the next save_interval share this write.
+                deadline = time.monotonic() + self.save_interval
+                while not self._closed and (delay := deadline - time.monotonic()) > 0:
+                    self._save_cond.wait(delay)
+            self.flush()
@@ -0,0 +1,118 @@
+import math
+import threading
+
+
+def _distance_to_segment(point, start, end):
+    (px, py), (ax, ay), (bx, by) = point[:2], start[:2], end[:2]
+    dx, dy = bx - ax, by - ay
+    length = dx * dx + dy * dy
+    if length == 0:
+        return math.hypot(px - ax, py - ay)
+    t = max(0.0, min(1.0, ((px - ax) * dx + (py - ay) * dy) / length))
+    return math.hypot(px - (ax + t * dx), py - (ay + t * dy))
+
+
+def simplify(points, tolerance):
+    """
+    Douglas-Peucker: the subset of ``(x, y, t)`` points whose polyline stays
+    within ``tolerance`` pixels of the original.  Endpoints are always kept.
+    """
+    if len(points) < 3:
+        return list(points)
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        index, worst = None, tolerance
+        for i in range(first + 1, last):
+            distance = _distance_to_segment(points[i], points[first], points[last])
+            if distance > worst:
+                index, worst = i, distance
+        if index is not None:
+            keep[index] = True
+            stack += [(first, index), (index, last)]
+    return [point for point, kept in zip(points, keep) if kept]
+
+
+class MousePathRecorder:
+    """
+    Turns a stream of mouse moves into compact ``mouse_path`` steps:
+
+        {"type": "mouse_path", "time": <start>, "path": [x0, y0, ms0, x1, y1, ms1, ...]}
+
+    where each ``ms`` is milliseconds after ``time``.  Moves closer than
+    ``min_interval`` seconds or ``min_distance`` pixels to the last one kept
+    are dropped.  The rest are simplified as they arrive: a point is only
+    kept once the path can no longer be drawn as a straight line within
+    ``tolerance`` pixels, and a final Douglas-Peucker pass runs when the
+    step is closed.  A step closes after ``max_points`` points or a pause of
+    ``max_gap`` seconds, so memory and step size stay bounded however long
+    the recording.  Smaller tolerances replay more faithfully.
+    """
+
+    def __init__(self, tolerance=2.0, min_distance=3.0, min_interval=0.01, max_gap=0.5, max_points=256,
+                 max_window=64):
+        self.tolerance = tolerance
+        self.min_distance = min_distance
+        self.min_interval = min_interval
+        self.max_gap = max_gap
+        self.max_points = max_points
+        self.max_window = max_window
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._kept = []     # vertices of the current step
+        self._window = []   # points since the last vertex, all within tolerance of one line
+        self._last = None   # last accepted raw point
+
+    def add(self, x, y, t):
+        """Feeds one move at ``t`` seconds; returns a finished step, or None."""
+        with self._lock:
+            finished = None
+            if self._last is not None and t - self._last[2] > self.max_gap:
+                finished = self._close()
+            point = (x, y, t)
+            if self._last is not None and (t - self._last[2] < self.min_interval or
+                                           math.hypot(x - self._last[0], y - self._last[1]) < self.min_distance):
+                return finished
+            self._last = point
+            if not self._kept:
+                self._kept.append(point)
+                return finished
+            anchor = self._kept[-1]
+            if self._window and (len(self._window) >= self.max_window or any(
+                    _distance_to_segment(p, anchor, point) > self.tolerance for p in self._window)):
+                # The line from the anchor no longer fits: the previous point becomes a vertex.
+                self._kept.append(self._window[-1])
+                self._window = []
+            self._window.append(point)
+            if len(self._kept) + 1 >= self.max_points:
+                finished = self._close()
+                # The next step continues from where this one ends.
+                self._kept, self._last = [point], point
+            return finished
+
+    def flush(self):
+        """Closes the current step, e.g. before a click; returns it or None."""
+        with self._lock:
+            return self._close()
+
+    def _close(self):
+        points = self._kept + self._window[-1:]
+        self._reset()
+        if len(points) < 2:
+            return None
+        points = simplify(points, self.tolerance)
+        start = points[0][2]
+        path = []
+        for x, y, t in points:
+            path += [x, y, round((t - start) * 1000)]
+        return {"type": "mouse_path", "time": start, "path": path}
+
+
+def path_points(step):
+    """``(x, y, seconds after the step's time)`` for each vertex of a mouse_path step."""
+    path = step.get("path") or []
+    return [(path[i], path[i + 1], path[i + 2] / 1000) for i in range(0, len(path) - 2, 3)]
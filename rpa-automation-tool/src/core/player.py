@@ -1,7 +1,334 @@
 # src/core/player.py
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from .coalesce import shortcut_keys
+from .mouse_path import path_points
+
+# One pre-resolved step: ``handler(driver, *args)``, due ``at`` seconds into the
+# recording and ``delay`` seconds after the step before it.
+CompiledStep = namedtuple("CompiledStep", ["handler", "args", "delay", "at"])
+
+# Largest gap, in pixels, between replayed points of a recorded mouse path.
+PATH_RESOLUTION = 20
+
+
+class Plan:
+    """An immutable, ready-to-replay form of a test's steps."""
+
+    __slots__ = ("test_id", "version", "steps")
+
+    def __init__(self, test_id, version, steps):
+        self.test_id = test_id
+        self.version = version
+        self.steps = tuple(steps)
+
+    def __len__(self):
+        return len(self.steps)
+
+
+class ConsoleDriver:
+    """Prints each step instead of performing it."""
+
+    def click(self, x, y, button, count=1):
+        print(f"  Executing step: {'double ' if count == 2 else ''}click {button} at ({x}, {y})")
+
+    def move(self, x, y):
+        print(f"  Executing step: move to ({x}, {y})")
+
+    def press(self, key):
+        print(f"  Executing step: press {key}")
+
+    def release(self, key):
+        print(f"  Executing step: release {key}")
+
+    def type(self, text):
+        print(f"  Executing step: type {text!r}")
+
+    def hotkey(self, keys):
+        print(f"  Executing step: press {'+'.join(keys)}")
+
+    def perform(self, action, target, value):
+        print(f"  Executing step: {action} {target or ''}{f' = {value}' if value else ''}")
+
+
+class PynputDriver(ConsoleDriver):
+    """Replays recorded mouse and keyboard events on this machine."""
+
+    def __init__(self):
+        from pynput import keyboard, mouse
+        self.mouse = mouse.Controller()
+        self.keyboard = keyboard.Controller()
+        self.buttons = {button.name: button for button in mouse.Button}
+        self.keys = {key.name: key for key in keyboard.Key}
+
+    def click(self, x, y, button, count=1):
+        self.mouse.position = (x, y)
+        self.mouse.click(self.buttons.get(button, self.buttons["left"]), count)
+
+    def move(self, x, y):
+        self.mouse.position = (x, y)
+
+    def press(self, key):
+        key = self.keys.get(key, key)
+        self.keyboard.press(key)
+        self.keyboard.release(key)
+
+    def release(self, key):
+        self.keyboard.release(self.keys.get(key, key))
+
+    def type(self, text):
+        self.keyboard.type(text)
+
+    def hotkey(self, keys):
+        keys = [self.keys.get(key, key) for key in keys]
+        for key in keys:
+            self.keyboard.press(key)
+        for key in reversed(keys):
+            self.keyboard.release(key)
+
+
+def _click(driver, x, y, button):
+    driver.click(x, y, button)
+
+
+def _double_click(driver, x, y, button):
+    driver.click(x, y, button, 2)
+
+
+def _move(driver, x, y):
+    driver.move(x, y)
+
+
+def _press(driver, key):
+    driver.press(key)
+
+
+def _release(driver, key):
+    driver.release(key)
+
+
+def _type(driver, text):
+    driver.type(text)
+
+
+def _shortcut(driver, keys):
+    driver.hotkey(keys)
+
+
+def _key_name(key):
+    key = str(key)
+    # Special keys are recorded as str(Key), e.g. "Key.enter".
+    return key[4:] if key.startswith("Key.") and len(key) > 4 else key
+
+
+def _perform(driver, action, target, value):
+    driver.perform(action, target, value)
+
+
+def compile_step(step):
+    """Returns ``(handler, args)`` for one step dict; all parsing happens here."""
+    kind = step.get("type")
+    if kind in ("mouse_click", "double_click"):
+        # Recorded as str(pynput Button), e.g. "Button.left".
+        return _click if kind == "mouse_click" else _double_click, \
+            (step.get("x", 0), step.get("y", 0), str(step.get("button", "left")).rpartition(".")[2])
+    if kind == "mouse_move":
+        return _move, (step.get("x", 0), step.get("y", 0))
+    if kind == "keyboard_press":
+        return _press, (_key_name(step.get("key")),)
+    if kind == "keyboard_release":
+        return _release, (_key_name(step.get("key")),)
+    if kind == "type_text":
+        return _type, (str(step.get("value") or ""),)
+    if kind == "shortcut":
+        return _shortcut, (shortcut_keys(str(step.get("key"))),)
+    return _perform, (step.get("action") or kind or step.get("description"), step.get("target"), step.get("value"))
+
+
+def compile_path(step, resolution=PATH_RESOLUTION):
+    """
+    Expands a mouse_path step into ``(x, y, seconds after the step's time)``
+    moves: its vertices plus points at most ``resolution`` pixels apart
+    between them, so a replay passes over (and hovers) what the recording
+    did.  ``resolution=None`` replays the vertices only.
+    """
+    points = path_points(step)
+    moves = points[:1]
+    for (x0, y0, t0), (x1, y1, t1) in zip(points, points[1:]):
+        parts = max(1, math.ceil(math.hypot(x1 - x0, y1 - y0) / resolution)) if resolution else 1
+        for i in range(1, parts + 1):
+            f = i / parts
+            moves.append((round(x0 + (x1 - x0) * f), round(y0 + (y1 - y0) * f), t0 + (t1 - t0) * f))
+    return moves
+
+
+def compile_plan(test, version=None):
+    """
+    Compiles a test's steps into a Plan.  Recorded steps carry a ``time``
+    offset from the start of the recording; it becomes the step's ``at``
+    (and its ``delay`` after the previous step).  API-authored steps have
+    none and run right after the step before them.  A mouse_path step
+    becomes one move per point of compile_path, each at its own time.
+    """
+    compiled = []
+    previous = 0.0
+    for step in test.steps:
+        timed = isinstance(step.get("time"), (int, float))
+        if step.get("type") == "mouse_path":
+            start = step["time"] if timed else previous
+            for x, y, offset in compile_path(step):
+                at = max(previous, start + offset)
+                compiled.append(CompiledStep(_move, (x, y), at - previous, at))
+                previous = at
+            continue
+        handler, args = compile_step(step)
+        delay = 0.0
+        if timed:
+            delay = max(0.0, step["time"] - previous)
+            previous = max(previous, step["time"])
+        compiled.append(CompiledStep(handler, args, delay, previous))
+    return Plan(test.id, version, compiled)
+
+
+class PlanCache:
+    """
+    Compiled plans by test id, each tagged with the test version it was built
+    from (see ProjectManager.version_of).  A step edit bumps the version, so
+    the next lookup recompiles; only the newest ``max_plans`` tests are kept.
+    """
+
+    def __init__(self, max_plans=256):
+        self.max_plans = max_plans
+        self._plans = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, test, version):
+        with self._lock:
+            plan = self._plans.get(test.id)
+            if plan is not None and plan.version == version:
+                self._plans.move_to_end(test.id)
+                return plan
+        plan = compile_plan(test, version)
+        with self._lock:
+            self._plans[test.id] = plan
+            self._plans.move_to_end(test.id)
+            while len(self._plans) > self.max_plans:
+                self._plans.popitem(last=False)
+        return plan
+
+    def invalidate(self, test_id):
+        with self._lock:
+            self._plans.pop(test_id, None)
+
+
+class ReplayReport:
+    """How closely a replay kept to the recorded timing; latencies are in seconds."""
+
+    def __init__(self, speed, recorded_duration, expected_duration, actual_duration, latencies):
+        self.speed = speed
+        self.recorded_duration = recorded_duration
+        self.expected_duration = expected_duration
+        self.actual_duration = actual_duration
+        self.latencies = latencies
+
+    def to_dict(self):
+        ordered = sorted(self.latencies)
+        return {
+            'steps': len(ordered),
+            'speed': self.speed,
+            'recorded_duration': self.recorded_duration,
+            'expected_duration': self.expected_duration,
+            'actual_duration': self.actual_duration,
+            'drift': self.actual_duration - self.expected_duration,
+            'latency_mean': sum(ordered) / len(ordered) if ordered else 0.0,
+            'latency_p50': _percentile(ordered, 0.5),
+            'latency_p95': _percentile(ordered, 0.95),
+            'latency_max': ordered[-1] if ordered else 0.0,
+        }
+
+
+def _percentile(ordered, fraction):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class ReplayScheduler:
+    """
+    Replays a Plan with its recorded timing.  Every step is scheduled at its
+    recorded offset divided by ``speed``, measured from the start of the
+    replay on a monotonic clock, so a slow step delays only itself and the
+    next wait is shortened to catch up instead of the lag accumulating.
+    ``speed=0`` runs the steps back to back.  A step's latency is how late
+    it actually started compared to its schedule.  Latencies and the time
+    each handler takes are also observed in ``metrics``.
+    """
+
+    def __init__(self, speed=1.0, clock=time.monotonic, sleep=time.sleep, metrics=None):
+        if speed < 0:
+            raise ValueError("speed must not be negative")
+        self.speed = speed
+        self.clock = clock
+        self.sleep = sleep
+        if metrics is None:
+            # Imported here: src.utils imports the project manager, which imports this module.
+            from src.utils.metrics import registry as metrics
+        self.metrics = metrics
+
+    def run(self, plan, driver):
+        clock, sleep, speed, metrics = self.clock, self.sleep, self.speed, self.metrics
+        latencies = []
+        start = clock()
+        for handler, args, _, at in plan.steps:
+            due = at / speed if speed else 0.0
+            remaining = start + due - clock()
+            if remaining > 0:
+                sleep(remaining)
+            latencies.append(max(0.0, clock() - start - due))
+            started = time.perf_counter_ns()
+            handler(driver, *args)
+            metrics.observe('rpa_replay_step_duration_seconds', (time.perf_counter_ns() - started) / 1e9,
+                            handler=handler.__name__.lstrip("_"))
+            metrics.observe('rpa_replay_lateness_seconds', latencies[-1])
+        recorded = plan.steps[-1].at if plan.steps else 0.0
+        return ReplayReport(speed, recorded, recorded / speed if speed else 0.0, clock() - start, latencies)
+
+
 class Player:
-    def play(self, test):
-        print(f"Playing test: {test.name}")
-        for step in test.steps:
-            print(f"  Executing step: {step.description}")
-            # Here you would add the actual logic to perform the step
\ No newline at end of file
+    """
+    Replays tests through a driver (ConsoleDriver by default).  Tests are
+    compiled once into a Plan; with a ``version`` the plan is cached, so
+    repeated replays only walk the pre-resolved steps.  Timing follows the
+    recording via ReplayScheduler; ``speed`` scales it: 2.0 plays twice as
+    fast, 0 as fast as possible.
+    """
+
+    def __init__(self, driver=None, speed=1.0, plan_cache=None, clock=time.monotonic, sleep=time.sleep, metrics=None):
+        self.driver = driver if driver is not None else ConsoleDriver()
+        self.speed = speed
+        self.plans = plan_cache if plan_cache is not None else PlanCache()
+        self.clock = clock
+        self.sleep = sleep
+        self.metrics = metrics
+
+    def compile(self, test, version=None):
+        if version is None:
+            return compile_plan(test)
+        return self.plans.get(test, version)
+
+    def play(self, test, version=None, repeat=1, speed=None):
+        """Replays a test ``repeat`` times and returns the ReplayReport of each run."""
+        logging.info(f"Playing test: {test.name}")
+        plan = self.compile(test, version)
+        return [self.execute(plan, speed) for _ in range(repeat)]
+
+    def execute(self, plan, speed=None):
+        scheduler = ReplayScheduler(self.speed if speed is None else speed, self.clock, self.sleep, self.metrics)
+        report = scheduler.run(plan, self.driver)
+        stats = report.to_dict()
+        logging.info(f"Replayed {stats['steps']} steps of test {plan.test_id} at {report.speed}x: "
+                     f"drift {stats['drift']:.3f}s, p95 latency {stats['latency_p95']:.3f}s")
+        return report
@@ -1,76 +1,239 @@
 from pynput import mouse, keyboard
+import logging
+import os
+import threading
 import time
 from threading import Thread
+from .coalesce import coalesce
+from .event_log import EventLog, iter_steps
+from .mouse_path import MousePathRecorder
+
+# Event kinds pushed by the listener callbacks.
+CLICK, MOVE, KEY, RELEASE = 0, 1, 2, 3
+
+
+class RingBuffer:
+    """
+    Preallocated FIFO between the pynput listener threads and the recorder's
+    consumer.  ``push`` only stores a tuple under a short lock; when the
+    buffer is full the new event is dropped and counted rather than making
+    the listener wait.  It also tracks how long the callbacks took.
+    """
+
+    def __init__(self, capacity=4096):
+        self.capacity = capacity
+        self._slots = [None] * capacity
+        self._head = 0
+        self._size = 0
+        self._lock = threading.Lock()
+        self.ready = threading.Event()
+        self.pushed = 0
+        self.dropped = 0
+        self.latency_ns_total = 0
+        self.latency_ns_max = 0
+
+    def push(self, event, started_ns):
+        """Adds ``event``; ``started_ns`` is when the callback began (perf_counter_ns)."""
+        with self._lock:
+            if self._size == self.capacity:
+                self.dropped += 1
+            else:
+                self._slots[(self._head + self._size) % self.capacity] = event
+                self._size += 1
+                self.pushed += 1
+            elapsed = time.perf_counter_ns() - started_ns
+            self.latency_ns_total += elapsed
+            if elapsed > self.latency_ns_max:
+                self.latency_ns_max = elapsed
+        self.ready.set()
+
+    def drain(self):
+        """Removes and returns every buffered event, oldest first."""
+        with self._lock:
+            events = []
+            for _ in range(self._size):
+                events.append(self._slots[self._head])
+                self._slots[self._head] = None
+                self._head = (self._head + 1) % self.capacity
+            self._size = 0
+            self.ready.clear()
+        return events
+
 
 class Recorder:
-    def __init__(self):
+    def __init__(self, record_moves=False, buffer_size=4096, on_step=None, coalesce=True, log_dir=None,
+                 **path_options):
+        """
+        With ``record_moves`` mouse moves are recorded as compact mouse_path
+        steps; ``path_options`` tune their simplification (see MousePathRecorder).
+
+        The listener callbacks only timestamp the raw event and push it into
+        a RingBuffer of ``buffer_size`` events; a consumer thread turns them
+        into steps, appends them to the test and passes each one to
+        ``on_step`` (e.g. to save it as it is recorded).
+
+        With ``coalesce`` key releases are recorded too, and stop_recording
+        merges the events into type_text, shortcut and double_click steps
+        (see src.core.coalesce; ``expand`` restores the raw events).
+
+        With a ``log_dir`` the steps go to an EventLog file there instead of
+        memory until stop_recording reads them back, so a crash loses at most
+        the last second and the session can be recovered (event_log.recover).
+        The file is kept until discard_log() is called once the test is saved.
+        """
+        self.paths = MousePathRecorder(**path_options) if record_moves else None
+        self.buffer_size = buffer_size
+        self.on_step = on_step
+        self.coalesce = coalesce
+        self.log_dir = log_dir
+        self.log = None
         self.is_recording = False
         self.current_test = None
         self.steps = []
         self.mouse_listener = None
         self.keyboard_listener = None
         self.start_time = None
+        self.events = None
+        self._start_ns = self._last_ns = None
+        self._consumer = None
+        self._stopping = False
 
     def start_recording(self, test):
         """
         Prepare the recorder for a new recording for a specific test.
         """
-        self.is_recording = True
+        # Imported here: src.models imports this module.
+        from ..models.step import StepColumns
         self.start_time = time.time()
+        self._start_ns = self._last_ns = time.perf_counter_ns()
         self.current_test = test
-        self.current_test.steps = []  # Clear previous steps in the test
-        print("Recording started.")
+        # Clear previous steps; long recordings stay compact in columnar form.
+        self.current_test.steps = StepColumns()
+        self.events = RingBuffer(self.buffer_size)
+        if self.log_dir:
+            os.makedirs(self.log_dir, exist_ok=True)
+            self.log = EventLog(os.path.join(self.log_dir, f"{test.id}.{time.time_ns()}.rec"))
+            self.log.write_meta(test_id=test.id, name=test.name, started=self.start_time)
+        self._stopping = False
+        self._consumer = Thread(target=self._consume, name="recorder-consumer", daemon=True)
+        self._consumer.start()
+        self.is_recording = True
+        logging.info(f"Recording started for test {test.id}")
 
     def stop_recording(self):
         self.is_recording = False
-        print("Recording stopped.")
         if self.mouse_listener:
             self.mouse_listener.stop()
         if self.keyboard_listener:
             self.keyboard_listener.stop()
+        if self._consumer:
+            # The consumer drains what is buffered before it exits.
+            self._stopping = True
+            self.events.ready.set()
+            self._consumer.join()
+            self._consumer = None
+        self._flush_path()
+        stats = self.stats()
+        if self.log:
+            self.log.close()
+            self.current_test.steps = type(self.current_test.steps)(iter_steps(self.log.path))
+        if self.coalesce:
+            steps = coalesce(list(self.current_test.steps))
+            logging.info(f"Coalesced {len(self.current_test.steps)} recorded events into {len(steps)} steps")
+            self.current_test.steps = type(self.current_test.steps)(steps)
+        logging.info(f"Recording stopped: {stats['captured']} events, {stats['dropped']} dropped")
         return self.current_test.steps, self.current_test
 
+    def discard_log(self):
+        """Deletes the session's EventLog, once the recorded test has been saved."""
+        if self.log:
+            os.remove(self.log.path)
+            self.log = None
+
+    def stats(self):
+        """Capture counters: events buffered and dropped, and callback latency in microseconds."""
+        events = self.events
+        if events is None:
+            return {'captured': 0, 'dropped': 0, 'callback_latency_mean_us': 0.0, 'callback_latency_max_us': 0.0}
+        calls = events.pushed + events.dropped
+        return {
+            'captured': events.pushed,
+            'dropped': events.dropped,
+            'callback_latency_mean_us': events.latency_ns_total / calls / 1000 if calls else 0.0,
+            'callback_latency_max_us': events.latency_ns_max / 1000,
+        }
+
+    # ----- listener callbacks: keep them to a clock read and a push -----
+
     def _on_mouse_click(self, x, y, button, pressed):
         if pressed and self.is_recording:
-            action_data = {
-                "type": "mouse_click",
-                "x": x,
-                "y": y,
-                "button": str(button),
-                "time": time.time() - self.start_time
-            }
-            self.current_test.steps.append(action_data)
-            print(f"Recorded mouse click: {action_data}")
+            started = time.perf_counter_ns()
+            self.events.push((CLICK, started, x, y, button), started)
 
     def _on_mouse_move(self, x, y):
-        # Optionally record mouse movements, but can generate a lot of data
-        # if self.is_recording:
-        #     action_data = {
-        #         "type": "mouse_move",
-        #         "x": x,
-        #         "y": y,
-        #         "time": time.time() - self.start_time
-        #     }
-        #     self.current_test.steps.append(action_data)
-        #     print(f"Recorded mouse move: {action_data}")
-        pass # Not recording mouse move for now
+        # Moves arrive at a high rate: only recorded when enabled, and then simplified.
+        if self.is_recording and self.paths:
+            started = time.perf_counter_ns()
+            self.events.push((MOVE, started, x, y), started)
 
     def _on_key_press(self, key):
         if self.is_recording:
-            try:
-                action_data = {
-                    "type": "keyboard_press",
-                    "key": key.char,
-                    "time": time.time() - self.start_time
-                }
-            except AttributeError:
-                action_data = {
-                    "type": "keyboard_press",
-                    "key": str(key),
-                    "time": time.time() - self.start_time
-                }
-            self.current_test.steps.append(action_data)
-            print(f"Recorded key press: {action_data}")
+            started = time.perf_counter_ns()
+            self.events.push((KEY, started, key), started)
+
+    def _on_key_release(self, key):
+        # Releases only matter to find chords and held keys when coalescing.
+        if self.is_recording and self.coalesce:
+            started = time.perf_counter_ns()
+            self.events.push((RELEASE, started, key), started)
+
+    # ----- consumer -----
+
+    def _consume(self):
+        while True:
+            self.events.ready.wait(0.05)
+            stopping = self._stopping
+            for event in self.events.drain():
+                try:
+                    self._handle(event)
+                except Exception:
+                    logging.exception(f"Could not record event {event!r}")
+            if stopping:
+                return
+
+    def _handle(self, event):
+        # Callbacks on different listener threads read the clock before the push, so
+        # an event can be queued just behind a later one: it takes that one's time.
+        self._last_ns = max(event[1], self._last_ns)
+        kind, at = event[0], (self._last_ns - self._start_ns) / 1e9
+        if kind == MOVE:
+            step = self.paths.add(event[2], event[3], at)
+            if step:
+                self._append(step)
+            return
+        # A pending path is stored before the next click or key press so steps stay in order.
+        self._flush_path()
+        if kind == CLICK:
+            self._append({"type": "mouse_click", "x": event[2], "y": event[3], "button": str(event[4]), "time": at})
+        else:
+            key = event[2]
+            char = getattr(key, "char", None)
+            self._append({"type": "keyboard_press" if kind == KEY else "keyboard_release",
+                          "key": char if char is not None else str(key), "time": at})
+
+    def _flush_path(self):
+        step = self.paths.flush() if self.paths else None
+        if step:
+            self._append(step)
+
+    def _append(self, step):
+        if self.log:
+            self.log.append(step)
+        else:
+            self.current_test.steps.append(step)
+        logging.debug(f"Recorded step: {step}")
+        if self.on_step:
+            self.on_step(step)
 
     def start_listeners(self):
         if self.is_recording:
@@ -79,7 +242,8 @@ class Recorder:
                 on_move=self._on_mouse_move
             )
             self.keyboard_listener = keyboard.Listener(
-                on_press=self._on_key_press
+                on_press=self._on_key_press,
+                on_release=self._on_key_release
             )
             self.mouse_listener.start()
             self.keyboard_listener.start()
@@ -87,4 +251,4 @@ class Recorder:
     def start(self, test):
         self.start_recording(test)
         listener_thread = Thread(target=self.start_listeners)
-        listener_thread.start()
\ No newline at end of file
+        listener_thread.start()
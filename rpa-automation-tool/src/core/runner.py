@@ -1,28 +1,295 @@
+import heapq
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
 from typing import List
 from src.models.project import Project
 from src.models.test import Test
-from src.models.step import Step
 
-class Runner:
-    def run(self, project: Project) -> List[str]:
-        results = []
-        for test in project.tests:
-            result = self._run_test(test)
-            results.append(result)
-        return results
+BACKENDS = ("thread", "process")
 
-    def _run_test(self, test: Test) -> str:
-        
-        test_result = "Passed"
-        for step in test.steps:
-            
-            step_result = self._run_step(step)
-            step.result = step_result
+
+class DependencyError(ValueError):
+    """Raised for test dependencies that are unknown or form a cycle."""
+
+
+class TestResult:
+    """
+    The outcome of one test run.  Every run builds its own TestResult from
+    a snapshot of the test, so parallel runs never share mutable state.
+    """
+
+    __test__ = False  # not a pytest test class
+
+    def __init__(self, test_id, name, suite_id=None, result="Passed", step_results=None, duration=0.0, error=None,
+                 step_durations=None, cached=False):
+        self.test_id = test_id
+        self.name = name
+        self.suite_id = suite_id
+        self.result = result
+        self.step_results = step_results if step_results is not None else []
+        self.step_durations = step_durations if step_durations is not None else []
+        self.duration = duration
+        self.error = error
+        # True when the outcome came from the ResultCache instead of a run.
+        self.cached = cached
+
+    def to_dict(self):
+        return {
+            'test_id': self.test_id,
+            'suite_id': self.suite_id,
+            'name': self.name,
+            'result': self.result,
+            'step_results': self.step_results,
+            'step_durations': self.step_durations,
+            'duration': self.duration,
+            'error': self.error,
+            'cached': self.cached,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+
+def run_test_snapshot(test_data, suite_id=None, emit=None):
+    """
+    Runs one test from its to_dict() snapshot.  Module level so a process
+    pool can pickle it.  ``emit(event)`` receives progress events as they
+    happen (see result_events for their shape).
+    """
+    started = time.perf_counter_ns()
+    result = TestResult(test_data['id'], test_data.get('name'), suite_id)
+    if emit:
+        emit(_test_event(result, "started"))
+    try:
+        for index, step in enumerate(test_data.get('steps', [])):
+            step_started = time.perf_counter_ns()
+            step_result = run_step(step)
+            result.step_results.append(step_result)
+            result.step_durations.append((time.perf_counter_ns() - step_started) / 1e9)
             if step_result != "Passed":
-                test_result = "Failed"
-        test.result = test_result
+                result.result = "Failed"
+            if emit:
+                emit(_step_event(result, index))
+    except Exception as e:
+        result.result = "Error"
+        result.error = str(e)
+    result.duration = (time.perf_counter_ns() - started) / 1e9
+    if emit:
+        emit(_test_event(result, _outcome(result.result)))
+    return result
+
+
+def result_events(result):
+    """
+    The events of a finished test, for runs whose steps could not be
+    reported live (process pools):
+
+        {'type': 'started', 'scope': 'test', 'test_id', 'suite_id', 'name'}
+        {'type': 'passed' | 'failed', 'scope': 'step', ..., 'index', 'duration'}
+        {'type': 'passed' | 'failed', 'scope': 'test', ..., 'duration'[, 'error']}
+
+    A test that raised is reported as failed with its ``error``; ``error`` is
+    not used as an event type because EventSource reserves that name.  A
+    test that never ran has the single event
+    ``{'type': 'skipped', 'scope': 'test', ..., 'error'}``, and a cache hit
+    a single ``passed`` test event with ``'cached': True``.
+    """
+    if result.result == "Skipped":
+        return [_test_event(result, "skipped")]
+    if result.cached:
+        return [_test_event(result, "passed")]
+    events = [_test_event(result, "started")]
+    events.extend(_step_event(result, index) for index in range(len(result.step_results)))
+    events.append(_test_event(result, _outcome(result.result)))
+    return events
+
+
+def _outcome(result):
+    return 'passed' if result == "Passed" else 'failed'
+
+
+def skipped_result(test_data, suite_id, reason):
+    return TestResult(test_data['id'], test_data.get('name'), suite_id, result="Skipped", error=reason)
+
+
+def find_cycle(depends_on):
+    """
+    Returns the ids of a dependency cycle in ``{test_id: [dependency ids]}``
+    (first id repeated at the end), or None.  Ids missing from the mapping
+    are ignored.
+    """
+    done, on_path = set(), []
+    for root in depends_on:
+        if root in done:
+            continue
+        stack = [(root, iter(depends_on[root]))]
+        on_path.append(root)
+        while stack:
+            node, dependencies = stack[-1]
+            for dependency in dependencies:
+                if dependency in on_path:
+                    return on_path[on_path.index(dependency):] + [dependency]
+                if dependency in depends_on and dependency not in done:
+                    on_path.append(dependency)
+                    stack.append((dependency, iter(depends_on[dependency])))
+                    break
+            else:
+                stack.pop()
+                on_path.pop()
+                done.add(node)
+    return None
+
 
-        return test_result
-    
-    def _run_step(self, step: Step) -> str:
-        return "Passed"
\ No newline at end of file
+def dependency_graph(snapshots):
+    """
+    Returns ``(dependencies, dependents)``: for each ``(suite_id, test_data)``
+    pair, the indexes of the snapshots it depends on and of those depending
+    on it.  Dependencies on tests outside ``snapshots`` are ignored, so a
+    suite or a single test can still run on its own.  Raises DependencyError
+    on a cycle.
+    """
+    index = {test_data['id']: i for i, (_, test_data) in enumerate(snapshots)}
+    dependencies = [[index[test_id] for test_id in dict.fromkeys(test_data.get('depends_on') or ()) if test_id in index]
+                    for _, test_data in snapshots]
+    cycle = find_cycle({snapshots[i][1]['id']: [snapshots[d][1]['id'] for d in deps]
+                        for i, deps in enumerate(dependencies)})
+    if cycle:
+        raise DependencyError(f"Test dependencies form a cycle: {' -> '.join(cycle)}")
+    dependents = [[] for _ in snapshots]
+    for i, deps in enumerate(dependencies):
+        for d in deps:
+            dependents[d].append(i)
+    return dependencies, dependents
+
+
+def _test_event(result, type):
+    event = {'type': type, 'scope': 'test', 'test_id': result.test_id, 'suite_id': result.suite_id,
+             'name': result.name}
+    if type != "started":
+        event['duration'] = result.duration
+        if result.error:
+            event['error'] = result.error
+        if result.cached:
+            event['cached'] = True
+    return event
+
+
+def _step_event(result, index):
+    return {'type': _outcome(result.step_results[index]), 'scope': 'step',
+            'test_id': result.test_id, 'suite_id': result.suite_id, 'index': index,
+            'duration': result.step_durations[index]}
+
+
+def run_step(step) -> str:
+    return "Passed"
+
+
+class Runner:
+    """
+    Runs tests either one at a time (``max_workers=1``) or on a thread or
+    process pool.  Results always come back in declaration order: suite by
+    suite, test by test, however the pool schedules them.
+
+    Tests run as a dependency graph: a test starts once every test in its
+    ``depends_on`` has passed, independent tests run side by side, and a
+    test whose dependency failed or was skipped is reported as ``Skipped``
+    without running.  With ``fail_fast`` the first failure also skips every
+    test that has not started yet.
+    """
+
+    def __init__(self, max_workers=1, backend="thread", fail_fast=False):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown runner backend: {backend}")
+        self.max_workers = max(1, int(max_workers))
+        self.backend = backend
+        self.fail_fast = fail_fast
+
+    def with_options(self, max_workers=None, backend=None, fail_fast=None):
+        """A Runner like this one with the given settings changed."""
+        return Runner(max_workers or self.max_workers, backend or self.backend,
+                      self.fail_fast if fail_fast is None else fail_fast)
+
+    def run(self, project: Project) -> List[TestResult]:
+        """Runs every test of every suite in the project."""
+        return self.run_snapshots(
+            [(suite.id, test.to_dict()) for suite in project.test_suites for test in suite.tests])
+
+    def run_suite(self, suite) -> List[TestResult]:
+        return self.run_snapshots([(suite.id, test.to_dict()) for test in suite.tests])
+
+    def run_snapshots(self, snapshots, on_result=None, should_stop=None, emit=None) -> List[TestResult]:
+        """
+        Runs ``(suite_id, test_data)`` pairs and returns their results in the
+        same order.  ``on_result(result)`` is called as each result is
+        collected; once ``should_stop()`` returns True no further tests start
+        and the results collected so far are returned.  ``emit`` receives
+        test and step events: live on threads, per finished test on processes.
+        """
+        dependencies, dependents = dependency_graph(snapshots)
+        pending = [len(deps) for deps in dependencies]
+        # Ready tests start in declaration order.
+        ready = [i for i, count in enumerate(pending) if count == 0]
+        results = [None] * len(snapshots)
+        failed = []
+        pooled = self.max_workers > 1 and len(snapshots) > 1
+        live = emit if not pooled or self.backend == "thread" else None
+
+        def collect(i, result):
+            results[i] = result
+            if emit and (result.result == "Skipped" or not live):
+                for event in result_events(result):
+                    emit(event)
+            if on_result:
+                on_result(result)
+            if result.result not in ("Passed", "Skipped"):
+                failed.append(i)
+            for j in dependents[i]:
+                pending[j] -= 1
+                if pending[j] == 0:
+                    heapq.heappush(ready, j)
+
+        def stopping():
+            return (self.fail_fast and failed) or (should_stop and should_stop())
+
+        def next_ready():
+            # Pops the next test to start, skipping those whose dependencies did not pass.
+            while ready and not stopping():
+                i = heapq.heappop(ready)
+                suite_id, test_data = snapshots[i]
+                blocked = [results[d] for d in dependencies[i] if results[d].result != "Passed"]
+                if not blocked:
+                    return i
+                collect(i, skipped_result(test_data, suite_id, f"Dependency {blocked[0].name!r} did not pass"))
+            return None
+
+        if not pooled:
+            while (i := next_ready()) is not None:
+                collect(i, run_test_snapshot(snapshots[i][1], snapshots[i][0], live))
+        else:
+            pool_class = ProcessPoolExecutor if self.backend == "process" else ThreadPoolExecutor
+            with pool_class(max_workers=min(self.max_workers, len(snapshots))) as pool:
+                running = {}
+                while True:
+                    while (i := next_ready()) is not None:
+                        running[pool.submit(run_test_snapshot, snapshots[i][1], snapshots[i][0], live)] = i
+                    if stopping():
+                        for future in running:
+                            future.cancel()
+                    running = {future: i for future, i in running.items() if not future.cancelled()}
+                    if not running:
+                        break
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        collect(running.pop(future), future.result())
+        if self.fail_fast and failed:
+            reason = f"Fail-fast after {results[failed[0]].name!r} failed"
+            for i, (suite_id, test_data) in enumerate(snapshots):
+                if results[i] is None:
+                    collect(i, skipped_result(test_data, suite_id, reason))
+        return [result for result in results if result is not None]
+
+    def _run_test(self, test: Test) -> str:
+        result = run_test_snapshot(test.to_dict())
+        test.result = result.result
+        return result.result
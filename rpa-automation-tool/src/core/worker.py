@@ -0,0 +1,62 @@
+"""
+Runs tests for a Coordinator (src/core/coordinator.py):
+
+    python -m src.core.worker --connect HOST:PORT [--authkey KEY] [--workers N]
+
+The key defaults to the RPA_COORDINATOR_KEY environment variable.
+"""
+import argparse
+import logging
+import os
+import socket
+from multiprocessing.connection import Client
+from .coordinator import parse_address
+from .runner import Runner
+
+
+def run_worker(address, authkey, name=None, max_workers=1, backend="thread"):
+    """Runs shards from the coordinator at ``address`` until it says stop; returns how many ran."""
+    name = name or f"{socket.gethostname()}-{os.getpid()}"
+    shards = 0
+    with Client(address, authkey=authkey) as conn:
+        conn.send({'type': 'hello', 'name': name})
+        while (message := conn.recv())['type'] != 'stop':
+            if message['type'] != 'shard':
+                continue  # a cancel that arrived after its shard was done
+            run = message.get('run')
+            cancelled = False
+
+            def should_stop():
+                # The only message that can arrive while a shard runs is a cancel; one
+                # for an earlier run (sent after its shard was done) is ignored.
+                nonlocal cancelled
+                while not cancelled and conn.poll():
+                    cancel = conn.recv()
+                    cancelled = cancel['type'] == 'cancel' and cancel.get('run') == run
+                return cancelled
+            runner = Runner(max_workers, backend, message['fail_fast'])
+            runner.run_snapshots(message['tests'], lambda result: conn.send({'type': 'result', 'result': result.to_dict()}),
+                                 should_stop)
+            conn.send({'type': 'done'})
+            shards += 1
+    logging.info(f"Worker {name} ran {shards} shards")
+    return shards
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run RPA tests for a coordinator.")
+    parser.add_argument("--connect", required=True, help="coordinator address, HOST:PORT")
+    parser.add_argument("--authkey", default=os.environ.get("RPA_COORDINATOR_KEY"),
+                        help="shared secret (default: $RPA_COORDINATOR_KEY)")
+    parser.add_argument("--name", help="worker name shown in the coordinator's logs")
+    parser.add_argument("--workers", type=int, default=1, help="tests to run at once")
+    parser.add_argument("--backend", choices=("thread", "process"), default="thread")
+    args = parser.parse_args(argv)
+    if not args.authkey:
+        parser.error("--authkey or RPA_COORDINATOR_KEY is required")
+    logging.basicConfig(level=logging.INFO)
+    run_worker(parse_address(args.connect), args.authkey.encode(), args.name, args.workers, args.backend)
+
+
+if __name__ == "__main__":
+    main()
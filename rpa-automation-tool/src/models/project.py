@@ -7,16 +7,19 @@ class Project:
         self.name = name or "Unnamed Project"  # Ensure name is not None
         self.description = description  # Add description attribute
         self.test_suites = test_suites if test_suites is not None else []
+        # Legacy run history; runs are now recorded in a RunHistory (src/utils/history.py).
         self.history = history if history is not None else []
 
     def to_dict(self):
-        return {
+        data = {
             'id': self.id,
             'name': self.name,
             'test_suites': [suite.to_dict() for suite in self.test_suites],
-            'history': self.history,
             'description': self.description
         }
+        if self.history:
+            data['history'] = self.history
+        return data
 
     @classmethod
     def from_dict(cls, data):
@@ -1,6 +1,203 @@
+from array import array
+from collections.abc import MutableSequence
+
+_MISSING = object()
+
+# JSON keys a step may carry, in the order to_dict() writes them.  Recorded
+# events use "type"/"x"/"y"/"button"/"key"/"time"; API-authored steps use
+# "action"/"target"/"value"; the runner fills in "duration" and "result".
+STRING_FIELDS = ('type', 'action', 'target', 'value', 'key', 'button', 'description', 'result')
+NUMBER_FIELDS = ('x', 'y', 'time', 'duration')
+FIELDS = STRING_FIELDS + NUMBER_FIELDS
+
+
+def _fits_double(value):
+    # Ints a double cannot hold exactly go to the per-step dict instead.
+    if isinstance(value, float):
+        return True
+    try:
+        return float(value) == value
+    except OverflowError:
+        return False
+
+
 class Step:
-    def __init__(self, description, type=None, duration=None, result=None):
-        self.description = description
-        self.type = type
-        self.duration = duration
-        self.result = result
\ No newline at end of file
+    """
+    A single test step with typed fields and no per-instance __dict__.
+
+    Absent fields read as None; a bitmask records which fields are present,
+    so they stay absent in to_dict().  Keys outside FIELDS are kept in
+    ``extra``, so any step dict round-trips.
+    """
+
+    __slots__ = FIELDS + ('extra', '_present')
+
+    def __init__(self, description=_MISSING, type=_MISSING, duration=_MISSING, result=_MISSING, **fields):
+        object.__setattr__(self, '_present', 0)
+        values = dict(fields, description=description, type=type, duration=duration, result=result)
+        for name in FIELDS:
+            value = values.pop(name, _MISSING)
+            if value is _MISSING:
+                object.__setattr__(self, name, None)
+            else:
+                setattr(self, name, value)
+        self.extra = values or None
+
+    def __setattr__(self, name, value):
+        if name in FIELDS:
+            object.__setattr__(self, '_present', self._present | 1 << FIELDS.index(name))
+        object.__setattr__(self, name, value)
+
+    def has(self, name):
+        """Whether the step has the field ``name``, even if its value is None."""
+        if name in FIELDS:
+            return bool(self._present & 1 << FIELDS.index(name))
+        return name in (self.extra or {})
+
+    def get(self, name, default=None):
+        if not self.has(name):
+            return default
+        return getattr(self, name) if name in FIELDS else self.extra[name]
+
+    def to_dict(self):
+        data = {name: getattr(self, name) for name in FIELDS if self.has(name)}
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+
+class StepColumns(MutableSequence):
+    """
+    Array-backed storage for a test's steps.
+
+    Behaves like the plain list of step dicts it replaces: items go in and
+    come out as dicts.  Internally every field is a column; strings are
+    interned into a shared table and referenced by index, numbers live in
+    ``array('d')`` and a 16-bit mask per step records which fields are
+    present (and which numbers were ints).  Values that do not fit their
+    column, such as a None result, fall back to a sparse per-step dict.
+    Returned dicts are copies: assign ``steps[i] = step`` to change a step.
+    """
+
+    _INT_BIT = len(FIELDS)
+
+    def __init__(self, steps=()):
+        self._mask = array('H')
+        self._strings = {name: array('I') for name in STRING_FIELDS}
+        self._numbers = {name: array('d') for name in NUMBER_FIELDS}
+        self._table = []
+        self._interned = {}
+        self._extra = {}
+        for step in steps:
+            self.append(step)
+
+    def __len__(self):
+        return len(self._mask)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        index = self._index(index)
+        mask = self._mask[index]
+        data = {}
+        for bit, name in enumerate(FIELDS):
+            if mask & (1 << bit):
+                if name in self._strings:
+                    data[name] = self._table[self._strings[name][index]]
+                else:
+                    value = self._numbers[name][index]
+                    if mask & (1 << (self._INT_BIT + NUMBER_FIELDS.index(name))):
+                        value = int(value)
+                    data[name] = value
+        extra = self._extra.get(index)
+        if extra:
+            data.update(extra)
+        return data
+
+    def __setitem__(self, index, step):
+        index = self._index(index)
+        self._mask[index], extra = self._encode(step, index)
+        self._extra.pop(index, None)
+        if extra:
+            self._extra[index] = extra
+
+    def __delitem__(self, index):
+        index = self._index(index)
+        del self._mask[index]
+        for column in self._strings.values():
+            del column[index]
+        for column in self._numbers.values():
+            del column[index]
+        self._extra = {(i - 1 if i > index else i): extra for i, extra in self._extra.items() if i != index}
+
+    def insert(self, index, step):
+        index = max(0, min(len(self), index if index >= 0 else len(self) + index))
+        self._mask.insert(index, 0)
+        for column in self._strings.values():
+            column.insert(index, 0)
+        for column in self._numbers.values():
+            column.insert(index, 0.0)
+        self._extra = {(i + 1 if i >= index else i): extra for i, extra in self._extra.items()}
+        self[index] = step
+
+    def append(self, step):
+        # Cheaper than the generic insert() at the end.
+        index = len(self._mask)
+        self._mask.append(0)
+        for column in self._strings.values():
+            column.append(0)
+        for column in self._numbers.values():
+            column.append(0.0)
+        self[index] = step
+
+    def __eq__(self, other):
+        if isinstance(other, (list, StepColumns)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self):
+        return f"StepColumns({len(self)} steps)"
+
+    def step(self, index):
+        """Returns the step at ``index`` as a Step object."""
+        return Step.from_dict(self[index])
+
+    def to_list(self):
+        return list(self)
+
+    def _index(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("step index out of range")
+        return index
+
+    def _intern(self, value):
+        ref = self._interned.get(value)
+        if ref is None:
+            ref = self._interned[value] = len(self._table)
+            self._table.append(value)
+        return ref
+
+    def _encode(self, step, index):
+        if isinstance(step, Step):
+            step = step.to_dict()
+        mask = 0
+        extra = {}
+        for key, value in step.items():
+            if key in self._strings and isinstance(value, str):
+                self._strings[key][index] = self._intern(value)
+                mask |= 1 << FIELDS.index(key)
+            elif key in self._numbers and isinstance(value, (int, float)) and not isinstance(value, bool) \
+                    and _fits_double(value):
+                self._numbers[key][index] = value
+                mask |= 1 << FIELDS.index(key)
+                if isinstance(value, int):
+                    mask |= 1 << (self._INT_BIT + NUMBER_FIELDS.index(key))
+            else:
+                extra[key] = value
+        return mask, extra
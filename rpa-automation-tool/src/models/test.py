@@ -1,12 +1,18 @@
 from ..core.recorder import Recorder
+from .step import StepColumns
 import uuid
 
 class Test:
-    def __init__(self, name, id=None, steps=None, result=None):
+    # Step lists at least this long are kept columnar when loaded.
+    columnar_threshold = 1000
+
+    def __init__(self, name, id=None, steps=None, result=None, depends_on=None):
         self.id = id if id is not None else str(uuid.uuid4())
         self.name = name
         self.steps = steps if steps is not None else []
         self.result = result
+        # Ids of tests (in the same project) that must pass before this one runs.
+        self.depends_on = list(depends_on) if depends_on else []
         self.is_recording = False
 
     def record(self, steps=None):
@@ -18,19 +24,30 @@ class Test:
         self.is_recording = False
         self.steps = self.recorder.stop()
 
+    def compact_steps(self):
+        """Switches the step list to the array-backed StepColumns form."""
+        if not isinstance(self.steps, StepColumns):
+            self.steps = StepColumns(self.steps)
+        return self.steps
+
     def to_dict(self):
         return {
             'id': self.id,
             'name': self.name,
-            'steps': self.steps,
+            'steps': list(self.steps) if isinstance(self.steps, StepColumns) else self.steps,
             'result': self.result,
+            'depends_on': self.depends_on,
         }
 
     @classmethod
     def from_dict(cls, data):
-        return cls(
+        test = cls(
             id=data.get('id', str(uuid.uuid4())),
             name=data.get('name'),
             steps=data.get('steps', []),
             result=data.get('result'),
+            depends_on=data.get('depends_on'),
         )
+        if len(test.steps) >= cls.columnar_threshold:
+            test.compact_steps()
+        return test
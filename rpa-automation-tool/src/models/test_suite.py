@@ -3,13 +3,14 @@ from .test import Test
 
 
 class TestSuite:
-    def __init__(self, name, description="", id=None):
+    def __init__(self, name, description="", id=None, tests=None):
         if id is None:
             self.id = str(uuid.uuid4())
         else:
             self.id = id
         self.name = name
-        self.tests = []
+        self.description = description
+        self.tests = tests if tests is not None else []
 
     def to_dict(self):  # Added description to to_dict
         return {"id": self.id, "name": self.name, "description": self.description, "tests": [test.to_dict() if hasattr(test, 'to_dict') else test.name for test in self.tests]}
@@ -22,4 +23,4 @@ class TestSuite:
                 tests.append(Test.from_dict(test_data))
             else:
                 tests.append(Test(name=test_data.get('name'))) # Assuming test_data is a dictionary with 'name'
-        return cls(name=data.get('name'), id=data.get('id'), tests=tests)
\ No newline at end of file
+        return cls(name=data.get('name'), description=data.get('description', ""), id=data.get('id'), tests=tests)
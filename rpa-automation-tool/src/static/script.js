@@ -110,29 +110,61 @@ class ProjectManager {
  this.runTest(testId);
     }
 
+    // Follows X-Next-Cursor until the listing is exhausted, handing each
+    // page to onPage as it arrives so large lists render incrementally.
+    fetchPages(url, onPage, pageSize = 100) {
+        const separator = url.includes('?') ? '&' : '?';
+        const fetchPage = cursor => {
+            let pageUrl = `${url}${separator}limit=${pageSize}`;
+            if (cursor) {
+                pageUrl += `&cursor=${encodeURIComponent(cursor)}`;
+            }
+            return fetch(pageUrl).then(response => {
+                const nextCursor = response.headers.get('X-Next-Cursor');
+                return response.json().then(page => {
+                    onPage(page);
+                    if (nextCursor) {
+                        return fetchPage(nextCursor);
+                    }
+                });
+            });
+        };
+        return fetchPage(null);
+    }
+
     loadProjects() {
-        fetch('/api/projects')
-            .then(response => response.json())
-            .then(data => {
- if (this.currentPage === 'index') {
- this.projects = data;
- this.renderProjects(data);
- } else if (this.currentPage === 'project') {
- const projectId = window.location.pathname.split('/')[2];
- this.currentProject = data.find(project => project.id === projectId);
- this.renderTestSuites(this.currentProject.test_suites);
- } else if (this.currentPage === 'test_suite') {
- const projectId = window.location.pathname.split('/')[2];
- const suiteId = window.location.pathname.split('/')[4];
- this.currentProject = data.find(project => project.id === projectId);
- if (this.currentProject) {
- this.currentTestSuite = this.currentProject.test_suites.find(suite => suite.id === suiteId);
- if (this.currentTestSuite) {
- this.renderTests(this.currentTestSuite.tests);
- }
- }
- }
+        if (this.currentPage === 'index') {
+            const projects = [];
+            this.fetchPages('/api/projects?view=summary', page => {
+                projects.push(...page);
+                this.projects = projects;
+                this.renderProjects(projects);
             });
+        } else if (this.currentPage === 'project') {
+            fetch(`/api/projects/${this.projectId}?view=summary`)
+                .then(response => response.json())
+                .then(project => {
+                    this.currentProject = project;
+                    const suites = [];
+                    return this.fetchPages(`/api/projects/${this.projectId}/suites?view=summary`, page => {
+                        suites.push(...page);
+                        this.renderTestSuites(suites);
+                    });
+                });
+        } else if (this.currentPage === 'test_suite') {
+            this.currentProject = { id: this.projectId };
+            fetch(`/api/projects/${this.projectId}/suites/${this.suiteId}?view=summary`)
+                .then(response => response.json())
+                .then(suite => {
+                    if (suite.error) return;
+                    this.currentTestSuite = suite;
+                    const tests = [];
+                    return this.fetchPages(`/api/projects/${this.projectId}/suites/${this.suiteId}/tests?view=summary`, page => {
+                        tests.push(...page);
+                        this.renderTests(tests);
+                    });
+                });
+        }
     }
 
     createProject(projectName) {
@@ -188,8 +220,9 @@ class ProjectManager {
                 if (data.error) {
                     alert(`Error creating test: ${data.error}`);
                 } else {
-                    this.renderTests();
-                });
+                    this.loadProjects(); // Reload to show the new test
+                }
+            });
         }
     }
 
@@ -251,11 +284,50 @@ class ProjectManager {
                 method: 'POST'
             })
  .then(response => response.json())
- .then(data => console.log('Test run result:', data))
+ .then(data => this.watchJob(data.job_id))
+ .then(job => console.log('Test run result:', job))
  .catch(error => console.error('Error running test:', error));
  }
     }
 
+    handleRunAllTestsButtonClick() {
+        if (!this.currentProject) return;
+        fetch(`/api/projects/${this.currentProject.id}/run`, { method: 'POST' })
+            .then(response => response.json())
+            .then(data => {
+                if (data.error) {
+                    alert(`Error running tests: ${data.error}`);
+                    return;
+                }
+                return this.watchJob(data.job_id).then(job => console.log('Project run result:', job));
+            })
+            .catch(error => console.error('Error running tests:', error));
+    }
+
+    // Runs are queued as jobs: follow the job's event stream until it
+    // finishes, then reload so the new results show up.  onEvent receives
+    // every test and step event along the way.
+    watchJob(jobId, onEvent = () => {}) {
+        return new Promise((resolve, reject) => {
+            const source = new EventSource(`/api/jobs/${jobId}/events`);
+            ['started', 'passed', 'failed', 'skipped'].forEach(type => {
+                source.addEventListener(type, event => onEvent(JSON.parse(event.data)));
+            });
+            source.addEventListener('finished', event => {
+                source.close();
+                this.loadProjects();
+                resolve(JSON.parse(event.data));
+            });
+            source.onerror = () => {
+                // EventSource reconnects with Last-Event-ID on its own; give up
+                // only once the server has closed the stream for good.
+                if (source.readyState === EventSource.CLOSED) {
+                    reject(new Error(`Lost the event stream of job ${jobId}`));
+                }
+            };
+        });
+    }
+
  renderProjects(projects) {
         const projectsTableBody = document.querySelector('#projects-table tbody');
         if (projectsTableBody) {
@@ -309,7 +381,7 @@ class ProjectManager {
                 row.appendChild(nameCell);
 
                 const stepsCell = document.createElement('td');
-                stepsCell.textContent = test.steps ? test.steps.length : 0; // Display number of steps
+                stepsCell.textContent = test.step_count ?? (test.steps ? test.steps.length : 0); // Display number of steps
                 row.appendChild(stepsCell);
 
                 const resultCell = document.createElement('td');
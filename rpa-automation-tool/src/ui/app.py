@@ -1,4 +1,6 @@
+import json
 import tkinter as tk
+from threading import Thread
 from tkinter import ttk
 import requests
 
@@ -25,6 +27,7 @@ class RPAApp:
         self.projects = []
         self.test_suites = []
         self.recorded_actions = []
+        self._etag_cache = {}  # url -> (etag, response); replayed on 304
 
     def create_menu(self):
         menu_bar = tk.Menu(self.root)
@@ -79,11 +82,42 @@ class RPAApp:
 
     def send_api_request(self, method, endpoint, data=None):
         try:
+            if method == "GET":
+                return self.conditional_get(f"{self.API_BASE_URL}/{endpoint}").json()
             response = requests.request(method, f"{self.API_BASE_URL}/{endpoint}", json=data)
             response.raise_for_status()  # Raise an exception for bad status codes (4xx or 5xx)
             return response.json()
         except requests.exceptions.RequestException as e:
             self.status_var.set(f"API Error: {e}")
+
+    def conditional_get(self, url, params=None):
+        """GETs ``url``, revalidating with If-None-Match and reusing the cached response on 304."""
+        key = requests.Request("GET", url, params=params).prepare().url
+        cached = self._etag_cache.get(key)
+        headers = {"If-None-Match": cached[0]} if cached else {}
+        response = requests.get(url, params=params, headers=headers)
+        if response.status_code == 304 and cached:
+            return cached[1]
+        response.raise_for_status()
+        if response.headers.get("ETag"):
+            self._etag_cache[key] = (response.headers["ETag"], response)
+        return response
+
+    def iter_api_pages(self, endpoint, params=None, page_size=100):
+        """Yields successive pages of a list endpoint, following X-Next-Cursor."""
+        params = dict(params or {}, limit=page_size)
+        while True:
+            try:
+                response = self.conditional_get(f"{self.API_BASE_URL}/{endpoint}", params=params)
+            except requests.exceptions.RequestException as e:
+                self.status_var.set(f"API Error: {e}")
+                return
+            yield response.json()
+            cursor = response.headers.get("X-Next-Cursor")
+            if not cursor:
+                return
+            params["cursor"] = cursor
+
     def start_recording(self):
         self.status_var.set("Recording...")
         self.is_recording = True
@@ -150,11 +184,12 @@ class RPAApp:
             # TODO: Update UI to show new project
 
     def get_projects(self):
-        """Fetches all projects from the API."""
-        response = self.send_api_request("GET", "projects")
-        if response:
-            self.projects = response
+        """Fetches project summaries from the API a page at a time."""
+        self.projects = []
+        for page in self.iter_api_pages("projects", {"view": "summary"}):
+            self.projects.extend(page)
             self.status_var.set(f"Loaded {len(self.projects)} projects.")
+            self.root.update_idletasks()
             # TODO: Update UI to display projects
 
     def update_project(self, project_id, name, description):
@@ -187,10 +222,10 @@ class RPAApp:
             # TODO: Update UI for the specific project to show new suite
 
     def get_suites(self, project_id):
-        """Fetches all test suites for a project from the API."""
-        response = self.send_api_request("GET", f"projects/{project_id}/suites")
-        if response:
-            self.test_suites = response
+        """Fetches the test suites of a project from the API a page at a time."""
+        self.test_suites = []
+        for page in self.iter_api_pages(f"projects/{project_id}/suites", {"view": "summary"}):
+            self.test_suites.extend(page)
             self.status_var.set(f"Loaded {len(self.test_suites)} suites for project {project_id}.")
             # TODO: Update UI to display suites
 
@@ -257,13 +292,41 @@ class RPAApp:
         response = self.send_api_request("POST", f"projects/{project_id}/run")
         if response:
             self.status_var.set(f"Running all tests for project {project_id}...")
+            self.follow_job(response["job_id"])
 
     def run_suite(self, project_id, suite_id):
         """Runs all tests in a test suite via API."""
         response = self.send_api_request("POST", f"projects/{project_id}/suites/{suite_id}/run")
         if response:
             self.status_var.set(f"Running tests for suite {suite_id} in project {project_id}...")
+            self.follow_job(response["job_id"])
+
+    def follow_job(self, job_id):
+        """Streams a queued run's events into the status bar on a background thread."""
+        Thread(target=self._follow_job_events, args=(job_id,), daemon=True).start()
 
+    def _follow_job_events(self, job_id):
+        finished_tests = 0
+        try:
+            with requests.get(f"{self.API_BASE_URL}/jobs/{job_id}/events", stream=True, timeout=60) as response:
+                response.raise_for_status()
+                for line in response.iter_lines(decode_unicode=True):
+                    if not line or not line.startswith("data:"):
+                        continue
+                    event = json.loads(line[len("data:"):])
+                    if event["scope"] == "run" and event["type"] == "finished":
+                        text = f"Run {event['status']}: {event['completed']}/{event['total']} tests"
+                    elif event["scope"] == "test" and event["type"] != "started":
+                        finished_tests += 1
+                        text = f"{event['name']} {event['type']} in {event['duration']:.2f}s ({finished_tests} done)"
+                    elif event["scope"] == "step":
+                        text = f"Step {event['index'] + 1} {event['type']}"
+                    else:
+                        text = "Running..."
+                    # Tk is not thread-safe: hand the update to the main loop.
+                    self.root.after(0, self.status_var.set, text)
+        except requests.exceptions.RequestException as e:
+            self.root.after(0, self.status_var.set, f"API Error: {e}")
 
 if __name__ == "__main__":
     root = tk.Tk()
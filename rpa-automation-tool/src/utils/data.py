@@ -1,9 +1,10 @@
 import json
 import os
+import textwrap
 from ..models.project import Project
 from ..models.test_suite import TestSuite
 from ..models.test import Test
-from ..models.step import Step
+from ..models.step import Step, StepColumns
 import logging
 from json import JSONEncoder
 
@@ -15,16 +16,101 @@ def load_projects(filepath="projects.json"):
         logging.info(f"No project file found at {filepath}. Returning empty list.")
         return []
     logging.info(f"Loading projects from {filepath}")
+    return list(iter_projects(filepath))
+
+def iter_projects(filepath="projects.json", chunk_size=1 << 16):
+    """
+    Yields projects from a JSON file one at a time.  The file is parsed
+    incrementally, so only the project being built is held as raw dicts.
+    """
+    decoder = json.JSONDecoder()
     with open(filepath, "r") as f:
-        data = json.load(f)
-        return [Project.from_dict(project_data) for project_data in data]
+        buffer = ""
+        pos = 0
+        started = False
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos < len(buffer):
+                if not started:
+                    if buffer[pos] != "[":
+                        raise ValueError(f"{filepath} does not contain a list of projects")
+                    started = True
+                    pos += 1
+                    continue
+                if buffer[pos] == "]":
+                    return
+                try:
+                    project_data, pos = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    pass
+                else:
+                    yield Project.from_dict(project_data)
+                    continue
+            # Need more input: drop what has been consumed and read on.  A
+            # project larger than the buffer doubles the read so re-parsing
+            # it stays linear overall.
+            buffer = buffer[pos:]
+            pos = 0
+            chunk = f.read(max(chunk_size, len(buffer)))
+            if not chunk:
+                if not started:
+                    return
+                raise ValueError(f"Unexpected end of {filepath}")
+            buffer += chunk
+
+def save_projects(projects, filepath="projects.json", serialize=None):
+    """
+    Saves projects to a JSON file, atomically replacing the previous one.
+    ``serialize`` replaces ``project.to_dict()``, e.g. to read under a lock.
+    Projects are serialized and written one at a time.
+    """
+    logging.info(f"Saving {len(projects)} projects to {filepath}")
+    write_json_array_atomic(filepath, (serialize(p) if serialize else p.to_dict() for p in projects), indent=4)
+
+def write_json_atomic(filepath, data, **kwargs):
+    """
+    Writes JSON to a temp file, fsyncs it and renames it over ``filepath``,
+    so a crash mid-write leaves either the old or the new file, never a mix.
+    """
+    _write_atomic(filepath, lambda f: json.dump(data, f, cls=CustomEncoder, **kwargs))
+
+def write_json_array_atomic(filepath, items, indent=4):
+    """
+    Like write_json_atomic for a list, but encodes and writes one item at a
+    time.  The output is byte-for-byte what ``json.dump(list(items))`` gives.
+    """
+    def write(f):
+        prefix = " " * indent
+        first = True
+        for item in items:
+            f.write("[\n" if first else ",\n")
+            f.write(textwrap.indent(json.dumps(item, cls=CustomEncoder, indent=indent), prefix))
+            first = False
+        f.write("[]" if first else "\n]")
+    _write_atomic(filepath, write)
+
+def _write_atomic(filepath, write):
+    tmp_path = f"{filepath}.tmp"
+    with open(tmp_path, "w") as f:
+        write(f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, filepath)
+    _fsync_dir(os.path.dirname(os.path.abspath(filepath)))
 
-def save_projects(projects, filepath="projects.json"):
-    """Saves projects to a JSON file."""
-    project_data = [project.to_dict() for project in projects]
-    logging.info(f"Saving projects to {filepath}: {project_data}")
-    with open(filepath, "w") as f:
-        json.dump(project_data, f, indent=4, cls=CustomEncoder)
+def _fsync_dir(dirpath):
+    """Makes a rename durable; not supported on every platform."""
+    try:
+        fd = os.open(dirpath, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
 
 class CustomEncoder(JSONEncoder):
     def default(self, obj):
@@ -36,4 +122,6 @@ class CustomEncoder(JSONEncoder):
             return obj.to_dict()
         if isinstance(obj, Step):
             return obj.to_dict()
+        if isinstance(obj, StepColumns):
+            return list(obj)
         return JSONEncoder.default(self, obj)
\ No newline at end of file
@@ -0,0 +1,229 @@
+import json
+import os
+import shutil
+import threading
+import time
+from datetime import datetime, timezone
+from .data import write_json_atomic
+from .metrics import Histogram
+
+DAY = 24 * 3600
+# Bumped when the rollup layout changes; rollups of another format are rebuilt.
+ROLLUP_FORMAT = 2
+
+
+class InvalidTimeRange(ValueError):
+    """Raised for history queries with an unparsable or inverted time range."""
+
+
+def parse_time(value):
+    """Epoch seconds or an ISO 8601 date/datetime (UTC unless it says otherwise) -> epoch seconds."""
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        pass
+    try:
+        moment = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise InvalidTimeRange(f"Invalid time: {value}")
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def _day(at):
+    return datetime.fromtimestamp(at, timezone.utc).strftime("%Y-%m-%d")
+
+
+def _day_start(day):
+    return datetime.strptime(day, "%Y-%m-%d").replace(tzinfo=timezone.utc).timestamp()
+
+
+def _new_rollup(record):
+    return {'name': record.get('name'), 'suite_id': record.get('suite_id'), 'runs': 0, 'passed': 0, 'failed': 0,
+            'skipped': 0, 'durations': Histogram(), 'flips': 0, 'first': None, 'last': None}
+
+
+def _add(rollups, record):
+    rollup = rollups.get(record['test_id'])
+    if rollup is None:
+        rollup = rollups[record['test_id']] = _new_rollup(record)
+    rollup['runs'] += 1
+    rollup['name'] = record.get('name')
+    if record['result'] == "Skipped":
+        rollup['skipped'] += 1
+        return
+    outcome = "Passed" if record['result'] == "Passed" else "Failed"
+    rollup['passed' if outcome == "Passed" else 'failed'] += 1
+    rollup['durations'].observe(record.get('duration') or 0.0)
+    if rollup['last'] is not None and rollup['last'] != outcome:
+        rollup['flips'] += 1
+    rollup['first'] = rollup['first'] or outcome
+    rollup['last'] = outcome
+
+
+def _merge(total, rollup):
+    # ``rollup`` covers a later period than ``total``.
+    if total['last'] is not None and rollup['first'] is not None and total['last'] != rollup['first']:
+        total['flips'] += 1
+    for key in ('runs', 'passed', 'failed', 'skipped', 'flips'):
+        total[key] += rollup[key]
+    total['durations'].merge(rollup['durations'])
+    total['name'] = rollup['name']
+    total['first'] = total['first'] or rollup['first']
+    total['last'] = rollup['last'] or total['last']
+
+
+def _stats(test_id, rollup):
+    executed = rollup['passed'] + rollup['failed']
+    durations = rollup['durations']
+    return {
+        'test_id': test_id,
+        'suite_id': rollup['suite_id'],
+        'name': rollup['name'],
+        'runs': rollup['runs'],
+        'passed': rollup['passed'],
+        'failed': rollup['failed'],
+        'skipped': rollup['skipped'],
+        'pass_rate': rollup['passed'] / executed if executed else None,
+        'mean_duration': durations.sum / durations.count if durations.count else None,
+        'p95_duration': durations.quantile(0.95) if durations.count else None,
+        # Share of consecutive executions whose outcome differed from the one before.
+        'flakiness': rollup['flips'] / (executed - 1) if executed > 1 else 0.0,
+        'last_result': rollup['last'],
+    }
+
+
+class RunHistory:
+    """
+    Append-only run history, kept out of the project documents.
+
+    Every test result of a run becomes one JSON line in
+    ``<root>/<project id>/<YYYY-MM-DD>.jsonl`` (UTC days).  Next to each
+    segment, ``<YYYY-MM-DD>.rollup.json`` holds per-test totals for that day
+    (outcomes, a Histogram of durations, pass/fail flips), updated on every
+    append, so statistics over a range read one small file per day instead
+    of every run.  A rollup that does not match its segment's size, e.g. after a
+    crash between the two writes, is rebuilt from the segment.  Segments
+    older than ``retention_days`` are deleted as new days start.
+    """
+
+    def __init__(self, root="history", retention_days=None):
+        self.root = root
+        self.retention_days = retention_days
+        self._lock = threading.Lock()
+        self._last_day = None
+
+    def append(self, project_id, results, at=None):
+        """Records ``results`` (TestResults) of one run that finished at ``at``."""
+        at = time.time() if at is None else at
+        records = [{'at': at, 'test_id': r.test_id, 'suite_id': r.suite_id, 'name': r.name, 'result': r.result,
+                    'duration': r.duration, 'error': r.error} for r in results]
+        if not records:
+            return
+        day = _day(at)
+        with self._lock:
+            directory = os.path.join(self.root, project_id)
+            os.makedirs(directory, exist_ok=True)
+            rollups = self._rollups(project_id, day)
+            with open(self._segment(project_id, day), "a") as f:
+                f.write("".join(json.dumps(record) + "\n" for record in records))
+            for record in records:
+                _add(rollups, record)
+            self._save_rollups(project_id, day, rollups)
+            if self.retention_days and day != self._last_day:
+                self._last_day = day
+                self._prune(at - self.retention_days * DAY)
+
+    def runs(self, project_id, start=None, end=None, test_id=None, limit=100):
+        """Results recorded in ``[start, end)`` (epoch seconds), newest first."""
+        found = []
+        for day in reversed(self._days(project_id, start, end)):
+            lines = self._read(project_id, day)
+            for record in reversed(lines):
+                if (start is None or record['at'] >= start) and (end is None or record['at'] < end) \
+                        and (test_id is None or record['test_id'] == test_id):
+                    found.append(record)
+                    if len(found) >= limit:
+                        return found
+        return found
+
+    def stats(self, project_id, start=None, end=None, test_id=None):
+        """Per-test pass rate, mean/p95 duration and flakiness over ``[start, end)``."""
+        totals = {}
+        for day in self._days(project_id, start, end):
+            whole = (start is None or start <= _day_start(day)) and (end is None or end >= _day_start(day) + DAY)
+            if whole:
+                with self._lock:
+                    rollups = self._rollups(project_id, day)
+            else:
+                rollups = {}
+                for record in self._read(project_id, day):
+                    if (start is None or record['at'] >= start) and (end is None or record['at'] < end):
+                        _add(rollups, record)
+            for key, rollup in rollups.items():
+                if test_id is not None and key != test_id:
+                    continue
+                if key not in totals:
+                    totals[key] = _new_rollup(rollup)
+                _merge(totals[key], rollup)
+        return [_stats(key, rollup) for key, rollup in totals.items()]
+
+    def delete(self, project_id):
+        with self._lock:
+            shutil.rmtree(os.path.join(self.root, project_id), ignore_errors=True)
+
+    def _segment(self, project_id, day):
+        return os.path.join(self.root, project_id, f"{day}.jsonl")
+
+    def _rollup_path(self, project_id, day):
+        return os.path.join(self.root, project_id, f"{day}.rollup.json")
+
+    def _days(self, project_id, start, end):
+        directory = os.path.join(self.root, project_id)
+        if not os.path.isdir(directory):
+            return []
+        first = _day(start) if start is not None else ""
+        last = _day(end) if end is not None else "9999"
+        return sorted(name[:-len(".jsonl")] for name in os.listdir(directory)
+                      if name.endswith(".jsonl") and first <= name[:-len(".jsonl")] <= last)
+
+    def _read(self, project_id, day):
+        try:
+            with open(self._segment(project_id, day)) as f:
+                # A torn last line from a crash mid-append is skipped.
+                return [json.loads(line) for line in f if line.endswith("\n")]
+        except FileNotFoundError:
+            return []
+
+    def _rollups(self, project_id, day):
+        # Called with self._lock held.
+        segment = self._segment(project_id, day)
+        size = os.path.getsize(segment) if os.path.exists(segment) else 0
+        try:
+            with open(self._rollup_path(project_id, day)) as f:
+                saved = json.load(f)
+            if saved['size'] == size and saved.get('format') == ROLLUP_FORMAT:
+                return {test_id: dict(rollup, durations=Histogram.from_dict(rollup['durations']))
+                        for test_id, rollup in saved['tests'].items()}
+        except (OSError, ValueError, KeyError):
+            pass
+        rollups = {}
+        for record in self._read(project_id, day):
+            _add(rollups, record)
+        return rollups
+
+    def _save_rollups(self, project_id, day, rollups):
+        size = os.path.getsize(self._segment(project_id, day))
+        tests = {test_id: dict(rollup, durations=rollup['durations'].to_dict()) for test_id, rollup in rollups.items()}
+        write_json_atomic(self._rollup_path(project_id, day), {'format': ROLLUP_FORMAT, 'size': size, 'tests': tests})
+
+    def _prune(self, before):
+        cutoff = _day(before)
+        for project_id in os.listdir(self.root):
+            directory = os.path.join(self.root, project_id)
+            for name in os.listdir(directory) if os.path.isdir(directory) else ():
+                if name[:10] < cutoff:
+                    os.remove(os.path.join(directory, name))
@@ -0,0 +1,227 @@
+import json
+import os
+import logging
+import threading
+from ..models.project import Project
+from ..models.test_suite import TestSuite
+from ..models.test import Test
+from .data import load_projects, CustomEncoder
+from .storage import Storage
+
+
+def _find(items, item_id):
+    return next((item for item in items if item.id == item_id), None)
+
+
+def _find_test(projects, op):
+    project = _find(projects, op['project_id'])
+    suite = _find(project.test_suites, op['suite_id']) if project else None
+    return _find(suite.tests, op['test_id']) if suite else None
+
+
+def apply_operation(projects, op):
+    """Replays a single journal operation against a list of projects."""
+    name = op['op']
+    if name == 'create_project':
+        projects.append(Project.from_dict(op['project']))
+    elif name == 'update_project':
+        project = _find(projects, op['project_id'])
+        if project:
+            project.name = op['name']
+            if op.get('description') is not None:
+                project.description = op['description']
+    elif name == 'delete_project':
+        projects[:] = [p for p in projects if p.id != op['project_id']]
+    elif name in ('create_suite', 'update_suite', 'delete_suite'):
+        project = _find(projects, op['project_id'])
+        if not project:
+            return
+        if name == 'create_suite':
+            project.test_suites.append(TestSuite.from_dict(op['suite']))
+        elif name == 'update_suite':
+            suite = _find(project.test_suites, op['suite_id'])
+            if suite:
+                suite.name = op['name']
+        else:
+            project.test_suites = [s for s in project.test_suites if s.id != op['suite_id']]
+    elif name in ('create_test', 'delete_test'):
+        project = _find(projects, op['project_id'])
+        suite = _find(project.test_suites, op['suite_id']) if project else None
+        if not suite:
+            return
+        if name == 'create_test':
+            suite.tests.append(Test.from_dict(op['test']))
+        else:
+            suite.tests = [t for t in suite.tests if t.id != op['test_id']]
+    else:
+        test = _find_test(projects, op)
+        if not test:
+            return
+        if name == 'update_test':
+            test.name = op['name']
+            if op.get('depends_on') is not None:
+                test.depends_on = op['depends_on']
+        elif name == 'set_test_result':
+            test.result = op['result']
+        elif name == 'add_step':
+            test.steps.append(op['step'])
+        elif name == 'update_step':
+            test.steps[op['index']] = op['step']
+        elif name == 'delete_step':
+            del test.steps[op['index']]
+        elif name == 'set_steps':
+            test.steps = op['steps']
+        else:
+            logging.warning(f"Unknown journal operation: {name}")
+
+
+class ProjectJournal(Storage):
+    """
+    Append-only operation log with background compaction into a snapshot.
+
+    Mutations are appended to ``<filepath>.journal`` as one JSON line each.
+    Once the log grows past ``compact_threshold`` entries it is rotated to
+    ``<filepath>.journal.old`` and a background thread folds it into
+    ``<filepath>.snapshot``.  Every entry carries a sequence number and the
+    snapshot records the last one it contains, so a crash at any point of a
+    compaction never applies an operation twice.  A failed compaction
+    keeps the rotated log and is retried before the log rotates again.
+    """
+
+    writes_full_tree = False
+
+    def __init__(self, filepath="projects.json", compact_threshold=1000, fsync=False):
+        self.filepath = filepath
+        self.jobs_path = f"{filepath}.jobs.json"
+        self.snapshot_path = f"{filepath}.snapshot"
+        self.log_path = f"{filepath}.journal"
+        self.old_log_path = f"{filepath}.journal.old"
+        self.compact_threshold = compact_threshold
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self._snapshot_lock = threading.Lock()
+        self._snapshot_seq = 0
+        self._seq = 0
+        self._entries = 0
+        self._log = None
+        self._compactor = None
+
+    def load(self):
+        """Loads the snapshot and replays the log tail on top of it."""
+        projects, seq = self._read_snapshot()
+        if seq is None:
+            # First start in journaled mode: import the plain JSON store.
+            projects, seq = load_projects(self.filepath), 0
+        self._seq = self._snapshot_seq = seq
+        for path in (self.old_log_path, self.log_path):
+            for op in self._read_log(path):
+                if op['seq'] > seq:
+                    apply_operation(projects, op)
+                    self._seq = op['seq']
+        self._entries = sum(1 for _ in self._read_log(self.log_path))
+        self._log = open(self.log_path, "a")
+        if os.path.exists(self.old_log_path):
+            self._start_compaction()
+        logging.info(f"Loaded {len(projects)} projects from journal at seq {self._seq}")
+        return projects
+
+    def append(self, op):
+        """Appends one operation to the log."""
+        with self._lock:
+            self._seq += 1
+            op = dict(op, seq=self._seq)
+            self._log.write(json.dumps(op, cls=CustomEncoder) + "\n")
+            self._log.flush()
+            if self.fsync:
+                os.fsync(self._log.fileno())
+            self._entries += 1
+            if self._entries >= self.compact_threshold and not self._compacting():
+                if os.path.exists(self.old_log_path):
+                    # The last compaction failed: rotating now would overwrite the log it
+                    # never folded in, so retry it and count another threshold's worth.
+                    self._entries = 0
+                else:
+                    self._rotate()
+                self._start_compaction()
+
+    def record(self, op, projects):
+        self.append(op)
+
+    def save(self, projects):
+        """Writes a full snapshot of ``projects`` and truncates the log."""
+        with self._lock:
+            self._write_snapshot([p.to_dict() for p in projects], self._seq)
+            self._log.close()
+            self._log = open(self.log_path, "w")
+            self._entries = 0
+
+    def close(self):
+        self.wait_for_compaction()
+        with self._lock:
+            if self._log:
+                self._log.close()
+                self._log = None
+
+    def wait_for_compaction(self):
+        compactor = self._compactor
+        if compactor:
+            compactor.join()
+
+    def _compacting(self):
+        return self._compactor is not None and self._compactor.is_alive()
+
+    def _rotate(self):
+        self._log.close()
+        os.replace(self.log_path, self.old_log_path)
+        self._log = open(self.log_path, "a")
+        self._entries = 0
+
+    def _start_compaction(self):
+        self._compactor = threading.Thread(target=self._compact, name="journal-compactor", daemon=True)
+        self._compactor.start()
+
+    def _compact(self):
+        try:
+            projects, seq = self._read_snapshot()
+            if seq is None:
+                projects, seq = load_projects(self.filepath), 0
+            for op in self._read_log(self.old_log_path):
+                if op['seq'] > seq:
+                    apply_operation(projects, op)
+                    seq = op['seq']
+            self._write_snapshot([p.to_dict() for p in projects], seq)
+            os.remove(self.old_log_path)
+            logging.info(f"Compacted journal into snapshot at seq {seq}")
+        except Exception:
+            logging.exception("Journal compaction failed")
+
+    def _read_snapshot(self):
+        if not os.path.exists(self.snapshot_path):
+            return [], None
+        with open(self.snapshot_path, "r") as f:
+            data = json.load(f)
+        return [Project.from_dict(p) for p in data['projects']], data['seq']
+
+    def _write_snapshot(self, project_data, seq):
+        with self._snapshot_lock:
+            if seq < self._snapshot_seq:
+                # A full save() overtook this compaction; keep the newer snapshot.
+                return
+            tmp_path = f"{self.snapshot_path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({'seq': seq, 'projects': project_data}, f, cls=CustomEncoder)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+            self._snapshot_seq = seq
+
+    def _read_log(self, path):
+        if not os.path.exists(path):
+            return
+        with open(path, "r") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    # A torn write at the tail of the log after a crash.
+                    logging.warning(f"Skipping unreadable journal entry in {path}")
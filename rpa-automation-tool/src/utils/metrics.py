@@ -0,0 +1,139 @@
+import math
+import threading
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+HELP = {
+    'rpa_step_duration_seconds': "Time to run one test step, by step type and action.",
+    'rpa_test_duration_seconds': "Time to run one test, by result.",
+    'rpa_suite_duration_seconds': "Time spent running a suite's tests in one run, by suite.",
+    'rpa_replay_step_duration_seconds': "Time to replay one step, by handler.",
+    'rpa_replay_lateness_seconds': "How late replayed steps started compared to the recording.",
+    'rpa_http_requests_total': "API requests, by method, route and status.",
+    'rpa_http_request_duration_seconds': "API request latency, by method and route.",
+}
+
+
+class Histogram:
+    """
+    Streaming quantile estimate.  Values go into log-spaced buckets that are
+    ``GROWTH`` apart (about 2% relative error), so memory stays bounded by
+    the range of values, not their number.
+    """
+
+    GROWTH = 1.04
+    SMALLEST = 1e-9  # values below one nanosecond share a bucket
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def observe(self, value):
+        index = math.floor(math.log(value / self.SMALLEST, self.GROWTH)) if value > self.SMALLEST else -1
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def merge(self, other):
+        """Adds the values observed by ``other``."""
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def to_dict(self):
+        return {'count': self.count, 'sum': self.sum, 'min': self.min if self.count else None,
+                'max': self.max if self.count else None,
+                'buckets': {str(index): count for index, count in self.buckets.items()}}
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls()
+        histogram.buckets = {int(index): count for index, count in data['buckets'].items()}
+        histogram.count = data['count']
+        histogram.sum = data['sum']
+        if histogram.count:
+            histogram.min, histogram.max = data['min'], data['max']
+        return histogram
+
+    def quantile(self, q):
+        if not self.count:
+            return math.nan
+        rank = q * self.count
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                value = 0.0 if index < 0 else self.SMALLEST * self.GROWTH ** (index + 0.5)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    escape = lambda value: str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+    return "{" + ",".join(f'{key}="{escape(value)}"' for key, value in labels) + "}"
+
+
+class MetricsRegistry:
+    """
+    Counters and duration summaries keyed by metric name and labels,
+    rendered in the Prometheus text exposition format by ``render``.
+    """
+
+    def __init__(self):
+        self._summaries = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, seconds, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._summaries.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram()
+            histogram.observe(seconds)
+
+    def inc(self, name, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def summary(self, name, **labels):
+        """Returns ``{'count', 'sum', 'p50', 'p95', 'p99'}`` for one series, or None."""
+        with self._lock:
+            histogram = self._summaries.get(name, {}).get(tuple(sorted(labels.items())))
+            if histogram is None:
+                return None
+            return {'count': histogram.count, 'sum': histogram.sum,
+                    **{f"p{round(q * 100)}": histogram.quantile(q) for q in QUANTILES}}
+
+    def render(self):
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._summaries.items()):
+                lines += [f"# HELP {name} {HELP.get(name, name)}", f"# TYPE {name} summary"]
+                for key, histogram in sorted(series.items()):
+                    for q in QUANTILES:
+                        lines.append(f"{name}{_labels(key + (('quantile', q),))} {histogram.quantile(q):.9g}")
+                    lines.append(f"{name}_sum{_labels(key)} {histogram.sum:.9g}")
+                    lines.append(f"{name}_count{_labels(key)} {histogram.count}")
+            for name, series in sorted(self._counters.items()):
+                lines += [f"# HELP {name} {HELP.get(name, name)}", f"# TYPE {name} counter"]
+                for key, value in sorted(series.items()):
+                    lines.append(f"{name}{_labels(key)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+# The process-wide registry served at /api/metrics.
+registry = MetricsRegistry()
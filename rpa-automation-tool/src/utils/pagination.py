@@ -0,0 +1,116 @@
+import base64
+import heapq
+import json
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+SORTS = ('position', 'name', '-name', 'id', '-id')
+
+
+class InvalidPageRequest(ValueError):
+    pass
+
+
+def encode_cursor(data):
+    raw = json.dumps(data, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        data = json.loads(raw)
+    except (ValueError, TypeError):
+        raise InvalidPageRequest("Invalid cursor")
+    if not isinstance(data, dict):
+        raise InvalidPageRequest("Invalid cursor")
+    return data
+
+
+def parse_limit(value):
+    if value in (None, ''):
+        return DEFAULT_LIMIT
+    try:
+        limit = int(value)
+    except ValueError:
+        raise InvalidPageRequest("limit must be an integer")
+    if limit < 1:
+        raise InvalidPageRequest("limit must be positive")
+    return min(limit, MAX_LIMIT)
+
+
+def paginate(items, limit=None, cursor=None, prefix=None, sort=None):
+    """
+    Returns ``(page, next_cursor)`` for a list of projects, suites or tests.
+
+    Cursors are keyset based: they name the last item returned rather than
+    an offset, so creating or deleting items never repeats or skips the
+    rest of a listing.  ``position`` keeps the stored order and resumes
+    after the last item's id; the name and id sorts resume after its
+    (name, id) key.  ``prefix`` filters on a case-insensitive name prefix.
+    """
+    limit = parse_limit(limit)
+    sort = sort or 'position'
+    if sort not in SORTS:
+        raise InvalidPageRequest(f"sort must be one of {', '.join(SORTS)}")
+    after = decode_cursor(cursor) if cursor else None
+    if after and after.get('sort') != sort:
+        raise InvalidPageRequest("Cursor does not match the requested sort")
+    if prefix:
+        prefix = prefix.casefold()
+        items = [item for item in items if (item.name or '').casefold().startswith(prefix)]
+
+    if sort == 'position':
+        start = 0
+        if after:
+            start = _resume_position(items, after)
+        page = items[start:start + limit]
+        more = start + limit < len(items)
+        last = page[-1] if page else None
+        next_cursor = encode_cursor({'sort': sort, 'id': last.id, 'pos': start + len(page) - 1}) if more else None
+        return page, next_cursor
+
+    field = sort.lstrip('-')
+    descending = sort.startswith('-')
+
+    def key(item):
+        if field == 'name':
+            return ((item.name or '').casefold(), item.id)
+        return (item.id,)
+
+    candidates = items
+    if after:
+        last_key = tuple(after['key'])
+        candidates = [item for item in items if (key(item) < last_key if descending else key(item) > last_key)]
+    # Only the page (plus one to detect a following page) needs ordering.
+    select = heapq.nlargest if descending else heapq.nsmallest
+    page = select(limit + 1, candidates, key=key)
+    more = len(page) > limit
+    page = page[:limit]
+    next_cursor = encode_cursor({'sort': sort, 'key': list(key(page[-1]))}) if more else None
+    return page, next_cursor
+
+
+def paginate_steps(steps, limit=None, cursor=None):
+    """Steps are positional, so their cursor is simply the next index."""
+    limit = parse_limit(limit)
+    start = decode_cursor(cursor).get('index', 0) if cursor else 0
+    if not isinstance(start, int) or start < 0:
+        raise InvalidPageRequest("Invalid cursor")
+    page = steps[start:start + limit]
+    end = start + len(page)
+    return list(page), encode_cursor({'index': end}) if end < len(steps) else None
+
+
+def _resume_position(items, after):
+    # The item usually sits where it was; otherwise look it up by id.  If it
+    # was deleted, continue from its old position.
+    pos, last_id = after.get('pos', -1), after.get('id')
+    if not isinstance(pos, int):
+        raise InvalidPageRequest("Invalid cursor")
+    if 0 <= pos < len(items) and items[pos].id == last_id:
+        return pos + 1
+    for index, item in enumerate(items):
+        if item.id == last_id:
+            return index + 1
+    return max(0, min(pos, len(items)))
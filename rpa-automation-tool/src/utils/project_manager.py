@@ -1,34 +1,214 @@
 from src.models.project import Project # Fixed import
 from src.models.test import Test # Fixed import
 from src.models.test_suite import TestSuite
-from .data import load_projects, save_projects
+from .journal import ProjectJournal
+from .locks import ReadWriteLock
+from .metrics import registry
+from .result_cache import ResultCache
+from .storage import JsonStorage
 # from src.core.recorder import Recorder # Temporarily commented out
 from src.core.player import Player
+from src.core.event_log import is_closed, read_meta, recover
+import glob
+import itertools
 import logging
-from src.core.runner import Runner
+import os
+import threading
+import uuid
+from contextlib import contextmanager
+from src.core.runner import DependencyError, Runner, TestResult, find_cycle, result_events
 class ProjectManager:
-    def __init__(self):
-        self.projects = load_projects()
+    """
+    Owns the project tree and is shared by all request threads.
 
-    def create_project(self, project_name):
+    Locking: ``self._lock`` guards the project list (taken for writing only
+    to create, delete or reload a project) and every project has its own
+    ReadWriteLock.  A mutation holds the list lock for reading and its
+    project's lock for writing, so writes to different projects run side by
+    side while writes to one project are serialized.  Reads of a project
+    (see ``reading``) share its lock with other readers.
+
+    Versions: every mutation stamps the entity it touches and its parents
+    with the next value of a process-wide counter (see ``version_of``), and
+    ``version`` is the latest stamp overall.  The API derives ETags from them
+    together with ``version_epoch``.
+    """
+
+    def __init__(self, filepath="projects.json", journaled=False, compact_threshold=1000, storage=None, runner=None,
+                 player=None, result_cache=None, run_history=None, metrics=None):
+        """
+        ``storage`` is any Storage backend (see src/utils/storage.py).  Without
+        one, projects live in ``filepath``; with ``journaled=True`` every
+        mutation is appended to an operation log instead of rewriting it.
+        ``runner`` is the default Runner (or a Coordinator of worker processes)
+        for test runs and ``player`` replays tests for play_test.
+        ``result_cache`` keeps the results incremental runs reuse (an
+        in-memory ResultCache by default) and every run is appended to
+        ``run_history`` (a RunHistory), if given.  Step, test and suite
+        timings are observed in ``metrics`` (the process-wide
+        MetricsRegistry by default).
+        """
+        self.filepath = filepath
+        self.runner = runner if runner is not None else Runner()
+        self.player = player if player is not None else Player()
+        self.result_cache = result_cache if result_cache is not None else ResultCache()
+        self.run_history = run_history
+        self.metrics = metrics if metrics is not None else registry
+        if storage is None:
+            storage = ProjectJournal(filepath, compact_threshold) if journaled else JsonStorage(filepath)
+        self.storage = storage
+        self.storage.on_load = self._index_contents
+        self.storage.on_evict = self._unindex_contents
+        self.storage.try_lock = self._try_lock_project
+        self.storage.serialize = self.serialize_project
+        self._lock = ReadWriteLock()
+        self._project_locks = {}
+        self._project_locks_guard = threading.Lock()
+        self._local = threading.local()
+        self._versions = {}
+        self._version_clock = itertools.count(1)
+        self._version_guard = threading.Lock()
+        self.version = 0
+        # Versions restart with the process; the epoch tells the two apart.
+        self.version_epoch = uuid.uuid4().hex[:12]
+        self.projects = self.storage.load()
+        self._rebuild_indexes()
+
+    def _rebuild_indexes(self):
+        """Builds the id -> object hash indexes used by every lookup."""
+        self._projects_by_id = {}
+        self._suites_by_id = {}  # suite_id -> (Project, TestSuite)
+        self._tests_by_id = {}  # test_id -> (Project, TestSuite, Test)
+        for project in self.projects:
+            self._index_project(project)
+
+    def _index_project(self, project):
+        self._projects_by_id[project.id] = project
+        if self.storage.is_loaded(project):
+            self._index_contents(project)
+
+    def _index_contents(self, project):
+        for test_suite in project.test_suites:
+            self._index_suite(project, test_suite)
+
+    def _index_suite(self, project, test_suite):
+        self._suites_by_id[test_suite.id] = (project, test_suite)
+        for test in test_suite.tests:
+            self._tests_by_id[test.id] = (project, test_suite, test)
+
+    def _unindex_project(self, project):
+        self._projects_by_id.pop(project.id, None)
+        if self.storage.is_loaded(project):
+            self._unindex_contents(project)
+
+    def _unindex_contents(self, project):
+        for test_suite in project.test_suites:
+            self._unindex_suite(test_suite)
+
+    def _unindex_suite(self, test_suite):
+        self._suites_by_id.pop(test_suite.id, None)
+        for test in test_suite.tests:
+            self._tests_by_id.pop(test.id, None)
+
+    # ================= Locking =================
+
+    def _project_lock(self, project_id):
+        with self._project_locks_guard:
+            lock = self._project_locks.get(project_id)
+            if lock is None:
+                lock = self._project_locks[project_id] = ReadWriteLock()
+            return lock
+
+    def _try_lock_project(self, project):
+        """Write-locks an idle project for eviction; returns the release function, or None if it is in use."""
+        lock = self._project_lock(project.id)
+        return lock.release_write if lock.try_acquire_write() else None
+
+    @contextmanager
+    def reading(self, project_id):
+        """Holds a project steady while it is read or serialized."""
+        with self._project_lock(project_id).read():
+            yield
+
+    @contextmanager
+    def _writing(self, project_id=None):
+        """
+        Serializes a mutation of one project, or of the project list when
+        ``project_id`` is None.  Stores that rewrite the whole tree are saved
+        after the locks are released, since the save reads every project.
+        """
+        self._sync()
+        self._local.save_pending = False
+        if project_id is None:
+            with self._lock.write():
+                yield
+        else:
+            with self._lock.read(), self._project_lock(project_id).write():
+                yield
+        if self._local.save_pending:
+            self._local.save_pending = False
+            self.save()
+
+    def serialize_project(self, project):
+        """Returns a consistent to_dict() of a project."""
+        with self.reading(project.id):
+            return project.to_dict()
+
+    # ================= Projects =================
+
+    def create_project(self, project_name, description=""):
         logging.info(f"Creating project with name: {project_name}")
-        project = Project(name=project_name)
-        self.projects.append(project)
-        logging.info(f"Project added to self.projects. Project ID: {project.id}")
-        logging.info(f"Project created with ID: {project.id}")
-        self.save()
+        with self._writing():
+            project = self.storage.new_project(project_name, description or "")
+            self.projects.append(project)
+            self._index_project(project)
+            logging.info(f"Project added to self.projects. Project ID: {project.id}")
+            logging.info(f"Project created with ID: {project.id}")
+            self._record('create_project', project=project.to_dict())
         return project
 
     def get_all_projects(self):
+        self._sync()
         return self.projects
 
+    def update_project(self, project_id, project_name, description=None):
+        with self._writing(project_id):
+            project = self._projects_by_id.get(project_id)
+            if project:
+                project.name = project_name
+                if description is not None:
+                    project.description = description
+                self._record('update_project', project_id=project_id, name=project_name, description=description)
+        return project
+
+    def delete_project(self, project_id):
+        with self._writing():
+            project = self._projects_by_id.get(project_id)
+            if project:
+                self.projects.remove(project)
+                self._unindex_project(project)
+                self._record('delete_project', project_id=project_id)
+        with self._project_locks_guard:
+            self._project_locks.pop(project_id, None)
+        if project and self.run_history is not None:
+            self.run_history.delete(project_id)
+        return project is not None
+
+    def get_project(self, project_id):
+        self._sync()
+        return self._projects_by_id.get(project_id)
+
+    # ================= Test Suites =================
+
     def create_test_suite(self, project_id, suite_name):
-        project = self.get_project(project_id)
-        if project:
-            test_suite = TestSuite(name=suite_name)
-            project.test_suites.append(test_suite)
-            self.save()
-            return test_suite
+        with self._writing(project_id):
+            project = self._projects_by_id.get(project_id)
+            if project:
+                test_suite = TestSuite(name=suite_name)
+                project.test_suites.append(test_suite)
+                self._index_suite(project, test_suite)
+                self._record('create_suite', project_id=project_id, suite=test_suite.to_dict())
+                return test_suite
         return None
 
     def get_all_test_suites(self, project_id):
@@ -37,44 +217,209 @@ class ProjectManager:
             return project.test_suites
         return []
 
-    def create_test(self, project_id, suite_id, test_name):
-        project = self.get_project(project_id)
-        if project:
-            test_suite = next(
-                (ts for ts in project.test_suites if ts.id == suite_id), None
-            )
+    def get_test_suite(self, project_id, suite_id):
+        self._sync()
+        return self._find_suite(project_id, suite_id)
+
+    def update_test_suite(self, project_id, suite_id, suite_name):
+        with self._writing(project_id):
+            test_suite = self._find_suite(project_id, suite_id)
+            if test_suite:
+                test_suite.name = suite_name
+                self._record('update_suite', project_id=project_id, suite_id=suite_id, name=suite_name)
+        return test_suite
+
+    def delete_test_suite(self, project_id, suite_id):
+        with self._writing(project_id):
+            test_suite = self._find_suite(project_id, suite_id)
+            if test_suite:
+                self._projects_by_id[project_id].test_suites.remove(test_suite)
+                self._unindex_suite(test_suite)
+                self._record('delete_suite', project_id=project_id, suite_id=suite_id)
+                self._drop_dependencies(project_id, {test.id for test in test_suite.tests})
+        return test_suite is not None
+
+    # ================= Tests =================
+
+    def create_test(self, project_id, suite_id, test_name, depends_on=None):
+        """``depends_on`` lists tests of the same project that must pass before this one runs."""
+        with self._writing(project_id):
+            test_suite = self._find_suite(project_id, suite_id)
             if test_suite:
                 test = Test(name=test_name)
+                if depends_on:
+                    test.depends_on = self._check_dependencies(project_id, test.id, depends_on)
                 test_suite.tests.append(test)
-                self.save()
+                self._tests_by_id[test.id] = (self._projects_by_id[project_id], test_suite, test)
+                self._record('create_test', project_id=project_id, suite_id=suite_id, test=test.to_dict())
                 return test
         return None
 
     def get_all_tests(self, project_id, suite_id):
-        project = self.get_project(project_id)
-        if project:
-            test_suite = next(
-                (ts for ts in project.test_suites if ts.id == suite_id), None
-            )
-            if test_suite:
-                return test_suite.tests
+        test_suite = self.get_test_suite(project_id, suite_id)
+        if test_suite:
+            return test_suite.tests
         return []
 
-    def get_project(self, project_id):
-        return next((p for p in self.projects if p.id == project_id), None)
+    def update_test(self, project_id, suite_id, test_id, test_name, depends_on=None):
+        """Renames a test and, unless ``depends_on`` is None, replaces its dependencies."""
+        with self._writing(project_id):
+            test = self._find_test(project_id, suite_id, test_id)
+            if test:
+                if depends_on is not None:
+                    depends_on = self._check_dependencies(project_id, test_id, depends_on)
+                    test.depends_on = depends_on
+                test.name = test_name
+                self._record('update_test', project_id=project_id, suite_id=suite_id, test_id=test_id, name=test_name,
+                             depends_on=depends_on)
+        return test
 
-    def save(self):
-        save_projects(self.projects)
+    def _check_dependencies(self, project_id, test_id, depends_on):
+        """
+        Returns ``depends_on`` without duplicates, or raises DependencyError
+        if it names an unknown test or would create a cycle.  Called with the
+        project's write lock held.
+        """
+        depends_on = list(dict.fromkeys(depends_on))
+        graph = {test.id: test.depends_on for suite in self._projects_by_id[project_id].test_suites
+                 for test in suite.tests}
+        unknown = [dependency for dependency in depends_on if dependency not in graph or dependency == test_id]
+        if unknown:
+            raise DependencyError(f"Unknown test dependency: {unknown[0]}")
+        graph[test_id] = depends_on
+        cycle = find_cycle(graph)
+        if cycle:
+            raise DependencyError(f"Test dependencies form a cycle: {' -> '.join(cycle)}")
+        return depends_on
+
+    def delete_test(self, project_id, suite_id, test_id):
+        with self._writing(project_id):
+            test = self._find_test(project_id, suite_id, test_id)
+            if test:
+                self._suites_by_id[suite_id][1].tests.remove(test)
+                self._tests_by_id.pop(test_id, None)
+                self.player.plans.invalidate(test_id)
+                self._record('delete_test', project_id=project_id, suite_id=suite_id, test_id=test_id)
+                self._drop_dependencies(project_id, {test_id})
+        return test is not None
+
+    def _drop_dependencies(self, project_id, deleted_ids):
+        """Removes deleted tests from the ``depends_on`` of the tests left; called inside _writing."""
+        for suite in self._projects_by_id[project_id].test_suites:
+            for test in suite.tests:
+                if deleted_ids.intersection(test.depends_on):
+                    test.depends_on = [d for d in test.depends_on if d not in deleted_ids]
+                    self._record('update_test', project_id=project_id, suite_id=suite.id, test_id=test.id,
+                                 name=test.name, depends_on=test.depends_on)
 
     def get_test_from_suite(self, project_id, suite_id, test_id):
-        project = self.get_project(project_id)
-        if project:
-            test_suite = next((ts for ts in project.test_suites if ts.id == suite_id), None)
-            if test_suite:
-                test = next((t for t in test_suite.tests if t.id == test_id), None)
-                return test
+        self._sync()
+        return self._find_test(project_id, suite_id, test_id)
+
+    # ================= Persistence =================
+
+    def save(self):
+        """Persists the full project tree."""
+        if self.storage.writes_full_tree:
+            # Each project is serialized under its own read lock (serialize_project).
+            with self._lock.read():
+                projects = list(self.projects)
+            self.storage.save(projects)
+        else:
+            with self._lock.write():
+                self.storage.save(self.projects)
+
+    def export_json(self, filepath):
+        """Writes all projects to a JSON file in the default store format."""
+        with self._lock.read():
+            projects = list(self.projects)
+        storage = JsonStorage(filepath)
+        storage.serialize = self.serialize_project
+        storage.save(projects)
+
+    def flush(self):
+        """Waits for any write-behind saves to reach disk."""
+        self.storage.flush()
+
+    def close(self):
+        self.storage.close()
+
+    def version_of(self, entity_id):
+        """Version of a project, suite or test; bumped whenever it or anything inside it changes."""
+        return self._versions.get(entity_id, 0)
+
+    def _bump(self, *entity_ids, deleted=None):
+        with self._version_guard:
+            self.version = next(self._version_clock)
+            for entity_id in entity_ids:
+                if entity_id:
+                    self._versions[entity_id] = self.version
+            self._versions.pop(deleted, None)
+
+    def _record(self, op, **data):
+        """Hands a single mutation to the storage backend; called inside _writing."""
+        project_id = data.get('project_id') or data.get('project', {}).get('id')
+        suite_id = data.get('suite_id') or data.get('suite', {}).get('id')
+        test_id = data.get('test_id') or data.get('test', {}).get('id')
+        deleted = {'delete_project': project_id, 'delete_suite': suite_id, 'delete_test': test_id}.get(op)
+        self._bump(project_id, suite_id, test_id, deleted=deleted)
+        if self.storage.writes_full_tree:
+            self._local.save_pending = True
+        else:
+            self.storage.record(dict(data, op=op), self.projects)
+
+    # ================= Lookups =================
+
+    def _find_suite(self, project_id, suite_id):
+        entry = self._suites_by_id.get(suite_id)
+        if entry is None and self._load_contents(project_id):
+            entry = self._suites_by_id.get(suite_id)
+        if entry and entry[0].id == project_id:
+            return entry[1]
         return None
 
+    def _find_test(self, project_id, suite_id, test_id):
+        entry = self._tests_by_id.get(test_id)
+        if entry is None and self._load_contents(project_id):
+            entry = self._tests_by_id.get(test_id)
+        if entry and entry[0].id == project_id and entry[1].id == suite_id:
+            return entry[2]
+        return None
+
+    def _load_contents(self, project_id):
+        """Loads a lazily stored project's suites; True if anything was loaded."""
+        project = self._projects_by_id.get(project_id)
+        return project is not None and self.storage.ensure_loaded(project)
+
+    def _sync(self):
+        """Reloads projects that another process changed in a shared store."""
+        changed = self.storage.poll_changes()
+        if not changed:
+            return
+        with self._lock.write():
+            for project_id in changed:
+                old = self._projects_by_id.get(project_id)
+                project = self.storage.load_project(project_id)
+                if old:
+                    self._unindex_project(old)
+                    position = self.projects.index(old)
+                    if project:
+                        self.projects[position] = project
+                    else:
+                        del self.projects[position]
+                elif project:
+                    self.projects.append(project)
+                if project:
+                    self._index_project(project)
+                self._bump(project_id, *self._contained_ids(project_id))
+
+    def _contained_ids(self, project_id):
+        suite_ids = [sid for sid, (p, _) in self._suites_by_id.items() if p.id == project_id]
+        test_ids = [tid for tid, (p, _, _) in self._tests_by_id.items() if p.id == project_id]
+        return suite_ids + test_ids
+
+    # ================= Steps =================
+
     def get_test_steps(self, project_id, suite_id, test_id):
         """Gets all steps for a test."""
         test = self.get_test_from_suite(project_id, suite_id, test_id)
@@ -82,29 +427,176 @@ class ProjectManager:
 
     def add_step(self, project_id, suite_id, test_id, step_data):
         """Adds a new step to a test."""
-        test = self.get_test_from_suite(project_id, suite_id, test_id)
-        if test:
-            test.steps.append(step_data)
-            self.save()
-            return step_data
+        with self._writing(project_id):
+            test = self._find_test(project_id, suite_id, test_id)
+            if test:
+                test.steps.append(step_data)
+                self._record('add_step', project_id=project_id, suite_id=suite_id, test_id=test_id, step=step_data)
+                return step_data
         return None
 
     def update_step(self, project_id, suite_id, test_id, step_index, step_data):
         """Updates an existing step."""
-        test = self.get_test_from_suite(project_id, suite_id, test_id)
-        if test and 0 <= step_index < len(test.steps):
-            test.steps[step_index] = step_data
-            self.save()
-            return test.steps[step_index]
+        with self._writing(project_id):
+            test = self._find_test(project_id, suite_id, test_id)
+            if test and 0 <= step_index < len(test.steps):
+                test.steps[step_index] = step_data
+                self._record('update_step', project_id=project_id, suite_id=suite_id, test_id=test_id,
+                             index=step_index, step=step_data)
+                return test.steps[step_index]
+        return None
+
+    def set_test_steps(self, project_id, suite_id, test_id, steps):
+        """Replaces all steps of a test, e.g. with a finished recording; returns the test or None."""
+        with self._writing(project_id):
+            test = self._find_test(project_id, suite_id, test_id)
+            if test:
+                test.steps = steps
+                self._record('set_steps', project_id=project_id, suite_id=suite_id, test_id=test_id,
+                             steps=list(steps))
+                return test
         return None
 
     def delete_step(self, project_id, suite_id, test_id, step_index):
         """Deletes a step."""
+        with self._writing(project_id):
+            test = self._find_test(project_id, suite_id, test_id)
+            if test and 0 <= step_index < len(test.steps):
+                del test.steps[step_index]
+                self._record('delete_step', project_id=project_id, suite_id=suite_id, test_id=test_id,
+                             index=step_index)
+                return True
+
+    # ================= Running =================
+
+    def run_all_tests(self, project_id, progress=None, should_stop=None, emit=None, **options):
+        """
+        Runs every test in a project, respecting their ``depends_on`` (see
+        Runner); results are returned in declaration order.
+        ``progress(done, total)``, ``should_stop()`` and ``emit(event)`` (see
+        runner.result_events) let a caller such as the job manager follow and
+        cancel the run.  ``options`` are those of _run_snapshots.
+        """
+        project = self.get_project(project_id)
+        if not project:
+            return []
+        with self.reading(project_id):
+            snapshots = [(suite.id, test.to_dict()) for suite in project.test_suites for test in suite.tests]
+        return self._run_snapshots(project_id, snapshots, progress, should_stop, emit, **options)
+
+    def run_suite_tests(self, project_id, suite_id, progress=None, should_stop=None, emit=None, **options):
+        suite = self.get_test_suite(project_id, suite_id)
+        if not suite:
+            return []
+        with self.reading(project_id):
+            snapshots = [(suite.id, test.to_dict()) for test in suite.tests]
+        return self._run_snapshots(project_id, snapshots, progress, should_stop, emit, **options)
+
+    def run_test(self, project_id, suite_id, test_id, progress=None, should_stop=None, emit=None):
         test = self.get_test_from_suite(project_id, suite_id, test_id)
-        if test and 0 <= step_index < len(test.steps):
-            del test.steps[step_index]
-            self.save()
-            return True
+        if not test:
+            return None
+        with self.reading(project_id):
+            snapshots = [(suite_id, test.to_dict())]
+        results = self._run_snapshots(project_id, snapshots, progress=progress, should_stop=should_stop, emit=emit)
+        return results[0] if results else None
+
+    def play_test(self, project_id, suite_id, test_id, repeat=1, speed=None):
+        """
+        Replays a test ``repeat`` times and returns one timing report
+        (ReplayReport.to_dict) per run, or None if the test does not exist.
+        Only compiling its plan (cached per test version) happens under the
+        project lock; the replay does not.
+        """
+        test = self.get_test_from_suite(project_id, suite_id, test_id)
+        if not test:
+            return None
+        with self.reading(project_id):
+            plan = self.player.compile(test, self.version_of(test_id))
+        logging.info(f"Playing test {test.id} ({test.name}) {repeat} time(s)")
+        return [self.player.execute(plan, speed).to_dict() for _ in range(repeat)]
+
+    def _run_snapshots(self, project_id, snapshots, progress=None, should_stop=None, emit=None, max_workers=None,
+                       backend=None, fail_fast=None, incremental=False, force=False):
+        """
+        Runs test snapshots without holding any lock, then stores each test's
+        outcome.  Tests deleted while running are skipped.  ``max_workers``,
+        ``backend`` and ``fail_fast`` override the runner's settings.
+
+        With ``incremental`` a test that passed within the ResultCache TTL
+        and has not changed since (nor have its dependencies or the project
+        environment) is not run again; its result is marked ``cached``.
+        ``force`` runs everything anyway.  Every run refreshes the cache, and
+        cache hits are stored as the tests' results like the tests that ran.
+        """
+        runner = self.runner
+        if max_workers is not None or backend is not None or fail_fast is not None:
+            runner = runner.with_options(max_workers, backend, fail_fast)
+        total = len(snapshots)
+        done = []
+
+        def on_result(result):
+            done.append(result)
+            if progress:
+                progress(len(done), total)
+        if progress:
+            progress(0, total)
+        hits, order = [], [test_data['id'] for _, test_data in snapshots]
+        keys = self.result_cache.keys(snapshots, self.result_cache.environment(project_id))
+        if incremental and not force:
+            to_run = []
+            for suite_id, test_data in snapshots:
+                entry = self.result_cache.get(keys[test_data['id']])
+                if entry is None:
+                    to_run.append((suite_id, test_data))
+                    continue
+                hit = TestResult(test_data['id'], test_data.get('name'), suite_id, duration=entry['duration'],
+                                 cached=True)
+                if emit:
+                    for event in result_events(hit):
+                        emit(event)
+                hits.append(hit)
+                on_result(hit)
+            snapshots = to_run
+        ran = runner.run_snapshots(snapshots, on_result, should_stop, emit)
+        with self._writing(project_id):
+            for result in hits + ran:
+                test = self._find_test(project_id, result.suite_id, result.test_id)
+                if test:
+                    test.result = result.result
+                    self._record('set_test_result', project_id=project_id, suite_id=result.suite_id,
+                                 test_id=result.test_id, result=result.result)
+        self._observe(snapshots, ran)
+        if self.run_history is not None:
+            self.run_history.append(project_id, ran)
+        for result in ran:
+            if result.result != "Skipped":
+                self.result_cache.put(keys[result.test_id], result)
+        self.result_cache.save()
+        position = {test_id: i for i, test_id in enumerate(order)}
+        results = sorted(hits + ran, key=lambda result: position[result.test_id])
+        logging.info(f"Ran {len(ran)} tests in project {project_id} with {runner.max_workers} {runner.backend} workers"
+                     f"{f', {len(hits)} cached' if incremental else ''}")
+        return [result.to_dict() for result in results]
+
+    def _observe(self, snapshots, results):
+        """
+        Feeds the timings of a run into the metrics.  Done here rather than
+        in the runner so runs on process pools and remote workers count too.
+        """
+        steps = {test_data['id']: test_data.get('steps', []) for _, test_data in snapshots}
+        suites = {}
+        for result in results:
+            if result.result == "Skipped":
+                continue
+            self.metrics.observe('rpa_test_duration_seconds', result.duration, result=result.result)
+            suites[result.suite_id] = suites.get(result.suite_id, 0.0) + result.duration
+            for step, duration in zip(steps.get(result.test_id, ()), result.step_durations):
+                self.metrics.observe('rpa_step_duration_seconds', duration, type=step.get('type') or "",
+                                     action=step.get('action') or "")
+        for suite_id, duration in suites.items():
+            self.metrics.observe('rpa_suite_duration_seconds', duration, suite_id=suite_id)
+
     def record_test(self, project_id, suite_id, test_id):
         test = self.get_test_from_suite(project_id, suite_id, test_id)
         if test:
@@ -116,18 +608,67 @@ class ProjectManager:
         return False
 
     def stop_recording(self, project_id, suite_id, test_id):
-        test = self.get_test_from_suite(project_id, suite_id, test_id)
-        if test and test.is_recording and not test.is_paused:
-            # recorder = Recorder() # Temporarily commented out
-            # steps, test = recorder.stop(test) # Temporarily commented out
-            # test.record(steps) # Temporarily commented out
-            test.is_recording = False
-            test.is_paused = False
-            recorder = Recorder()
-            steps, test = recorder.stop(test)
-            test.record(steps)
-            self.save()
-            return test
+        with self._writing(project_id):
+            test = self._find_test(project_id, suite_id, test_id)
+            if test and test.is_recording and not test.is_paused:
+                # recorder = Recorder() # Temporarily commented out
+                # steps, test = recorder.stop(test) # Temporarily commented out
+                # test.record(steps) # Temporarily commented out
+                test.is_recording = False
+                test.is_paused = False
+                recorder = Recorder()
+                steps, test = recorder.stop(test)
+                test.record(steps)
+                self._record('set_steps', project_id=project_id, suite_id=suite_id, test_id=test_id, steps=test.steps)
+                return test
+        return None
+
+    def recover_recordings(self, directory):
+        """
+        Restores the steps of recording sessions whose EventLog was left in
+        ``directory`` (see Recorder's ``log_dir``), e.g. after a crash, and
+        deletes the logs.  Logs of unknown tests are kept; logs of sessions
+        that were closed once complete had their steps handed over already
+        and are deleted without touching the test.  Logs of upload sessions
+        are left to RecordingIngest.resume.  Returns the ids of the
+        recovered tests.
+        """
+        recovered = []
+        for path in sorted(glob.glob(os.path.join(directory, "*.rec"))):
+            try:
+                if is_closed(path):
+                    logging.info(f"Removing recording log {path} of a finished session")
+                    os.remove(path)
+                    continue
+                meta = read_meta(path)
+                if 'session' in meta:
+                    continue  # an upload, resumed by RecordingIngest.resume
+                test = recover(path)
+            except (OSError, ValueError):
+                logging.exception(f"Could not read recording log {path}")
+                continue
+            location = self._locate_test(test.id, meta.get('project_id'), meta.get('suite_id'))
+            if location is None or not self.set_test_steps(*location, test.id, test.steps):
+                logging.warning(f"Recording log {path} belongs to unknown test {test.id}")
+                continue
+            os.remove(path)
+            logging.info(f"Recovered {len(test.steps)} recorded steps of test {test.id} from {path}")
+            recovered.append(test.id)
+        return recovered
+
+    def _locate_test(self, test_id, project_id=None, suite_id=None):
+        """
+        ``(project id, suite id)`` of a test, or None.  Without the ids (logs
+        of local recordings only know their test) every project is searched,
+        loading lazily stored ones.
+        """
+        if project_id and suite_id:
+            return (project_id, suite_id) if self.get_test_from_suite(project_id, suite_id, test_id) else None
+        for project in list(self.projects):
+            with self.reading(project.id):
+                for test_suite in project.test_suites:
+                    if any(test.id == test_id for test in test_suite.tests):
+                        return project.id, test_suite.id
         return None
 
     def pause_recording(self, project_id, suite_id, test_id):
@@ -136,4 +677,4 @@ class ProjectManager:
         if test and test.is_recording and not test.is_paused:
             test.is_paused = True
             return True
-        return False
\ No newline at end of file
+        return False
@@ -0,0 +1,38 @@
+import threading
+from collections import OrderedDict
+
+
+class ResponseCache:
+    """
+    Serialized responses keyed by (request, entity version).  A version only
+    ever moves forward, so entries never need invalidating; stale ones just
+    fall off the end of the LRU.
+    """
+
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, build):
+        """Returns the cached value for ``key``, calling ``build()`` on a miss."""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            self.misses += 1
+        value = build()
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,85 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from .data import CustomEncoder, write_json_atomic
+
+
+class ResultCache:
+    """
+    Last run results keyed by a content hash of the test, for incremental
+    runs (see ProjectManager.run_all_tests).
+
+    A test's key hashes its steps, the keys of the tests it depends on and
+    its project's environment: ``<environments_dir>/<project id>/environment.json``,
+    falling back to ``<environments_dir>/project_template/environment.json``.
+    Changing any of them changes the key.  A test whose key passed within
+    the last ``ttl`` seconds is a hit.  With a ``path`` the entries survive
+    restarts; expired ones are dropped when saving.
+    """
+
+    def __init__(self, path=None, ttl=24 * 3600, environments_dir="projects"):
+        self.path = path
+        self.ttl = ttl
+        self.environments_dir = environments_dir
+        self._entries = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            try:
+                with open(path) as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError):
+                logging.exception(f"Ignoring unreadable result cache {path}")
+
+    def environment(self, project_id):
+        for name in (project_id, "project_template"):
+            path = os.path.join(self.environments_dir, name, "environment.json")
+            if os.path.exists(path):
+                with open(path) as f:
+                    return json.load(f)
+        return {}
+
+    def keys(self, snapshots, environment):
+        """Returns the key of every ``(suite_id, test_data)`` pair, by test id."""
+        by_id = {test_data['id']: test_data for _, test_data in snapshots}
+        env = json.dumps(environment, sort_keys=True, cls=CustomEncoder)
+        keys = {}
+
+        def key(test_id, path=()):
+            if test_id not in keys:
+                test_data = by_id[test_id]
+                # Cycles are rejected when dependencies are set; ``path`` just guards against loops.
+                dependencies = [key(d, path + (test_id,)) for d in test_data.get('depends_on') or ()
+                                if d in by_id and d not in path]
+                content = json.dumps([list(test_data.get('steps', [])), dependencies, env], sort_keys=True,
+                                     cls=CustomEncoder)
+                keys[test_id] = hashlib.sha256(content.encode()).hexdigest()
+            return keys[test_id]
+        for test_id in by_id:
+            key(test_id)
+        return keys
+
+    def get(self, key, now=None):
+        """Returns the cached passing result for ``key``, or None."""
+        now = time.time() if now is None else now
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry and entry['result'] == "Passed" and now - entry['at'] <= self.ttl:
+            return entry
+        return None
+
+    def put(self, key, result, now=None):
+        with self._lock:
+            self._entries[key] = {'test_id': result.test_id, 'result': result.result, 'duration': result.duration,
+                                  'at': time.time() if now is None else now}
+
+    def save(self):
+        if not self.path:
+            return
+        now = time.time()
+        with self._lock:
+            self._entries = {key: entry for key, entry in self._entries.items() if now - entry['at'] <= self.ttl}
+            entries = dict(self._entries)
+        write_json_atomic(self.path, entries)
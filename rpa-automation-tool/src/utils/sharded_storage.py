@@ -0,0 +1,235 @@
+import json
+import os
+import shutil
+import threading
+import logging
+import uuid
+from collections import OrderedDict
+from ..models.project import Project
+from ..models.test_suite import TestSuite
+from .data import load_projects, write_json_atomic
+from .storage import Storage
+
+
+class LazyProject(Project):
+    """A project whose suites and history are read from disk on first access."""
+
+    def __init__(self, storage, id, name, description=""):
+        self._storage = storage
+        self._test_suites = None
+        self._history = None
+        self.id = id
+        self.name = name or "Unnamed Project"
+        self.description = description
+
+    @property
+    def loaded(self):
+        return self._test_suites is not None
+
+    @property
+    def test_suites(self):
+        if self._test_suites is None:
+            self._storage._load_contents(self)
+        else:
+            self._storage._touch(self)
+        return self._test_suites
+
+    @test_suites.setter
+    def test_suites(self, value):
+        self._test_suites = value
+
+    @property
+    def history(self):
+        if self._history is None:
+            self._storage._load_contents(self)
+        return self._history
+
+    @history.setter
+    def history(self, value):
+        self._history = value
+
+
+class ShardedStorage(Storage):
+    """
+    One directory per project, one file per suite::
+
+        <root>/manifest.json                 id, name and description of every project
+        <root>/<project_id>/project.json     project fields and suite order
+        <root>/<project_id>/suites/<id>.json a suite with its tests and steps
+
+    Startup only reads the manifest.  A project's suites are loaded the first
+    time they are accessed and dropped again once more than
+    ``max_loaded_projects`` projects are loaded (least recently used first).
+    Mutations rewrite only the files they touch.
+    """
+
+    writes_full_tree = False
+
+    def __init__(self, root="projects", import_path=None, max_loaded_projects=16):
+        self.root = root
+        self.import_path = import_path
+        self.max_loaded_projects = max_loaded_projects
+        self.manifest_path = os.path.join(root, "manifest.json")
+        self.jobs_path = os.path.join(root, "jobs.json")
+        self._projects = OrderedDict()
+        self._loaded = OrderedDict()
+        self._lock = threading.RLock()
+
+    def load(self):
+        os.makedirs(self.root, exist_ok=True)
+        if not os.path.exists(self.manifest_path):
+            if self.import_path and os.path.exists(self.import_path):
+                logging.info(f"Importing {self.import_path} into sharded store at {self.root}")
+                self.save(load_projects(self.import_path))
+            else:
+                self._write_manifest()
+        with open(self.manifest_path, "r") as f:
+            entries = json.load(f)
+        self._projects = OrderedDict(
+            (e['id'], LazyProject(self, e['id'], e.get('name'), e.get('description', ""))) for e in entries)
+        self._loaded.clear()
+        logging.info(f"Loaded manifest with {len(self._projects)} projects from {self.root}")
+        return list(self._projects.values())
+
+    def new_project(self, name, description=""):
+        project = LazyProject(self, str(uuid.uuid4()), name, description)
+        project._test_suites = []
+        project._history = []
+        return project
+
+    def load_project(self, project_id):
+        return self._projects.get(project_id)
+
+    def is_loaded(self, project):
+        return getattr(project, 'loaded', True)
+
+    def ensure_loaded(self, project):
+        if self.is_loaded(project):
+            return False
+        project.test_suites
+        return True
+
+    def record(self, op, projects):
+        name = op['op']
+        with self._lock:
+            if name == 'create_project':
+                project = next(p for p in reversed(projects) if p.id == op['project']['id'])
+                self._write_project(project)
+                self._projects[project.id] = project
+                self._write_manifest()
+                if isinstance(project, LazyProject):
+                    # Written out, so it can be evicted like a loaded one.
+                    self._loaded[project.id] = project
+                    self._evict(keep=project)
+            elif name == 'update_project':
+                project = self._projects[op['project_id']]
+                self._write_project_file(project)
+                self._write_manifest()
+            elif name == 'delete_project':
+                self._projects.pop(op['project_id'], None)
+                self._loaded.pop(op['project_id'], None)
+                self._write_manifest()
+                shutil.rmtree(self._project_dir(op['project_id']), ignore_errors=True)
+            elif name in ('create_suite', 'delete_suite'):
+                project = self._projects[op['project_id']]
+                if name == 'create_suite':
+                    suite = next(s for s in project.test_suites if s.id == op['suite']['id'])
+                    self._write_suite(project.id, suite)
+                else:
+                    suite_path = self._suite_path(project.id, op['suite_id'])
+                    if os.path.exists(suite_path):
+                        os.remove(suite_path)
+                self._write_project_file(project)
+            else:
+                # Suite, test and step edits rewrite just the suite they belong to.
+                project = self._projects[op['project_id']]
+                suite = next((s for s in project.test_suites if s.id == op['suite_id']), None)
+                if suite:
+                    self._write_suite(project.id, suite)
+
+    def save(self, projects):
+        with self._lock:
+            for project in projects:
+                if self.is_loaded(project):
+                    self._write_project(project)
+            self._projects = OrderedDict((p.id, p) for p in projects)
+            self._write_manifest()
+
+    def _load_contents(self, project):
+        with self._lock:
+            if project._test_suites is not None:
+                return
+            project_dir = self._project_dir(project.id)
+            data = {}
+            if os.path.exists(os.path.join(project_dir, "project.json")):
+                with open(os.path.join(project_dir, "project.json"), "r") as f:
+                    data = json.load(f)
+            suites = []
+            for suite_id in data.get('suites', []):
+                with open(self._suite_path(project.id, suite_id), "r") as f:
+                    suites.append(TestSuite.from_dict(json.load(f)))
+            project._test_suites = suites
+            project._history = data.get('history', [])
+            self._loaded[project.id] = project
+            logging.info(f"Loaded project {project.id} with {len(suites)} suites")
+            if self.on_load:
+                self.on_load(project)
+            self._evict(keep=project)
+
+    def _touch(self, project):
+        if project.id in self._loaded:
+            self._loaded.move_to_end(project.id)
+
+    def _evict(self, keep=None):
+        # Least recently used first.  A project someone is reading or writing
+        # stays loaded: evicting it would detach the objects being edited.
+        for project_id, project in list(self._loaded.items()):
+            if len(self._loaded) <= self.max_loaded_projects:
+                return
+            if project is keep:
+                continue
+            release = self.try_lock(project) if self.try_lock else None
+            if self.try_lock and release is None:
+                continue
+            try:
+                del self._loaded[project_id]
+                if self.on_evict:
+                    self.on_evict(project)
+                project._test_suites = None
+                project._history = None
+            finally:
+                if release:
+                    release()
+            logging.info(f"Released idle project {project_id}")
+
+    def _project_dir(self, project_id):
+        return os.path.join(self.root, project_id)
+
+    def _suite_path(self, project_id, suite_id):
+        return os.path.join(self.root, project_id, "suites", f"{suite_id}.json")
+
+    def _write_project(self, project):
+        os.makedirs(os.path.join(self._project_dir(project.id), "suites"), exist_ok=True)
+        for suite in project.test_suites:
+            self._write_suite(project.id, suite)
+        self._write_project_file(project)
+
+    def _write_project_file(self, project):
+        if not self.is_loaded(project):
+            self._load_contents(project)
+        write_json_atomic(os.path.join(self._project_dir(project.id), "project.json"), {
+            'id': project.id,
+            'name': project.name,
+            'description': project.description,
+            'history': project.history,
+            'suites': [s.id for s in project.test_suites],
+        }, indent=4)
+
+    def _write_suite(self, project_id, suite):
+        os.makedirs(os.path.join(self._project_dir(project_id), "suites"), exist_ok=True)
+        write_json_atomic(self._suite_path(project_id, suite.id), suite.to_dict(), indent=4)
+
+    def _write_manifest(self):
+        write_json_atomic(self.manifest_path, [
+            {'id': p.id, 'name': p.name, 'description': p.description} for p in self._projects.values()
+        ], indent=4)
@@ -0,0 +1,291 @@
+import json
+import os
+import sqlite3
+import threading
+import uuid
+import logging
+from ..models.project import Project
+from ..models.test_suite import TestSuite
+from ..models.test import Test
+from .data import iter_projects, CustomEncoder
+from .storage import Storage
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS projects (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    description TEXT NOT NULL DEFAULT '',
+    history TEXT NOT NULL DEFAULT '[]',
+    position INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS suites (
+    id TEXT PRIMARY KEY,
+    project_id TEXT NOT NULL REFERENCES projects(id) ON DELETE CASCADE,
+    name TEXT,
+    description TEXT NOT NULL DEFAULT '',
+    position INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_suites_project ON suites(project_id, position);
+CREATE TABLE IF NOT EXISTS tests (
+    id TEXT PRIMARY KEY,
+    suite_id TEXT NOT NULL REFERENCES suites(id) ON DELETE CASCADE,
+    name TEXT,
+    result TEXT,
+    depends_on TEXT NOT NULL DEFAULT '[]',
+    position INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_tests_suite ON tests(suite_id, position);
+CREATE TABLE IF NOT EXISTS steps (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    test_id TEXT NOT NULL REFERENCES tests(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_steps_test ON steps(test_id, position);
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    project_id TEXT NOT NULL,
+    origin TEXT NOT NULL
+);
+"""
+
+
+class SqliteStorage(Storage):
+    """
+    SQLite backend with one table per entity and row-level writes.
+
+    The database runs in WAL mode so several Flask workers can share it:
+    readers never block the single writer, and every write is one short
+    ``BEGIN IMMEDIATE`` transaction.  Each write also appends to the
+    ``changes`` table, which lets other processes reload only the projects
+    that changed (see poll_changes).  When the database is empty on first
+    start, ``import_path`` (the JSON store) is imported into it.
+    """
+
+    writes_full_tree = False
+
+    def __init__(self, db_path="projects.db", import_path=None, busy_timeout=5000, keep_changes=10000):
+        self.db_path = db_path
+        self.import_path = import_path
+        self.busy_timeout = busy_timeout
+        self.keep_changes = keep_changes
+        self.origin = uuid.uuid4().hex
+        self._local = threading.local()
+        self._last_change = 0
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        if 'depends_on' not in [row[1] for row in conn.execute("PRAGMA table_info(tests)")]:
+            # Databases created before test dependencies existed.
+            conn.execute("ALTER TABLE tests ADD COLUMN depends_on TEXT NOT NULL DEFAULT '[]'")
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Autocommit mode; writes open their own transactions in _write.
+            conn = sqlite3.connect(self.db_path, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout)}")
+            self._local.conn = conn
+        return conn
+
+    def _write(self, project_id, statements):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for sql, params in statements:
+                conn.execute(sql, params)
+            cursor = conn.execute("INSERT INTO changes (project_id, origin) VALUES (?, ?)", (project_id, self.origin))
+            if cursor.lastrowid % 1000 == 0:
+                conn.execute("DELETE FROM changes WHERE seq <= ?", (cursor.lastrowid - self.keep_changes,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    # ----- reads -----
+
+    def load(self):
+        conn = self._conn()
+        self._last_change = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM changes").fetchone()[0]
+        if conn.execute("SELECT COUNT(*) FROM projects").fetchone()[0] == 0:
+            if self.import_path and os.path.exists(self.import_path):
+                self.import_projects(iter_projects(self.import_path))
+        ids = [row[0] for row in conn.execute("SELECT id FROM projects ORDER BY position")]
+        return [self.load_project(project_id) for project_id in ids]
+
+    def load_project(self, project_id):
+        conn = self._conn()
+        row = conn.execute("SELECT id, name, description, history FROM projects WHERE id = ?", (project_id,)).fetchone()
+        if row is None:
+            return None
+        suites = []
+        for suite_id, name, description in conn.execute(
+                "SELECT id, name, description FROM suites WHERE project_id = ? ORDER BY position", (project_id,)):
+            tests = [self.load_test(test_id) for (test_id,) in conn.execute(
+                "SELECT id FROM tests WHERE suite_id = ? ORDER BY position", (suite_id,))]
+            suites.append(TestSuite(name=name, description=description, id=suite_id, tests=tests))
+        return Project(id=row[0], name=row[1], description=row[2], test_suites=suites, history=json.loads(row[3]))
+
+    def load_test(self, test_id):
+        """Loads a single test and its steps."""
+        conn = self._conn()
+        row = conn.execute("SELECT id, name, result, depends_on FROM tests WHERE id = ?", (test_id,)).fetchone()
+        if row is None:
+            return None
+        return Test(id=row[0], name=row[1], result=row[2], depends_on=json.loads(row[3]),
+                    steps=self.load_steps(test_id))
+
+    def load_steps(self, test_id):
+        rows = self._conn().execute("SELECT data FROM steps WHERE test_id = ? ORDER BY position", (test_id,))
+        return [json.loads(data) for (data,) in rows]
+
+    def poll_changes(self):
+        conn = self._conn()
+        data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+        if data_version == getattr(self._local, 'data_version', None):
+            # Nothing was committed by another connection since the last poll.
+            return []
+        self._local.data_version = data_version
+        rows = conn.execute("SELECT seq, project_id, origin FROM changes WHERE seq > ? ORDER BY seq",
+                            (self._last_change,)).fetchall()
+        if rows:
+            self._last_change = rows[-1][0]
+        return list(dict.fromkeys(project_id for _, project_id, origin in rows if origin != self.origin))
+
+    # ----- writes -----
+
+    def record(self, op, projects):
+        name = op['op']
+        project_id = op.get('project_id') or op.get('project', {}).get('id')
+        statements = []
+        if name == 'create_project':
+            statements = self._insert_project(op['project'])
+        elif name == 'update_project':
+            statements.append(("UPDATE projects SET name = ? WHERE id = ?", (op['name'], project_id)))
+            if op.get('description') is not None:
+                statements.append(("UPDATE projects SET description = ? WHERE id = ?", (op['description'], project_id)))
+        elif name == 'delete_project':
+            statements.append(("DELETE FROM projects WHERE id = ?", (project_id,)))
+        elif name == 'create_suite':
+            statements = self._insert_suite(project_id, op['suite'])
+        elif name == 'update_suite':
+            statements.append(("UPDATE suites SET name = ? WHERE id = ?", (op['name'], op['suite_id'])))
+        elif name == 'delete_suite':
+            statements.append(("DELETE FROM suites WHERE id = ?", (op['suite_id'],)))
+        elif name == 'create_test':
+            statements = self._insert_test(op['suite_id'], op['test'])
+        elif name == 'update_test':
+            statements.append(("UPDATE tests SET name = ? WHERE id = ?", (op['name'], op['test_id'])))
+            if op.get('depends_on') is not None:
+                statements.append(("UPDATE tests SET depends_on = ? WHERE id = ?",
+                                   (self._dumps(op['depends_on']), op['test_id'])))
+        elif name == 'set_test_result':
+            statements.append(("UPDATE tests SET result = ? WHERE id = ?", (op['result'], op['test_id'])))
+        elif name == 'delete_test':
+            statements.append(("DELETE FROM tests WHERE id = ?", (op['test_id'],)))
+        elif name == 'add_step':
+            statements.append((
+                "INSERT INTO steps (test_id, position, data) "
+                "SELECT ?, COALESCE(MAX(position) + 1, 0), ? FROM steps WHERE test_id = ?",
+                (op['test_id'], self._dumps(op['step']), op['test_id'])))
+        elif name == 'update_step':
+            statements.append(("UPDATE steps SET data = ? WHERE test_id = ? AND position = ?",
+                               (self._dumps(op['step']), op['test_id'], op['index'])))
+        elif name == 'delete_step':
+            statements.append(("DELETE FROM steps WHERE test_id = ? AND position = ?", (op['test_id'], op['index'])))
+            statements.append(("UPDATE steps SET position = position - 1 WHERE test_id = ? AND position > ?",
+                               (op['test_id'], op['index'])))
+        elif name == 'set_steps':
+            statements = self._replace_steps(op['test_id'], op['steps'])
+        else:
+            logging.warning(f"Unknown storage operation: {name}")
+            return
+        self._write(project_id, statements)
+
+    def save(self, projects):
+        """Rewrites the database from ``projects``."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM projects")
+            for project in projects:
+                for sql, params in self._insert_project(project.to_dict()):
+                    conn.execute(sql, params)
+                conn.execute("INSERT INTO changes (project_id, origin) VALUES (?, ?)", (project.id, self.origin))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def import_projects(self, projects):
+        """
+        Imports projects, e.g. from the JSON store, in one transaction.
+        ``projects`` may be a generator such as data.iter_projects().
+        """
+        logging.info(f"Importing projects into {self.db_path}")
+        self.save(projects)
+
+    def load_jobs(self):
+        return [json.loads(data) for data, in self._conn().execute("SELECT data FROM jobs ORDER BY position")]
+
+    def save_jobs(self, jobs):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM jobs")
+            conn.executemany("INSERT INTO jobs (id, position, data) VALUES (?, ?, ?)",
+                             [(job['id'], position, self._dumps(job)) for position, job in enumerate(jobs)])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def _dumps(self, data):
+        return json.dumps(data, cls=CustomEncoder)
+
+    def _insert_project(self, project):
+        statements = [(
+            "INSERT INTO projects (id, name, description, history, position) "
+            "SELECT ?, ?, ?, ?, COALESCE(MAX(position) + 1, 0) FROM projects",
+            (project['id'], project['name'], project.get('description') or "",
+             self._dumps(project.get('history', []))))]
+        for suite in project.get('test_suites', []):
+            statements += self._insert_suite(project['id'], suite)
+        return statements
+
+    def _insert_suite(self, project_id, suite):
+        statements = [(
+            "INSERT INTO suites (id, project_id, name, description, position) "
+            "SELECT ?, ?, ?, ?, COALESCE(MAX(position) + 1, 0) FROM suites WHERE project_id = ?",
+            (suite['id'], project_id, suite.get('name'), suite.get('description') or "", project_id))]
+        for test in suite.get('tests', []):
+            statements += self._insert_test(suite['id'], test)
+        return statements
+
+    def _insert_test(self, suite_id, test):
+        statements = [(
+            "INSERT INTO tests (id, suite_id, name, result, depends_on, position) "
+            "SELECT ?, ?, ?, ?, ?, COALESCE(MAX(position) + 1, 0) FROM tests WHERE suite_id = ?",
+            (test['id'], suite_id, test.get('name'), test.get('result'), self._dumps(test.get('depends_on') or []),
+             suite_id))]
+        return statements + self._replace_steps(test['id'], test.get('steps', []))
+
+    def _replace_steps(self, test_id, steps):
+        statements = [("DELETE FROM steps WHERE test_id = ?", (test_id,))]
+        for position, step in enumerate(steps):
+            statements.append(("INSERT INTO steps (test_id, position, data) VALUES (?, ?, ?)",
+                               (test_id, position, self._dumps(step))))
+        return statements
@@ -0,0 +1,187 @@
+import json
+import os
+import threading
+import time
+import logging
+from ..models.project import Project
+from .data import load_projects, save_projects, write_json_atomic
+
+
+class Storage:
+    """
+    Persistence backend used by ProjectManager.
+
+    ``record`` receives every mutation as a single operation dict (see
+    journal.apply_operation for the operation names and fields) together
+    with the current project list, so a backend may either write just the
+    change or fall back to rewriting everything.
+
+    Backends that load project contents lazily call ``on_load(project)``
+    and ``on_evict(project)`` so the manager can keep its indexes in step.
+    Before evicting they call ``try_lock(project)``, which returns a release
+    function, or None while the project is in use and must stay loaded.
+    """
+
+    on_load = None
+    on_evict = None
+    try_lock = None
+
+    # Stores that persist by rewriting every project are saved outside the
+    # manager's write locks; ``serialize(project)`` returns a consistent dict.
+    writes_full_tree = True
+    serialize = None
+
+    # File holding run jobs (see save_jobs); None keeps them in memory only.
+    jobs_path = None
+
+    def new_project(self, name, description=""):
+        """The object for a project being created; lazy stores return one they can evict."""
+        return Project(name=name, description=description)
+
+    def load(self):
+        """Returns the list of stored projects."""
+        raise NotImplementedError
+
+    def record(self, op, projects):
+        """Persists a single mutation."""
+        self.save(projects)
+
+    def save(self, projects):
+        """Persists the full project tree."""
+        raise NotImplementedError
+
+    def poll_changes(self):
+        """Returns ids of projects changed by other processes since the last poll."""
+        return []
+
+    def load_project(self, project_id):
+        """Loads a single project, or None if it no longer exists."""
+        return next((p for p in self.load() if p.id == project_id), None)
+
+    def is_loaded(self, project):
+        """Whether the project's suites are in memory."""
+        return True
+
+    def ensure_loaded(self, project):
+        """Loads the project's suites if needed; returns True if it had to."""
+        return False
+
+    def load_jobs(self):
+        """Returns the persisted run jobs as dicts."""
+        if not self.jobs_path or not os.path.exists(self.jobs_path):
+            return []
+        with open(self.jobs_path, "r") as f:
+            return json.load(f)
+
+    def save_jobs(self, jobs):
+        """Persists the run jobs, a list of dicts, replacing the previous set."""
+        if self.jobs_path:
+            write_json_atomic(self.jobs_path, jobs, indent=4)
+
+    def flush(self):
+        """Blocks until every pending write has reached disk."""
+        pass
+
+    def close(self):
+        pass
+
+
+class JsonStorage(Storage):
+    """
+    The default store: the whole tree in a single JSON document.
+
+    With ``write_behind=True`` saves only mark the store dirty; a background
+    thread writes the file once per ``coalesce_window`` seconds, so bursts of
+    mutations cost one write and request threads never wait on disk I/O.
+    """
+
+    def __init__(self, filepath="projects.json", write_behind=False, coalesce_window=0.5):
+        self.filepath = filepath
+        self.jobs_path = f"{filepath}.jobs.json"
+        self.write_behind = write_behind
+        self.coalesce_window = coalesce_window
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._pending = None
+        self._dirty_since = None
+        self._writer = None
+        self._closed = False
+
+    def load(self):
+        return load_projects(self.filepath)
+
+    def save(self, projects):
+        if not self.write_behind:
+            with self._write_lock:
+                save_projects(projects, self.filepath, self.serialize)
+            return
+        with self._cond:
+            self._pending = projects
+            if self._dirty_since is None:
+                self._dirty_since = time.monotonic()
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_behind_loop, name="json-write-behind", daemon=True)
+                self._writer.start()
+            self._cond.notify()
+
+    def flush(self):
+        self._write_pending()
+
+    def close(self):
+        self.flush()
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        if self._writer:
+            self._writer.join()
+            self._writer = None
+
+    def _write_behind_loop(self):
+        while True:
+            with self._cond:
+                while self._pending is None and not self._closed:
+                    self._cond.wait()
+                if self._pending is None:
+                    return
+                # Let further saves within the window pile onto this write.
+                while self._dirty_since is not None and not self._closed:
+                    delay = self._dirty_since + self.coalesce_window - time.monotonic()
+                    if delay <= 0:
+                        break
+                    self._cond.wait(delay)
+            try:
+                self._write_pending()
+            except Exception:
+                if self._closed:
+                    return
+
+    def _write_pending(self):
+        with self._write_lock:
+            with self._cond:
+                projects, self._pending, self._dirty_since = self._pending, None, None
+            if projects is None:
+                return
+            try:
+                save_projects(projects, self.filepath, self.serialize)
+            except Exception:
+                logging.exception(f"Write-behind save to {self.filepath} failed; will retry")
+                with self._cond:
+                    if self._pending is None:
+                        self._pending, self._dirty_since = projects, time.monotonic()
+                raise
+
+
+def create_storage(kind="json", filepath="projects.json", **options):
+    """Builds a storage backend by name: ``json``, ``journal``, ``sqlite`` or ``sharded``."""
+    if kind == "json":
+        return JsonStorage(filepath, **options)
+    if kind == "journal":
+        from .journal import ProjectJournal
+        return ProjectJournal(filepath, **options)
+    if kind == "sqlite":
+        from .sqlite_storage import SqliteStorage
+        return SqliteStorage(options.pop("db_path", "projects.db"), import_path=filepath, **options)
+    if kind == "sharded":
+        from .sharded_storage import ShardedStorage
+        return ShardedStorage(options.pop("root", "projects"), import_path=filepath, **options)
+    raise ValueError(f"Unknown storage backend: {kind}")
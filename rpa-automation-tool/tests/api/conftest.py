@@ -0,0 +1,19 @@
+import pytest
+import src.app
+from src.app import app
+from src.utils.project_manager import ProjectManager
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    """A fresh ProjectManager in tmp_path, served by the app."""
+    manager = ProjectManager(str(tmp_path / "projects.json"))
+    monkeypatch.setattr(src.app, "project_manager", manager)
+    app.config['TESTING'] = True
+    return manager
+
+
+@pytest.fixture
+def client(manager):
+    with app.test_client() as client:
+        yield client
@@ -95,7 +95,8 @@ def test_run_project_tests(client):
     project_id_to_run = project_to_run['id']
 
     rv = client.post(f'/api/projects/{project_id_to_run}/run')
-    assert rv.status_code == 200 # Check if the request was successful
+    assert rv.status_code == 202 # Runs are queued as background jobs
+    assert json.loads(rv.data)['job_id']
     # Further assertions can be added here to check the results of the run if the API returned them
 
 def test_run_single_test(client):
@@ -119,7 +120,7 @@ def test_run_single_test(client):
     test_id = test['id']
 
     rv = client.post(f'/api/projects/{project_id}/suites/{suite_id}/tests/{test_id}/run')
-    assert rv.status_code == 200 # Check if the request was successful
+    assert rv.status_code == 202 # Runs are queued as background jobs
     # Further assertions can be added here
 
 def test_record_test(client):
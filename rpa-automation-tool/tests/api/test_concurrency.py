@@ -0,0 +1,44 @@
+import json
+import threading
+from src.app import app
+
+
+def test_concurrent_api_writes_stay_consistent(manager):
+    client = app.test_client()
+    projects = [json.loads(client.post('/api/projects', json={"name": f"Project {i}"}).data) for i in range(2)]
+    errors = []
+
+    def writer(worker):
+        client = app.test_client()
+        project_id = projects[worker % 2]['id']
+        try:
+            rv = client.post(f'/api/projects/{project_id}/suites', json={"name": f"Suite {worker}"})
+            suite_id = json.loads(rv.data)['id']
+            rv = client.post(f'/api/projects/{project_id}/suites/{suite_id}/tests', json={"name": "Test"})
+            test_id = json.loads(rv.data)['id']
+            base = f'/api/projects/{project_id}/suites/{suite_id}/tests/{test_id}'
+            for i in range(25):
+                rv = client.post(f'{base}/steps', json={"action": "click", "target": f"#{i}"})
+                assert rv.status_code == 201
+                # Readers run alongside the writers
+                assert client.get(f'/api/projects/{project_id}').status_code == 200
+            client.delete(f'{base}/step/0')
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer, args=(worker,)) for worker in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+
+    manager.flush()
+    with open(manager.filepath) as f:
+        stored = json.load(f)
+    # The file on disk matches memory, and every write landed exactly once
+    assert stored == [manager.serialize_project(p) for p in manager.get_all_projects()]
+    suites = [suite for project in stored for suite in project['test_suites']]
+    assert len(suites) == 8
+    for suite in suites:
+        assert [s['target'] for s in suite['tests'][0]['steps']] == [f"#{i}" for i in range(1, 25)]
@@ -0,0 +1,52 @@
+import json
+import pytest
+import src.app
+from src.app import app
+from src.utils.response_cache import ResponseCache
+
+
+@pytest.fixture(autouse=True)
+def fresh_response_cache(monkeypatch):
+    monkeypatch.setattr(src.app, "response_cache", ResponseCache())
+
+
+def test_unchanged_entities_answer_304_without_serializing(client, monkeypatch):
+    project_id = json.loads(client.post('/api/projects', json={"name": "P"}).data)['id']
+    suite_id = json.loads(client.post(f'/api/projects/{project_id}/suites', json={"name": "S"}).data)['id']
+    url = f'/api/projects/{project_id}/suites/{suite_id}'
+
+    rv = client.get(url)
+    etag = rv.headers['ETag']
+    assert rv.status_code == 200 and etag
+
+    def fail(self):
+        raise AssertionError("serialized an unchanged suite")
+    monkeypatch.setattr("src.models.test_suite.TestSuite.to_dict", fail)
+    rv = client.get(url, headers={'If-None-Match': etag})
+    assert rv.status_code == 304 and rv.headers['ETag'] == etag
+    # Without a validator the cached bytes are served, still without to_dict().
+    assert json.loads(client.get(url).data)['name'] == "S"
+    monkeypatch.undo()
+
+
+def test_mutations_bump_entity_and_parent_versions(client):
+    project_id = json.loads(client.post('/api/projects', json={"name": "P"}).data)['id']
+    suite_id = json.loads(client.post(f'/api/projects/{project_id}/suites', json={"name": "S"}).data)['id']
+    other_id = json.loads(client.post(f'/api/projects/{project_id}/suites', json={"name": "Other"}).data)['id']
+    test_id = json.loads(client.post(f'/api/projects/{project_id}/suites/{suite_id}/tests', json={"name": "T"}).data)['id']
+    urls = {
+        'project': f'/api/projects/{project_id}',
+        'suite': f'/api/projects/{project_id}/suites/{suite_id}',
+        'other': f'/api/projects/{project_id}/suites/{other_id}',
+        'test': f'/api/projects/{project_id}/suites/{suite_id}/tests/{test_id}',
+    }
+    before = {name: client.get(url).headers['ETag'] for name, url in urls.items()}
+
+    client.post(f"{urls['test']}/steps", json={"action": "click", "target": "#ok"})
+
+    after = {name: client.get(url, headers={'If-None-Match': before[name]}) for name, url in urls.items()}
+    assert after['other'].status_code == 304
+    for name in ('project', 'suite', 'test'):
+        assert after[name].status_code == 200
+        assert after[name].headers['ETag'] != before[name]
+    assert json.loads(after['test'].data)['steps'] == [{"action": "click", "target": "#ok"}]
@@ -0,0 +1,55 @@
+import json
+import pytest
+import src.app
+from src.app import app
+from src.core.events import EventBus
+from src.core.jobs import JobManager
+
+
+@pytest.fixture(autouse=True)
+def job_manager(manager, monkeypatch):
+    monkeypatch.setattr(src.app, "job_manager", JobManager(manager))
+
+
+def parse_sse(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines() if not line.startswith(":"))
+        events.append((fields['event'], json.loads(fields['data'])))
+    return events
+
+
+def test_run_streams_test_and_step_events(manager):
+    project = manager.create_project("P")
+    suite = manager.create_test_suite(project.id, "S")
+    test = manager.create_test(project.id, suite.id, "T")
+    for target in ("#a", "#b"):
+        manager.add_step(project.id, suite.id, test.id, {"action": "click", "target": target})
+    client = app.test_client()
+
+    job = json.loads(client.post(f'/api/projects/{project.id}/suites/{suite.id}/run').data)
+    rv = client.get(job['events_url'])
+    assert rv.mimetype == 'text/event-stream'
+    events = parse_sse(rv.get_data(as_text=True))
+
+    assert [(name, e['scope']) for name, e in events] == [
+        ('started', 'run'), ('started', 'test'), ('passed', 'step'), ('passed', 'step'),
+        ('passed', 'test'), ('finished', 'run')]
+    assert [e['id'] for _, e in events] == list(range(1, 7))
+    assert all(e['duration'] >= 0 for _, e in events[2:5])
+    assert events[-1][1]['status'] == 'succeeded'
+
+    # Reconnecting with Last-Event-ID only replays what was missed.
+    rv = client.get(job['events_url'], headers={'Last-Event-ID': '4'})
+    assert [e['id'] for _, e in parse_sse(rv.get_data(as_text=True))] == [5, 6]
+
+
+def test_slow_subscribers_drop_oldest_events_without_blocking():
+    bus = EventBus(max_buffered=3, history=2)
+    subscription = bus.subscribe("run")
+    for i in range(10):
+        bus.publish("run", {'type': 'passed', 'n': i})
+    bus.close("run")
+    assert [e['n'] for e in subscription.get(timeout=0)] == [7, 8, 9]
+    assert subscription.dropped == 7 and subscription.closed
+    assert [e['n'] for e in bus.subscribe("run").get(timeout=0)] == [8, 9]
@@ -0,0 +1,97 @@
+import json
+import threading
+import time
+import src.app
+from src.app import app
+from src.core import runner as runner_module
+from src.core.jobs import JobManager
+
+
+def use_jobs(monkeypatch, job_manager):
+    monkeypatch.setattr(src.app, "job_manager", job_manager)
+    return job_manager
+
+
+def wait_for(client, job_id, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = json.loads(client.get(f'/api/jobs/{job_id}').data)
+        if job['status'] in ('succeeded', 'failed', 'cancelled'):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def make_project(manager, tests=3):
+    project = manager.create_project("Nightly")
+    suite = manager.create_test_suite(project.id, "Suite")
+    for i in range(tests):
+        test = manager.create_test(project.id, suite.id, f"Test {i}")
+        manager.add_step(project.id, suite.id, test.id, {"action": "click", "target": "#go"})
+    return project, suite
+
+
+def test_run_returns_202_and_job_reports_results(manager, monkeypatch):
+    use_jobs(monkeypatch, JobManager(manager))
+    project, suite = make_project(manager)
+    client = app.test_client()
+
+    rv = client.post(f'/api/projects/{project.id}/run?max_workers=2')
+    assert rv.status_code == 202
+    body = json.loads(rv.data)
+    assert rv.headers['Location'] == body['status_url']
+
+    job = wait_for(client, body['job_id'])
+    assert job['status'] == 'succeeded'
+    assert (job['completed'], job['total']) == (3, 3)
+    assert [r['test_id'] for r in job['results']] == [t.id for t in suite.tests]
+    assert job['options'] == {'max_workers': 2}
+
+
+def test_full_queue_backpressure_cancel_and_restart(manager, monkeypatch):
+    release = threading.Event()
+    monkeypatch.setattr(runner_module, "run_step", lambda step: release.wait(5) and "Passed")
+    jobs = use_jobs(monkeypatch, JobManager(manager, workers=1, max_queued=1))
+    project, suite = make_project(manager, tests=1)
+    client = app.test_client()
+
+    running = json.loads(client.post(f'/api/projects/{project.id}/run').data)['job_id']
+    while jobs.get(running).status != 'running':
+        time.sleep(0.01)
+    queued = json.loads(client.post(f'/api/projects/{project.id}/suites/{suite.id}/run').data)['job_id']
+    rv = client.post(f'/api/projects/{project.id}/run')
+    assert rv.status_code == 503 and rv.headers['Retry-After']
+
+    assert json.loads(client.delete(f'/api/jobs/{queued}').data)['status'] == 'cancelled'
+    jobs.flush()
+    stored = {job['id']: job['status'] for job in manager.storage.load_jobs()}
+    assert stored == {running: 'running', queued: 'cancelled'}
+
+    release.set()
+    assert wait_for(client, running)['status'] == 'succeeded'
+    assert client.get('/api/jobs/missing').status_code == 404
+
+
+def test_unfinished_jobs_resume_after_restart(manager, monkeypatch):
+    project, suite = make_project(manager, tests=2)
+    interrupted = {'id': 'job-1', 'project_id': project.id, 'suite_id': suite.id, 'status': 'running', 'completed': 1}
+    manager.storage.save_jobs([interrupted])
+
+    jobs = use_jobs(monkeypatch, JobManager(manager))
+    job = wait_for(app.test_client(), 'job-1')
+    assert job['status'] == 'succeeded' and job['completed'] == 2
+    jobs.close()
+
+
+def test_job_state_is_saved_in_the_background(manager, monkeypatch):
+    saved = []
+    monkeypatch.setattr(manager.storage, "save_jobs", saved.append)
+    jobs = use_jobs(monkeypatch, JobManager(manager, max_queued=20, save_interval=60))
+    project, _ = make_project(manager, tests=0)
+    for _ in range(10):
+        jobs.submit(project.id)
+    jobs.cancel(jobs.submit(project.id).id)
+    # Submitting and cancelling only mark the state changed.
+    assert saved == []
+    jobs.close()
+    assert 1 <= len(saved) <= 2 and len(saved[-1]) == 11
@@ -0,0 +1,38 @@
+import src.app
+from src.app import app
+from src.core import runner as runner_module
+from src.utils.metrics import Histogram, MetricsRegistry
+from src.utils.project_manager import ProjectManager
+
+
+def test_histogram_quantiles_are_within_bucket_error():
+    histogram = Histogram()
+    for ms in range(1, 1001):
+        histogram.observe(ms / 1000)
+    assert abs(histogram.quantile(0.5) - 0.5) < 0.02
+    assert abs(histogram.quantile(0.99) - 0.99) < 0.03
+    assert histogram.count == 1000 and len(histogram.buckets) < 200
+
+
+def test_metrics_endpoint_reports_steps_and_requests(tmp_path, monkeypatch):
+    registry = MetricsRegistry()
+    manager = ProjectManager(str(tmp_path / "projects.json"), metrics=registry)
+    monkeypatch.setattr(src.app, "project_manager", manager)
+    monkeypatch.setattr(src.app, "metrics", registry)
+    monkeypatch.setattr(runner_module, "run_step", lambda step: "Passed")
+    project = manager.create_project("Nightly")
+    suite = manager.create_test_suite(project.id, "Suite")
+    test = manager.create_test(project.id, suite.id, "Login")
+    manager.add_step(project.id, suite.id, test.id, {"type": "mouse_click", "x": 1, "y": 2, "action": "click"})
+    manager.add_step(project.id, suite.id, test.id, {"action": "type", "target": "#user", "value": "bob"})
+    manager.run_all_tests(project.id)
+
+    client = app.test_client()
+    client.get(f'/api/projects/{project.id}')
+    text = client.get('/api/metrics').get_data(as_text=True)
+    assert '# TYPE rpa_step_duration_seconds summary' in text
+    assert 'rpa_step_duration_seconds_count{action="click",type="mouse_click"} 1' in text
+    assert 'rpa_step_duration_seconds{action="type",type="",quantile="0.95"}' in text
+    assert f'rpa_suite_duration_seconds_count{{suite_id="{suite.id}"}} 1' in text
+    assert 'rpa_http_requests_total{method="GET",route="/api/projects/<project_id>",status="200"} 1' in text
+    assert registry.summary('rpa_test_duration_seconds', result="Passed")['count'] == 1
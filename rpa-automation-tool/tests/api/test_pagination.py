@@ -0,0 +1,46 @@
+import json
+
+
+def fetch_all(client, url):
+    items = []
+    while url:
+        rv = client.get(url)
+        assert rv.status_code == 200
+        items.extend(json.loads(rv.data))
+        url = rv.headers.get('Link', '')[1:].split('>')[0] or None
+    return items
+
+
+def test_project_pages_are_stable_across_mutations(client):
+    ids = [json.loads(client.post('/api/projects', json={"name": f"Project {i:02}"}).data)['id'] for i in range(10)]
+
+    rv = client.get('/api/projects?limit=4&view=summary')
+    first = json.loads(rv.data)
+    assert [p['id'] for p in first] == ids[:4]
+    assert 'test_suites' not in first[0]
+
+    # Deleting an item already seen and adding a new one must not shift the rest.
+    client.delete(f'/api/projects/{ids[0]}')
+    client.post('/api/projects', json={"name": "Project 10"})
+    rest = fetch_all(client, rv.headers['Link'][1:].split('>')[0])
+    assert [p['id'] for p in rest][:6] == ids[4:]
+    assert len(rest) == 7
+
+
+def test_sort_prefix_and_step_pages(client):
+    for name in ["beta", "Alpha", "alpine", "gamma"]:
+        client.post('/api/projects', json={"name": name})
+    names = [p['name'] for p in fetch_all(client, '/api/projects?sort=-name&limit=1')]
+    assert names == ["gamma", "beta", "alpine", "Alpha"]
+    names = [p['name'] for p in fetch_all(client, '/api/projects?prefix=AL&sort=name&limit=1')]
+    assert names == ["Alpha", "alpine"]
+    assert client.get('/api/projects?cursor=garbage').status_code == 400
+
+    project_id = json.loads(client.post('/api/projects', json={"name": "Steps"}).data)['id']
+    suite_id = json.loads(client.post(f'/api/projects/{project_id}/suites', json={"name": "S"}).data)['id']
+    test_id = json.loads(client.post(f'/api/projects/{project_id}/suites/{suite_id}/tests', json={"name": "T"}).data)['id']
+    base = f'/api/projects/{project_id}/suites/{suite_id}/tests/{test_id}/steps'
+    for i in range(5):
+        client.post(base, json={"action": "click", "target": f"#b{i}"})
+    steps = fetch_all(client, f'{base}?limit=2')
+    assert [s['target'] for s in steps] == [f"#b{i}" for i in range(5)]
@@ -0,0 +1,21 @@
+import src.app
+from src.core.player import Player
+
+
+class NullDriver:
+    def __getattr__(self, name):
+        return lambda *args: None
+
+
+def test_replay_repeat_is_bounded(manager, client, monkeypatch):
+    monkeypatch.setattr(manager, "player", Player(NullDriver(), speed=0))
+    monkeypatch.setattr(src.app, "MAX_REPLAY_REPEAT", 3)
+    project = manager.create_project("P")
+    suite = manager.create_test_suite(project.id, "S")
+    test = manager.create_test(project.id, suite.id, "T")
+    url = f"/api/projects/{project.id}/suites/{suite.id}/tests/{test.id}/play"
+
+    assert len(client.post(url + "?repeat=3").get_json()["timings"]) == 3
+    for repeat in (0, 4, 10000):
+        response = client.post(f"{url}?repeat={repeat}")
+        assert response.status_code == 400 and response.get_json()["error"] == "repeat must be between 1 and 3"
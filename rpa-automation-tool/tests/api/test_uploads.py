@@ -0,0 +1,153 @@
+import gzip
+import threading
+import time
+import pytest
+import requests
+from werkzeug.serving import make_server
+import src.app
+from src.app import app
+from src.api.api_client import RecordingUploader
+from src.core.ingest import RecordingIngest, SequenceGap, SessionFinished, TooManySessions, UnknownSession
+
+
+@pytest.fixture
+def manager(manager, tmp_path, monkeypatch):
+    monkeypatch.setattr(src.app, "recording_ingest", RecordingIngest(manager, str(tmp_path / "recordings")))
+    return manager
+
+
+def setup_project(manager):
+    project = manager.create_project("Uploads")
+    suite = manager.create_test_suite(project.id, "Suite")
+    return project, suite
+
+
+def test_batches_are_applied_once_and_in_order(manager, tmp_path):
+    project, suite = setup_project(manager)
+    test = manager.create_test(project.id, suite.id, "Login")
+    url = f"/api/projects/{project.id}/suites/{suite.id}/tests/{test.id}/record/sessions/s1"
+    client = app.test_client()
+    batch = gzip.compress(b'{"type": "keyboard_press", "key": "h", "time": 0.1}\n'
+                          b'{"type": "keyboard_press", "key": "i", "time": 0.2}\n')
+    headers = {"Content-Type": "application/x-ndjson", "Content-Encoding": "gzip"}
+
+    assert client.post(url + "/batches/1", data=batch, headers=headers).status_code == 404
+    assert client.post(url + "/batches/0", data=batch, headers=headers).get_json()["steps"] == 2
+    assert client.post(url + "/batches/0", data=batch, headers=headers).get_json()["duplicate"] is True
+    response = client.post(url + "/batches/2", data=batch, headers=headers)
+    assert response.status_code == 409 and response.get_json()["expected"] == 1
+    assert client.post(url + "/batches/1", data=b"[1]\n").status_code == 400
+    bad_time = b'{"type": "keyboard_press", "key": "q", "time": "bad"}\n'
+    assert client.post(url + "/batches/1", data=bad_time).get_json() == {"error": "Line 1: invalid 'time'"}
+    assert manager.get_test_steps(project.id, suite.id, test.id) == []
+
+    summary = client.post(url + "/finish").get_json()
+    assert summary["events"] == 2 and summary["steps_recorded"] == 1
+    assert list(manager.get_test_steps(project.id, suite.id, test.id))[0]["value"] == "hi"
+    assert client.post(url + "/finish").get_json() == summary
+    assert list((tmp_path / "recordings").iterdir()) == []
+
+
+class LosesFirstResponse(requests.Session):
+    def __init__(self):
+        super().__init__()
+        self.lost = False
+
+    def post(self, url, **kwargs):
+        response = super().post(url, **kwargs)
+        if not self.lost:
+            self.lost = True
+            raise requests.ConnectionError("connection reset")
+        return response
+
+
+def test_concurrent_uploaders_stream_recordings(manager):
+    project, suite = setup_project(manager)
+    tests = [manager.create_test(project.id, suite.id, f"Recording {i}") for i in range(6)]
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    def record(index, test):
+        http = LosesFirstResponse() if index == 0 else None
+        uploader = RecordingUploader(base_url, project.id, suite.id, test.id, batch_size=25, max_delay=0.05,
+                                     backoff=0.01, http=http)
+        for i in range(200):
+            uploader.add({"type": "mouse_click", "x": i, "y": index, "button": "Button.left", "time": i * 1.0})
+        summaries[index] = uploader.close()
+
+    summaries = [None] * len(tests)
+    try:
+        recorders = [threading.Thread(target=record, args=item) for item in enumerate(tests)]
+        for recorder in recorders:
+            recorder.start()
+        for recorder in recorders:
+            recorder.join()
+    finally:
+        server.shutdown()
+
+    for index, test in enumerate(tests):
+        steps = list(manager.get_test_steps(project.id, suite.id, test.id))
+        assert summaries[index]["events"] == 200
+        assert [step["x"] for step in steps] == list(range(200)) and {step["y"] for step in steps} == {index}
+
+
+def test_sessions_resume_after_a_restart(manager, tmp_path):
+    project, suite = setup_project(manager)
+    test = manager.create_test(project.id, suite.id, "Login")
+    directory = str(tmp_path / "recordings")
+    ingest = RecordingIngest(manager, directory)
+    press = lambda key, at: {"type": "keyboard_press", "key": key, "time": at}
+    ingest.append(project.id, suite.id, test.id, "s1", 0, [press("h", 0.1)])
+    ingest.append(project.id, suite.id, test.id, "s1", 1, [press("i", 0.2)])
+    ingest.close()
+    # A batch torn by the crash, never acknowledged.
+    with open(tmp_path / "recordings" / f"{test.id}.s1.rec", "ab") as f:
+        f.write(b"\x03\x00\x03\x00")
+
+    assert manager.recover_recordings(directory) == []
+    assert manager.get_test_steps(project.id, suite.id, test.id) == []
+    restarted = RecordingIngest(manager, directory)
+    assert restarted.resume() == ["s1"]
+    assert restarted.append(project.id, suite.id, test.id, "s1", 1, [press("i", 0.2)])["duplicate"] is True
+    with pytest.raises(SequenceGap):
+        restarted.append(project.id, suite.id, test.id, "s1", 3, [press("!", 0.4)])
+    assert restarted.append(project.id, suite.id, test.id, "s1", 2, [press("!", 0.3)])["steps"] == 3
+    assert restarted.finish(project.id, suite.id, test.id, "s1")["events"] == 3
+    assert list(manager.get_test_steps(project.id, suite.id, test.id))[0]["value"] == "hi!"
+
+
+def test_idle_sessions_are_dropped(manager, tmp_path):
+    project, suite = setup_project(manager)
+    test = manager.create_test(project.id, suite.id, "Login")
+    ingest = RecordingIngest(manager, str(tmp_path / "recordings"), max_sessions=1, idle_timeout=60)
+    ingest.append(project.id, suite.id, test.id, "s1", 0, [{"type": "custom", "action": "wait"}])
+    with pytest.raises(TooManySessions):
+        ingest.append(project.id, suite.id, test.id, "s2", 0, [])
+
+    assert ingest.expire(time.monotonic() + 30) == []
+    assert ingest.expire(time.monotonic() + 60) == ["s1"]
+    assert list((tmp_path / "recordings").iterdir()) == []
+    with pytest.raises(UnknownSession):
+        ingest.append(project.id, suite.id, test.id, "s1", 1, [])
+    assert ingest.append(project.id, suite.id, test.id, "s2", 0, [])["steps"] == 0
+
+
+def test_finished_session_ids_cannot_be_reused(manager, tmp_path):
+    project, suite = setup_project(manager)
+    tests = [manager.create_test(project.id, suite.id, f"Test {i}").id for i in range(2)]
+    ingest = RecordingIngest(manager, str(tmp_path / "recordings"), max_sessions=1)
+    step = {"type": "custom", "action": "wait"}
+    for session_id in ("s1", "s2"):
+        ingest.append(project.id, suite.id, tests[0], session_id, 0, [step])
+        ingest.finish(project.id, suite.id, tests[0], session_id)
+
+    # s2's result is still kept, so its requests can be retried; s1's is not.
+    assert ingest.append(project.id, suite.id, tests[0], "s2", 0, [step])["duplicate"] is True
+    assert ingest.finish(project.id, suite.id, tests[0], "s2")["events"] == 1
+    for test_id, session_id in ((tests[0], "s1"), (tests[1], "s1"), (tests[1], "s2")):
+        with pytest.raises(SessionFinished):
+            ingest.append(project.id, suite.id, test_id, session_id, 0, [step])
+        with pytest.raises(SessionFinished):
+            ingest.finish(project.id, suite.id, test_id, session_id)
+    assert manager.get_test_steps(project.id, suite.id, tests[1]) == []
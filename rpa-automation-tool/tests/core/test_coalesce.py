@@ -0,0 +1,73 @@
+import pytest
+from src.core.coalesce import coalesce, expand, shortcut_keys
+from src.core.player import ConsoleDriver, Player, compile_plan
+from src.models.test import Test
+
+
+def login_recording():
+    steps, t = [], 0.0
+
+    def event(type, **fields):
+        nonlocal t
+        t += 0.12
+        steps.append({"type": type, **fields, "time": round(t, 3)})
+
+    event("mouse_click", x=300, y=200, button="Button.left")
+    event("mouse_click", x=301, y=201, button="Button.left")
+    event("keyboard_press", key="Key.shift")
+    for char in "Bob":
+        event("keyboard_press", key=char)
+        event("keyboard_release", key=char)
+        if char == "B":
+            event("keyboard_press", key="Key.shift")  # auto-repeat while held
+            event("keyboard_release", key="Key.shift")
+    event("keyboard_press", key="Key.tab")
+    event("keyboard_release", key="Key.tab")
+    event("keyboard_press", key="Key.ctrl_l")
+    event("keyboard_press", key="\x16")
+    event("keyboard_release", key="\x16")
+    event("keyboard_release", key="Key.ctrl_l")
+    event("keyboard_press", key="Key.enter")
+    event("mouse_path", path=[0, 0, 0, 10, 10, 50])
+    return steps
+
+
+def test_coalesce_merges_text_shortcuts_and_double_clicks():
+    raw = login_recording()
+    steps = coalesce(raw)
+
+    assert [(s["type"], s.get("value") or s.get("key")) for s in steps] == [
+        ("double_click", None), ("type_text", "Bob"), ("keyboard_press", "Key.tab"),
+        ("shortcut", "ctrl+v"), ("keyboard_press", "Key.enter"), ("mouse_path", None)]
+    assert steps[0]["time"] == 0.12 and steps[0]["saved"] == pytest.approx(0.12)
+    # The time spent between clicks and keystrokes is taken off later steps.
+    saved = steps[0]["saved"] + steps[1]["saved"]
+    assert steps[-1]["time"] == pytest.approx(raw[-1]["time"] - saved)
+    assert "raw" not in steps[4] and "raw" not in steps[5]
+    assert shortcut_keys("ctrl+shift+t") == ("ctrl", "shift", "t") and shortcut_keys("ctrl++") == ("ctrl", "+")
+
+
+def test_expand_restores_the_recorded_events():
+    raw = login_recording()
+    restored = expand(coalesce(raw))
+
+    assert [{k: v for k, v in s.items() if k != "time"} for s in restored] == \
+        [{k: v for k, v in s.items() if k != "time"} for s in raw]
+    assert [s["time"] for s in restored] == pytest.approx([s["time"] for s in raw])
+
+
+def test_coalesced_steps_replay_faster():
+    raw = Test("Raw", steps=[{"type": "keyboard_press", "key": c, "time": i * 0.15} for i, c in enumerate("secret!")])
+    coalesced = Test("Coalesced", steps=coalesce(raw.steps))
+    typed = []
+
+    class Driver(ConsoleDriver):
+        def type(self, text):
+            typed.append(text)
+
+    player = Player(Driver(), clock=lambda: 0.0, sleep=lambda seconds: None)
+    assert len(compile_plan(coalesced)) == 1 and typed == []
+    raw_report, = player.play(raw)
+    coalesced_report, = player.play(coalesced)
+    assert typed == ["secret!"]
+    assert coalesced_report.recorded_duration == 0.0 < raw_report.recorded_duration
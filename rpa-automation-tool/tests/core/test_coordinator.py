@@ -0,0 +1,79 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+from multiprocessing.connection import Listener
+from pathlib import Path
+from src.core.coordinator import Coordinator, make_shards
+from src.core.worker import run_worker
+from src.utils.project_manager import ProjectManager
+
+ROOT = Path(__file__).resolve().parents[2]
+
+
+def snapshot(test_id, depends_on=()):
+    return ("s1", {"id": test_id, "name": test_id, "steps": [], "depends_on": list(depends_on)})
+
+
+def test_shards_keep_dependent_tests_together_and_balance_durations():
+    snapshots = [snapshot("login"), snapshot("cart", ["login"]), snapshot("a"), snapshot("b"), snapshot("c")]
+    shards = make_shards(snapshots, 3, {"login": 1.0, "cart": 1.0, "a": 2.5, "b": 1.0, "c": 1.0})
+    assert sorted(map(sorted, shards)) == [[0, 1], [2], [3, 4]]
+    assert shards[0] == [2]  # heaviest first
+    assert len(make_shards(snapshots, 10)) == 4
+
+
+def start_worker(coordinator, name):
+    env = dict(os.environ, PYNPUT_BACKEND="dummy", RPA_COORDINATOR_KEY=coordinator.authkey.decode())
+    host, port = coordinator.address
+    return subprocess.Popen([sys.executable, "-m", "src.core.worker", "--connect", f"{host}:{port}", "--name", name],
+                            cwd=ROOT, env=env)
+
+
+def test_local_worker_processes_run_a_project(tmp_path):
+    coordinator = Coordinator(authkey=b"secret", shards=4)
+    workers = [start_worker(coordinator, f"w{i}") for i in range(2)]
+    try:
+        deadline = time.monotonic() + 30
+        while coordinator.max_workers < 2 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        manager = ProjectManager(str(tmp_path / "projects.json"), runner=coordinator)
+        project = manager.create_project("Nightly")
+        for s in range(2):
+            suite = manager.create_test_suite(project.id, f"Suite {s}")
+            previous = None
+            for t in range(4):
+                test = manager.create_test(project.id, suite.id, f"Test {s}.{t}",
+                                           depends_on=[previous.id] if previous and t == 1 else None)
+                manager.add_step(project.id, suite.id, test.id, {"action": "click", "target": f"#{s}-{t}"})
+                previous = test
+
+        results = manager.run_all_tests(project.id)
+        expected = [t.id for s in project.test_suites for t in s.tests]
+        assert [r["test_id"] for r in results] == expected
+        assert all(r["result"] == "Passed" and r["step_results"] == ["Passed"] for r in results)
+        assert all(t.result == "Passed" for s in project.test_suites for t in s.tests)
+        assert set(coordinator.completed) == {"w0", "w1"}
+    finally:
+        coordinator.close()
+        for worker in workers:
+            worker.wait(10)
+
+
+def test_worker_ignores_a_cancel_for_an_earlier_run():
+    with Listener(("127.0.0.1", 0), authkey=b"secret") as listener:
+        worker = threading.Thread(target=run_worker, args=(listener.address, b"secret", "w0"))
+        worker.start()
+        with listener.accept() as conn:
+            assert conn.recv()['type'] == 'hello'
+            tests = [snapshot(f"t{i}") for i in range(3)]
+            conn.send({'type': 'shard', 'run': 'second', 'fail_fast': False, 'tests': tests})
+            # Sent for the first run after its shard was done; it arrives while the second one runs.
+            conn.send({'type': 'cancel', 'run': 'first'})
+            results = []
+            while (message := conn.recv())['type'] == 'result':
+                results.append(message['result'])
+            conn.send({'type': 'stop'})
+        worker.join(10)
+    assert [(r['test_id'], r['result']) for r in results] == [("t0", "Passed"), ("t1", "Passed"), ("t2", "Passed")]
@@ -0,0 +1,113 @@
+import io
+import json
+import os
+import pytest
+from src.core import event_log
+from src.core.event_log import EventLog, iter_steps, read_meta, recover, write_json
+from src.core.recorder import Recorder
+from src.models.test import Test
+from src.utils.project_manager import ProjectManager
+
+STEPS = [
+    {"type": "mouse_click", "x": 10, "y": 20.5, "button": "Button.left", "time": 0.25},
+    {"type": "mouse_path", "time": 0.5, "path": [10, 20, 0, 40, 60, 120]},
+    {"type": "keyboard_press", "key": "Key.media_volume_mute", "time": 1.0},
+    {"type": "keyboard_release", "key": "Key.media_volume_mute", "time": 1.125},
+    {"type": "keyboard_press", "key": "é", "time": 1.5},
+    {"type": "mouse_path", "time": 2.0, "path": [1, 2, 0, 3, 4, 10]},
+    {"type": "mouse_path", "time": 2.5, "path": [5, 6, 0, 7, 8, 10]},
+    {"type": "custom", "action": "wait", "value": 3},
+]
+
+
+def test_steps_round_trip_through_fixed_width_records(tmp_path):
+    path = str(tmp_path / "session.rec")
+    log = EventLog(path)
+    log.write_meta(test_id="t1", name="Login")
+    for step in STEPS:
+        log.append(step)
+    log.close()
+
+    assert (os.path.getsize(path) - event_log.HEADER.size) % event_log.RECORD.size == 0
+    assert read_meta(path) == {"test_id": "t1", "name": "Login"}
+    assert list(iter_steps(path)) == STEPS
+    out = io.StringIO()
+    write_json(path, out)
+    assert json.loads(out.getvalue()) == STEPS
+
+
+def test_a_torn_log_is_recovered_up_to_its_last_complete_record(tmp_path):
+    path = str(tmp_path / "session.rec")
+    log = EventLog(path)
+    log.write_meta(test_id="t1", name="Login")
+    for step in STEPS[:3]:
+        log.append(step)
+    log.close()
+    with open(path, "ab") as f:
+        f.write(b"\x03\x00torn")
+
+    test = recover(path, coalesce=False)
+    assert (test.id, test.name) == ("t1", "Login")
+    assert list(test.steps) == STEPS[:3]
+
+
+def test_steps_that_do_not_fit_a_record_are_kept_whole(tmp_path):
+    odd = [
+        {"type": "mouse_click", "x": 1, "y": 2, "button": "Button.left", "time": 0.5, "description": "Save"},
+        {"type": "keyboard_press", "key": "q", "time": "bad"},
+        {"type": "keyboard_press", "key": 7, "time": 1.0},
+        {"type": "mouse_click", "x": 2 ** 60, "y": 2, "button": "Button.left", "time": 1.0},
+        {"type": "mouse_path", "time": 1.5, "path": [1, 2, 0.5, 3, 4, -1]},
+        {"type": "mouse_path", "time": 2.0, "path": [1, 2, 0, 3]},
+        {"type": "mouse_path", "time": 2.5, "path": []},
+        {"type": "keyboard_press", "key": "q"},
+    ]
+    path = str(tmp_path / "session.rec")
+    log = EventLog(path)
+    log.extend(odd)
+
+    # A write that fails keeps none of the names it introduced.
+    def disk_full(data):
+        raise OSError("disk full")
+    write, log._write = log._write, disk_full
+    with pytest.raises(OSError):
+        log.extend([{"type": "keyboard_press", "key": "w", "time": 0.1}])
+    log._write = write
+    log.extend([{"type": "keyboard_press", "key": "w", "time": 0.1}])
+    log.close()
+    assert list(iter_steps(path)) == odd + [{"type": "keyboard_press", "key": "w", "time": 0.1}]
+
+
+def test_recorder_streams_steps_to_the_log_until_stopped(tmp_path):
+    recorder = Recorder(log_dir=str(tmp_path), coalesce=False)
+    test = Test("Logged")
+    recorder.start_recording(test)
+    recorder._on_mouse_click(5, 6, "Button.left", True)
+    recorder._on_key_press("Key.enter")
+    recorder.stop_recording()
+
+    assert [step["type"] for step in test.steps] == ["mouse_click", "keyboard_press"]
+    assert recover(recorder.log.path).id == test.id
+    recorder.discard_log()
+    assert os.listdir(tmp_path) == []
+
+
+def test_startup_recovers_interrupted_sessions_and_drops_finished_ones(tmp_path):
+    manager = ProjectManager(str(tmp_path / "projects.json"))
+    project = manager.create_project("Recorded")
+    suite = manager.create_test_suite(project.id, "Suite")
+    crashed = manager.create_test(project.id, suite.id, "Crashed")
+    saved = manager.create_test(project.id, suite.id, "Saved")
+    manager.add_step(project.id, suite.id, saved.id, {"type": "custom", "action": "edited after recording"})
+    (tmp_path / "recordings").mkdir()
+    for test, finished in ((crashed, False), (saved, True)):
+        log = EventLog(str(tmp_path / "recordings" / f"{test.id}.rec"))
+        log.write_meta(test_id=test.id, name=test.name)
+        log.append(STEPS[0])
+        log.close(finished=finished)
+    assert not event_log.is_closed(str(tmp_path / "recordings" / f"{crashed.id}.rec"))
+
+    assert manager.recover_recordings(str(tmp_path / "recordings")) == [crashed.id]
+    assert list(crashed.steps) == STEPS[:1]
+    assert list(saved.steps) == [{"type": "custom", "action": "edited after recording"}]
+    assert os.listdir(tmp_path / "recordings") == []
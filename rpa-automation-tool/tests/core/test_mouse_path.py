@@ -0,0 +1,57 @@
+import math
+from types import SimpleNamespace
+from src.core import recorder as recorder_module
+from src.core.mouse_path import MousePathRecorder, _distance_to_segment, path_points
+from src.core.player import compile_plan
+from src.core.recorder import Recorder
+from src.models.test import Test
+
+
+def wobbly_path(seconds, rate=100):
+    # A slow circle with a straight stretch in the middle, sampled at ``rate`` Hz.
+    for i in range(int(seconds * rate)):
+        t = i / rate
+        if 10 <= t < 20:
+            yield 600 + round((t - 10) * 30), 400, t
+        else:
+            yield round(400 + 200 * math.cos(t / 3)), round(400 + 200 * math.sin(t / 3)), t
+
+
+def test_paths_are_simplified_within_tolerance_and_bounded():
+    paths = MousePathRecorder(tolerance=2.0, max_points=128)
+    raw = list(wobbly_path(60))
+    steps = [step for step in (paths.add(*point) for point in raw) if step]
+    steps.append(paths.flush())
+
+    vertices = [p for step in steps for p in path_points(step)]
+    assert len(vertices) < len(raw) / 20
+    assert all(len(step["path"]) <= 3 * 128 for step in steps)
+    # Every raw sample lies close to the recorded polyline.
+    polyline = [(x, y) for x, y, _ in vertices]
+    for x, y, _ in raw[::7]:
+        assert min(_distance_to_segment((x, y), a, b) for a, b in zip(polyline, polyline[1:])) <= 2.0 + 3.0
+
+
+def test_recorder_stores_paths_before_clicks_and_replay_interpolates(monkeypatch):
+    clock = SimpleNamespace(now=1000.0)
+    monkeypatch.setattr(recorder_module, "time", SimpleNamespace(time=lambda: clock.now,
+                                                                 perf_counter_ns=lambda: round(clock.now * 1e9)))
+    recorder = Recorder(record_moves=True)
+    test = Test("Hover")
+    recorder.start_recording(test)
+    for x in range(0, 200, 4):
+        clock.now += 0.02
+        recorder._on_mouse_move(x, 50)
+    clock.now += 0.2
+    recorder._on_mouse_click(196, 50, "Button.left", True)
+    recorder.stop_recording()
+
+    assert [step["type"] for step in test.steps] == ["mouse_path", "mouse_click"]
+    assert test.steps[0]["path"] == [0, 50, 0, 196, 50, 980]
+
+    plan = compile_plan(test)
+    moves = [step.args for step in plan.steps[:-1]]
+    assert moves[0] == (0, 50) and moves[-1] == (196, 50)
+    assert all(b[0] - a[0] <= 20 for a, b in zip(moves, moves[1:]))
+    assert [step.at for step in plan.steps] == sorted(step.at for step in plan.steps)
+    assert abs(plan.steps[-2].at - (test.steps[0]["time"] + 0.98)) < 1e-9
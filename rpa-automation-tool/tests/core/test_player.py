@@ -0,0 +1,97 @@
+from src.core import player as player_module
+from src.core.player import Player, ReplayScheduler, compile_plan
+from src.models.test import Test
+from src.utils.project_manager import ProjectManager
+
+
+class RecordingDriver:
+    def __init__(self):
+        self.calls = []
+
+    def click(self, x, y, button):
+        self.calls.append(("click", x, y, button))
+
+    def move(self, x, y):
+        self.calls.append(("move", x, y))
+
+    def press(self, key):
+        self.calls.append(("press", key))
+
+    def perform(self, action, target, value):
+        self.calls.append(("perform", action, target, value))
+
+
+class FakeClock:
+    """A monotonic clock that only moves when slept on or when a step is slow."""
+
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+def test_plan_resolves_handlers_arguments_and_delays():
+    test = Test("Recorded", steps=[
+        {"type": "mouse_click", "x": 5, "y": 6, "button": "Button.right", "time": 0.5},
+        {"type": "keyboard_press", "key": "Key.enter", "time": 1.25},
+        {"type": "keyboard_press", "key": "a", "time": 1.0},
+        {"action": "type", "target": "#name", "value": "bob"},
+    ])
+    plan = compile_plan(test)
+    assert [step.delay for step in plan.steps] == [0.5, 0.75, 0.0, 0.0]
+
+    assert [step.at for step in plan.steps] == [0.5, 1.25, 1.25, 1.25]
+
+    driver, clock, sleeps = RecordingDriver(), FakeClock(), []
+    Player(driver, speed=2.0, clock=clock, sleep=lambda s: sleeps.append(s) or clock.sleep(s)).execute(plan)
+    assert driver.calls == [("click", 5, 6, "right"), ("press", "enter"), ("press", "a"),
+                            ("perform", "type", "#name", "bob")]
+    assert sleeps == [0.25, 0.375]
+
+
+def test_scheduler_catches_up_after_a_slow_step_and_reports_latency():
+    clock = FakeClock()
+    test = Test("Recorded", steps=[{"action": "a", "time": 1.0}, {"action": "b", "time": 2.0},
+                                   {"action": "c", "time": 3.0}])
+
+    class SlowDriver(RecordingDriver):
+        def perform(self, action, target, value):
+            super().perform(action, target, value)
+            if action == "a":
+                clock.now += 1.5  # overruns the gap to "b"
+
+    report = ReplayScheduler(speed=1.0, clock=clock, sleep=clock.sleep).run(compile_plan(test), SlowDriver())
+    stats = report.to_dict()
+    # "b" starts half a second late, but "c" is back on schedule: no drift accumulates.
+    assert report.latencies == [0.0, 0.5, 0.0]
+    assert stats["drift"] == 0.0 and stats["latency_max"] == 0.5
+
+    clock = FakeClock()
+    fast = ReplayScheduler(speed=0, clock=clock, sleep=clock.sleep).run(compile_plan(test), RecordingDriver())
+    assert fast.actual_duration == 0.0 and fast.to_dict()["recorded_duration"] == 3.0
+
+
+def test_plans_are_cached_per_version_and_recompiled_after_edits(tmp_path, monkeypatch):
+    driver = RecordingDriver()
+    manager = ProjectManager(str(tmp_path / "projects.json"), player=Player(driver, speed=0))
+    project = manager.create_project("P")
+    suite = manager.create_test_suite(project.id, "S")
+    test = manager.create_test(project.id, suite.id, "T")
+    manager.add_step(project.id, suite.id, test.id, {"action": "click", "target": "#a"})
+
+    compiles = []
+    compile_plan_ = player_module.compile_plan
+    monkeypatch.setattr(player_module, "compile_plan", lambda *a: compiles.append(a) or compile_plan_(*a))
+
+    assert len(manager.play_test(project.id, suite.id, test.id, repeat=3)) == 3
+    assert manager.play_test(project.id, suite.id, test.id)[0]["steps"] == 1
+    assert len(compiles) == 1 and len(driver.calls) == 4
+
+    manager.update_step(project.id, suite.id, test.id, 0, {"action": "click", "target": "#b"})
+    manager.play_test(project.id, suite.id, test.id)
+    assert len(compiles) == 2
+    assert driver.calls[-1] == ("perform", "click", "#b", None)
@@ -0,0 +1,44 @@
+import threading
+from types import SimpleNamespace
+from src.core.recorder import Recorder, RingBuffer
+from src.models.test import Test
+
+
+def test_ring_buffer_keeps_order_across_wraparound_and_counts_drops():
+    buffer = RingBuffer(capacity=4)
+    for i in range(3):
+        buffer.push(i, 0)
+    assert buffer.drain() == [0, 1, 2]
+    for i in range(3, 9):
+        buffer.push(i, 0)
+    assert buffer.drain() == [3, 4, 5, 6]
+    assert (buffer.pushed, buffer.dropped) == (7, 2)
+    assert buffer.drain() == []
+
+
+def test_callbacks_only_buffer_and_the_consumer_builds_steps():
+    recorded = []
+    recorder = Recorder(on_step=recorded.append, coalesce=False)
+    test = Test("Typing")
+    recorder.start_recording(test)
+
+    def type_keys(prefix):
+        for i in range(500):
+            recorder._on_key_press(SimpleNamespace(char=f"{prefix}{i}"))
+    typists = [threading.Thread(target=type_keys, args=(prefix,)) for prefix in "ab"]
+    for typist in typists:
+        typist.start()
+    recorder._on_key_press("Key.enter")
+    for typist in typists:
+        typist.join()
+    recorder._on_mouse_click(5, 6, "Button.left", True)
+    recorder.stop_recording()
+
+    keys = [step["key"] for step in test.steps if step["type"] == "keyboard_press"]
+    assert len(test.steps) == 1002 and list(test.steps) == recorded
+    assert [k for k in keys if k.startswith("a")] == [f"a{i}" for i in range(500)]
+    assert "Key.enter" in keys and test.steps[-1]["type"] == "mouse_click"
+    times = [step["time"] for step in test.steps]
+    assert times == sorted(times)
+    stats = recorder.stats()
+    assert stats["captured"] == 1002 and stats["dropped"] == 0 and stats["callback_latency_max_us"] > 0
@@ -0,0 +1,48 @@
+from src.models.step import Step, StepColumns
+from src.models.test import Test
+
+
+RECORDED = [
+    {"type": "mouse_click", "x": 10, "y": 20.5, "button": "Button.left", "time": 0.25},
+    {"type": "keyboard_press", "key": "a", "time": 1.5},
+    {"action": "click", "target": "#submit", "value": None, "timeout": 3},
+]
+
+
+def test_step_round_trips_dicts():
+    for data in RECORDED:
+        assert Step.from_dict(data).to_dict() == data
+    assert not hasattr(Step("x"), '__dict__')
+
+
+def test_absent_step_fields_read_as_none():
+    step = Step("x")
+    assert step.duration is None and step.get("duration", 0) == 0 and step.to_dict() == {"description": "x"}
+    step.result = None
+    assert step.has("result") and step.to_dict() == {"description": "x", "result": None}
+
+
+def test_step_columns_behaves_like_a_list():
+    steps = StepColumns(RECORDED)
+    assert steps == RECORDED
+    assert isinstance(steps[0]["x"], int) and isinstance(steps[0]["y"], float)
+
+    steps.insert(1, {"type": "keyboard_press", "key": "b", "time": 1.0})
+    steps[0] = {"type": "mouse_click", "x": 1, "y": 2, "button": "Button.right", "time": 0.1}
+    del steps[2]
+    assert [s.get("key") for s in steps] == [None, "b", None]
+    assert steps[-1] == RECORDED[2]
+    assert steps.step(1).key == "b"
+
+
+def test_long_step_lists_load_columnar():
+    data = {"id": "t1", "name": "Long", "steps": RECORDED * 400}
+    test = Test.from_dict(data)
+    assert isinstance(test.steps, StepColumns)
+    assert test.to_dict() == {**data, "result": None, "depends_on": []}
+
+
+def test_step_columns_keep_ints_a_double_cannot_hold():
+    big = {"type": "custom", "time": 2 ** 60 + 1, "x": 10 ** 400}
+    steps = StepColumns([big, {"time": 3}])
+    assert steps[0] == big and steps[1] == {"time": 3}
@@ -0,0 +1 @@
+# tests/utils/__init__.py
\ No newline at end of file
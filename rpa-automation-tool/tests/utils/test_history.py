@@ -0,0 +1,82 @@
+import json
+import os
+import src.app
+from src.app import app
+from src.core.runner import TestResult
+from src.utils.history import RunHistory, parse_time
+from src.utils.project_manager import ProjectManager
+
+DAY1 = parse_time("2026-03-01T10:00:00")
+DAY2 = parse_time("2026-03-02T10:00:00")
+
+
+def results(*outcomes, duration=1.0):
+    return [TestResult(f"t{i}", f"Test {i}", "s1", outcome, duration=duration) for i, outcome in enumerate(outcomes)]
+
+
+def test_rollups_cover_pass_rate_durations_and_flakiness(tmp_path):
+    history = RunHistory(str(tmp_path))
+    history.append("p1", results("Passed", "Passed"), at=DAY1)
+    history.append("p1", results("Failed", "Passed", duration=3.0), at=DAY1 + 60)
+    history.append("p1", results("Passed", "Skipped"), at=DAY2)
+
+    assert sorted(os.listdir(tmp_path / "p1")) == [
+        "2026-03-01.jsonl", "2026-03-01.rollup.json", "2026-03-02.jsonl", "2026-03-02.rollup.json"]
+    stats = {s['test_id']: s for s in history.stats("p1")}
+    assert stats["t0"]["pass_rate"] == 2 / 3 and stats["t0"]["flakiness"] == 1.0
+    assert stats["t0"]["mean_duration"] == 5 / 3 and stats["t0"]["p95_duration"] == 3.0
+    assert stats["t1"]["skipped"] == 1 and stats["t1"]["flakiness"] == 0.0 and stats["t1"]["last_result"] == "Passed"
+
+    # A range ending mid-day only counts the runs inside it.
+    first = {s['test_id']: s for s in history.stats("p1", DAY1, DAY1 + 30)}
+    assert first["t0"]["runs"] == 1 and first["t0"]["pass_rate"] == 1.0
+    assert [r['result'] for r in history.runs("p1", test_id="t0")] == ["Passed", "Failed", "Passed"]
+    assert len(history.runs("p1", end=DAY2, limit=3)) == 3
+
+
+def test_stale_rollups_are_rebuilt_from_the_segment(tmp_path):
+    history = RunHistory(str(tmp_path))
+    history.append("p1", results("Passed"), at=DAY1)
+    # As if the process died after appending to the segment but before saving the rollup.
+    with open(tmp_path / "p1" / "2026-03-01.jsonl", "a") as f:
+        f.write(json.dumps({'at': DAY1 + 1, 'test_id': "t0", 'suite_id': "s1", 'name': "Test 0",
+                            'result': "Failed", 'duration': 2.0, 'error': None}) + "\n")
+        f.write('{"at": ')
+    assert history.stats("p1")[0]["failed"] == 1
+
+
+def test_rollups_stay_small_as_runs_accumulate(tmp_path):
+    history = RunHistory(str(tmp_path))
+    for i in range(200):
+        history.append("p1", results("Passed", duration=1.0 + i % 2), at=DAY1 + i)
+    with open(tmp_path / "p1" / "2026-03-01.rollup.json") as f:
+        durations = json.load(f)['tests']['t0']['durations']
+    assert durations['count'] == 200 and len(durations['buckets']) == 2
+    stats = history.stats("p1")[0]
+    assert stats["mean_duration"] == 1.5 and stats["p95_duration"] == 2.0
+
+    # Rollups saved before durations were summarised are rebuilt.
+    with open(tmp_path / "p1" / "2026-03-01.rollup.json", "w") as f:
+        json.dump({'size': os.path.getsize(tmp_path / "p1" / "2026-03-01.jsonl"), 'tests': {}}, f)
+    assert history.stats("p1")[0]["runs"] == 200
+
+
+def test_runs_are_recorded_and_queryable_over_the_api(tmp_path, monkeypatch):
+    history = RunHistory(str(tmp_path / "history"))
+    manager = ProjectManager(str(tmp_path / "projects.json"), run_history=history)
+    monkeypatch.setattr(src.app, "project_manager", manager)
+    monkeypatch.setattr(src.app, "run_history", history)
+    project = manager.create_project("Nightly")
+    suite = manager.create_test_suite(project.id, "Suite")
+    manager.create_test(project.id, suite.id, "Login")
+    manager.run_all_tests(project.id)
+    manager.run_all_tests(project.id)
+    assert "history" not in project.to_dict()
+
+    client = app.test_client()
+    stats = client.get(f'/api/projects/{project.id}/history/stats?from=2000-01-01').get_json()
+    assert [(s['name'], s['runs'], s['pass_rate']) for s in stats] == [("Login", 2, 1.0)]
+    assert len(client.get(f'/api/projects/{project.id}/history?limit=1').get_json()) == 1
+    assert client.get(f'/api/projects/{project.id}/history?from=tomorrow').status_code == 400
+    assert client.get(f'/api/projects/{project.id}/history?from=2026-03-02&to=2026-03-01').status_code == 400
+    assert client.get(f'/api/projects/{project.id}/history?from=2000-01-01&to=2000-01-02').get_json() == []
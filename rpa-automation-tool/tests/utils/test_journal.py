@@ -0,0 +1,91 @@
+import json
+import os
+from src.utils.project_manager import ProjectManager
+
+
+def test_journal_replays_mutations(tmp_path):
+    filepath = str(tmp_path / "projects.json")
+    manager = ProjectManager(filepath, journaled=True)
+    project = manager.create_project("Journaled Project")
+    suite = manager.create_test_suite(project.id, "Suite")
+    test = manager.create_test(project.id, suite.id, "Test")
+    manager.add_step(project.id, suite.id, test.id, {"action": "click", "target": "#a"})
+    manager.add_step(project.id, suite.id, test.id, {"action": "click", "target": "#b"})
+    manager.update_step(project.id, suite.id, test.id, 0, {"action": "type", "target": "#c"})
+    manager.delete_step(project.id, suite.id, test.id, 1)
+    manager.close()
+
+    # Mutations only touch the log, never the JSON store
+    assert not os.path.exists(filepath)
+    with open(filepath + ".journal") as f:
+        assert len(f.readlines()) == 7
+
+    reloaded = ProjectManager(filepath, journaled=True)
+    steps = reloaded.get_test_steps(project.id, suite.id, test.id)
+    assert steps == [{"action": "type", "target": "#c"}]
+    reloaded.close()
+
+
+def test_journal_compaction(tmp_path):
+    filepath = str(tmp_path / "projects.json")
+    manager = ProjectManager(filepath, journaled=True, compact_threshold=5)
+    project = manager.create_project("Compacted Project")
+    suite = manager.create_test_suite(project.id, "Suite")
+    test = manager.create_test(project.id, suite.id, "Test")
+    for i in range(10):
+        manager.add_step(project.id, suite.id, test.id, {"action": "click", "target": f"#{i}"})
+    manager.storage.wait_for_compaction()
+    manager.close()
+
+    with open(filepath + ".snapshot") as f:
+        snapshot = json.load(f)
+    assert snapshot["seq"] >= 5
+    assert not os.path.exists(filepath + ".journal.old")
+
+    reloaded = ProjectManager(filepath, journaled=True)
+    steps = reloaded.get_test_steps(project.id, suite.id, test.id)
+    assert [s["target"] for s in steps] == [f"#{i}" for i in range(10)]
+    reloaded.close()
+
+
+def test_journal_imports_json_store(tmp_path):
+    filepath = str(tmp_path / "projects.json")
+    manager = ProjectManager(filepath)
+    project = manager.create_project("Plain Project")
+
+    journaled = ProjectManager(filepath, journaled=True)
+    assert journaled.get_project(project.id).name == "Plain Project"
+    journaled.close()
+
+
+def test_failed_compaction_is_retried_before_the_log_rotates_again(tmp_path, monkeypatch):
+    filepath = str(tmp_path / "projects.json")
+    manager = ProjectManager(filepath, journaled=True, compact_threshold=5)
+    journal = manager.storage
+    write_snapshot = journal._write_snapshot
+    failures = []
+
+    def fails_once(*args):
+        if not failures:
+            failures.append(True)
+            raise OSError("disk full")
+        write_snapshot(*args)
+    monkeypatch.setattr(journal, "_write_snapshot", fails_once)
+
+    project = manager.create_project("Compacted Project")
+    suite = manager.create_test_suite(project.id, "Suite")
+    test = manager.create_test(project.id, suite.id, "Test")
+    for i in range(2):
+        manager.add_step(project.id, suite.id, test.id, {"action": "click", "target": f"#{i}"})
+    journal.wait_for_compaction()
+    assert failures and os.path.exists(filepath + ".journal.old")
+    for i in range(2, 12):
+        manager.add_step(project.id, suite.id, test.id, {"action": "click", "target": f"#{i}"})
+        journal.wait_for_compaction()
+    manager.close()
+    assert not os.path.exists(filepath + ".journal.old")
+
+    reloaded = ProjectManager(filepath, journaled=True)
+    steps = reloaded.get_test_steps(project.id, suite.id, test.id)
+    assert [s["target"] for s in steps] == [f"#{i}" for i in range(12)]
+    reloaded.close()
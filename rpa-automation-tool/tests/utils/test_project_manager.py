@@ -0,0 +1,25 @@
+from src.utils.project_manager import ProjectManager
+
+
+def test_indexes_follow_create_delete_and_load(tmp_path):
+    filepath = str(tmp_path / "projects.json")
+    manager = ProjectManager(filepath)
+    project = manager.create_project("Indexed Project")
+    suite = manager.create_test_suite(project.id, "Suite")
+    test = manager.create_test(project.id, suite.id, "Test")
+
+    assert manager.get_project(project.id) is project
+    assert manager.get_test_suite(project.id, suite.id) is suite
+    assert manager.get_test_from_suite(project.id, suite.id, test.id) is test
+    # Lookups must not match across parents
+    other = manager.create_project("Other Project")
+    assert manager.get_test_suite(other.id, suite.id) is None
+
+    reloaded = ProjectManager(filepath)
+    assert reloaded.get_test_from_suite(project.id, suite.id, test.id).name == "Test"
+
+    manager.delete_test_suite(project.id, suite.id)
+    assert manager.get_test_suite(project.id, suite.id) is None
+    assert manager.get_test_from_suite(project.id, suite.id, test.id) is None
+    manager.delete_project(project.id)
+    assert manager.get_project(project.id) is None
@@ -0,0 +1,146 @@
+import threading
+import time
+from src.core import runner as runner_module
+from src.core.runner import Runner
+from src.utils.project_manager import ProjectManager
+from src.utils.result_cache import ResultCache
+
+
+def make_project(manager, suites=3, tests=4):
+    project = manager.create_project("Nightly")
+    for s in range(suites):
+        suite = manager.create_test_suite(project.id, f"Suite {s}")
+        for t in range(tests):
+            test = manager.create_test(project.id, suite.id, f"Test {s}.{t}")
+            manager.add_step(project.id, suite.id, test.id, {"action": "click", "target": f"#{s}-{t}"})
+    return project
+
+
+def test_parallel_run_keeps_declaration_order(tmp_path, monkeypatch):
+    manager = ProjectManager(str(tmp_path / "projects.json"))
+    project = make_project(manager)
+    threads = set()
+
+    def slow_step(step):
+        threads.add(threading.get_ident())
+        # Later tests finish first, so completion order is the reverse of declaration order.
+        time.sleep(0.02 / (1 + int(step['target'][-1])))
+        return "Failed" if step['target'] == "#1-2" else "Passed"
+    monkeypatch.setattr(runner_module, "run_step", slow_step)
+
+    results = manager.run_all_tests(project.id, max_workers=4)
+    expected = [(s.id, t.id) for s in project.test_suites for t in s.tests]
+    assert [(r['suite_id'], r['test_id']) for r in results] == expected
+    assert len(threads) > 1
+    assert [r['name'] for r in results if r['result'] == "Failed"] == ["Test 1.2"]
+    suite = project.test_suites[1]
+    assert [t.result for t in suite.tests] == ["Passed", "Passed", "Failed", "Passed"]
+
+    reloaded = ProjectManager(str(tmp_path / "projects.json"))
+    assert reloaded.get_test_suite(project.id, suite.id).tests[2].result == "Failed"
+
+
+def test_process_backend_runs_suite(tmp_path):
+    manager = ProjectManager(str(tmp_path / "projects.json"), runner=Runner(2, "process"))
+    project = make_project(manager, suites=1, tests=3)
+    suite = project.test_suites[0]
+    results = manager.run_suite_tests(project.id, suite.id)
+    assert [r['test_id'] for r in results] == [t.id for t in suite.tests]
+    assert all(r['result'] == "Passed" and r['step_results'] == ["Passed"] for r in results)
+
+
+def make_dependent_suite(manager):
+    project = manager.create_project("Checkout")
+    suite = manager.create_test_suite(project.id, "Flow")
+    login = manager.create_test(project.id, suite.id, "login")
+    seed = manager.create_test(project.id, suite.id, "seed", depends_on=[login.id])
+    cart = manager.create_test(project.id, suite.id, "cart", depends_on=[login.id])
+    pay = manager.create_test(project.id, suite.id, "pay", depends_on=[seed.id, cart.id])
+    other = manager.create_test(project.id, suite.id, "other")
+    for test in (login, seed, cart, pay, other):
+        manager.add_step(project.id, suite.id, test.id, {"action": "click", "target": test.name})
+    return project, suite
+
+
+def test_dependents_wait_for_and_are_skipped_after_failed_dependencies(tmp_path, monkeypatch):
+    manager = ProjectManager(str(tmp_path / "projects.json"))
+    project, suite = make_dependent_suite(manager)
+    started = []
+
+    def step(step):
+        started.append(step['target'])
+        return "Failed" if step['target'] == "cart" else "Passed"
+    monkeypatch.setattr(runner_module, "run_step", step)
+
+    results = manager.run_suite_tests(project.id, suite.id, max_workers=3)
+    assert [(r['name'], r['result']) for r in results] == [
+        ("login", "Passed"), ("seed", "Passed"), ("cart", "Failed"), ("pay", "Skipped"), ("other", "Passed")]
+    assert "pay" not in started and started.index("login") < min(started.index("seed"), started.index("cart"))
+    assert "cart" in results[3]['error']
+
+    started.clear()
+    results = manager.run_suite_tests(project.id, suite.id, fail_fast=True)
+    assert [r['result'] for r in results] == ["Passed", "Passed", "Failed", "Skipped", "Skipped"]
+    assert started == ["login", "seed", "cart"]
+
+
+def test_dependencies_are_validated_and_persisted(tmp_path):
+    manager = ProjectManager(str(tmp_path / "projects.json"), journaled=True)
+    project, suite = make_dependent_suite(manager)
+    login, seed = suite.tests[0], suite.tests[1]
+    try:
+        manager.update_test(project.id, suite.id, login.id, "login", depends_on=[seed.id])
+    except runner_module.DependencyError as e:
+        assert "cycle" in str(e)
+    else:
+        raise AssertionError("cycle was accepted")
+    assert login.depends_on == []
+
+    manager.update_test(project.id, suite.id, seed.id, "seed", depends_on=[])
+    manager.close()
+    reloaded = ProjectManager(str(tmp_path / "projects.json"), journaled=True)
+    tests = reloaded.get_test_suite(project.id, suite.id).tests
+    assert tests[1].depends_on == [] and tests[3].depends_on == [tests[1].id, tests[2].id]
+
+    # Deleting a test removes it from its dependents.
+    seed_id, cart_id = tests[1].id, tests[2].id
+    reloaded.delete_test(project.id, suite.id, seed_id)
+    reloaded.close()
+    again = ProjectManager(str(tmp_path / "projects.json"), journaled=True)
+    assert again.get_test_suite(project.id, suite.id).tests[2].depends_on == [cart_id]
+
+
+def test_incremental_runs_reuse_passing_results_of_unchanged_tests(tmp_path, monkeypatch):
+    env_dir = tmp_path / "projects"
+    cache = ResultCache(str(tmp_path / "results.json"), ttl=60, environments_dir=str(env_dir))
+    manager = ProjectManager(str(tmp_path / "projects.json"), result_cache=cache)
+    project, suite = make_dependent_suite(manager)
+    ran = []
+    monkeypatch.setattr(runner_module, "run_step", lambda step: ran.append(step['target']) or "Passed")
+
+    # Plain runs fill the cache too.
+    manager.run_suite_tests(project.id, suite.id)
+    assert len(ran) == 5
+    ran.clear()
+    manager.update_step(project.id, suite.id, suite.tests[0].id, 0, {"action": "click", "target": "login2"})
+    results = manager.run_suite_tests(project.id, suite.id, incremental=True)
+    # login changed, so everything depending on it runs again; "other" is a cache hit.
+    assert ran == ["login2", "seed", "cart", "pay"]
+    assert [r['cached'] for r in results] == [False, False, False, False, True]
+
+    # A hit is stored as the test's result.
+    suite.tests[4].result = None
+    manager.run_suite_tests(project.id, suite.id, incremental=True)
+    assert suite.tests[4].result == "Passed"
+
+    ran.clear()
+    reloaded = ResultCache(str(tmp_path / "results.json"), ttl=60, environments_dir=str(env_dir))
+    manager.result_cache = reloaded
+    assert all(r['cached'] for r in manager.run_suite_tests(project.id, suite.id, incremental=True))
+    assert len(manager.run_suite_tests(project.id, suite.id, incremental=True, force=True)) == 5 and len(ran) == 5
+
+    ran.clear()
+    (env_dir / project.id).mkdir(parents=True)
+    (env_dir / project.id / "environment.json").write_text('{"base_url": "https://staging.example.com"}')
+    manager.run_suite_tests(project.id, suite.id, incremental=True)
+    assert len(ran) == 5
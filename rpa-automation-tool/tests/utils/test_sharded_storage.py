@@ -0,0 +1,106 @@
+import os
+from src.core.event_log import EventLog
+from src.utils.project_manager import ProjectManager
+from src.utils.sharded_storage import ShardedStorage
+
+
+def test_sharded_layout_and_lazy_loading(tmp_path):
+    root = str(tmp_path / "projects")
+    manager = ProjectManager(storage=ShardedStorage(root))
+    project = manager.create_project("Sharded Project")
+    suite = manager.create_test_suite(project.id, "Suite")
+    test = manager.create_test(project.id, suite.id, "Test")
+    manager.add_step(project.id, suite.id, test.id, {"action": "click", "target": "#a"})
+
+    assert os.path.exists(os.path.join(root, "manifest.json"))
+    assert os.path.exists(os.path.join(root, project.id, "suites", f"{suite.id}.json"))
+
+    storage = ShardedStorage(root)
+    reloaded = ProjectManager(storage=storage)
+    lazy = reloaded.get_project(project.id)
+    # Only the manifest is read at startup
+    assert not storage.is_loaded(lazy)
+    steps = reloaded.get_test_steps(project.id, suite.id, test.id)
+    assert steps == [{"action": "click", "target": "#a"}]
+    assert storage.is_loaded(lazy)
+
+
+def test_sharded_evicts_least_recently_used(tmp_path):
+    root = str(tmp_path / "projects")
+    manager = ProjectManager(storage=ShardedStorage(root))
+    ids = []
+    for i in range(3):
+        project = manager.create_project(f"Project {i}")
+        suite = manager.create_test_suite(project.id, "Suite")
+        ids.append((project.id, suite.id))
+
+    storage = ShardedStorage(root, max_loaded_projects=2)
+    reloaded = ProjectManager(storage=storage)
+    for project_id, suite_id in ids:
+        assert reloaded.get_test_suite(project_id, suite_id).name == "Suite"
+    first = reloaded.get_project(ids[0][0])
+    assert not storage.is_loaded(first)
+    # An evicted project reloads transparently, and its edits still persist
+    reloaded.create_test(ids[0][0], ids[0][1], "Late Test")
+    again = ProjectManager(storage=ShardedStorage(root))
+    assert [t.name for t in again.get_all_tests(*ids[0])] == ["Late Test"]
+
+
+def test_projects_in_use_are_not_evicted(tmp_path):
+    root = str(tmp_path / "projects")
+    manager = ProjectManager(storage=ShardedStorage(root))
+    ids = []
+    for i in range(2):
+        project = manager.create_project(f"Project {i}")
+        suite = manager.create_test_suite(project.id, "Suite")
+        ids.append((project.id, suite.id, manager.create_test(project.id, suite.id, "Test").id))
+
+    storage = ShardedStorage(root, max_loaded_projects=1)
+    reloaded = ProjectManager(storage=storage)
+    (p0, s0, t0), (p1, s1, _) = ids
+    with reloaded._writing(p0):
+        test = reloaded._find_test(p0, s0, t0)
+        # Loading another project while P0 is being edited must not detach P0's objects.
+        assert reloaded.get_test_suite(p1, s1).name == "Suite"
+        test.name = "Renamed"
+        reloaded._record('update_test', project_id=p0, suite_id=s0, test_id=t0, name="Renamed")
+    assert storage.is_loaded(reloaded.get_project(p0))
+    again = ProjectManager(storage=ShardedStorage(root))
+    assert again.get_test_from_suite(p0, s0, t0).name == "Renamed"
+
+
+def test_created_projects_count_toward_the_cap(tmp_path):
+    root = str(tmp_path / "projects")
+    storage = ShardedStorage(root, max_loaded_projects=1)
+    manager = ProjectManager(storage=storage)
+    projects = [manager.create_project(f"Project {i}") for i in range(5)]
+    assert [storage.is_loaded(p) for p in projects] == [False, False, False, False, True]
+
+    suite = manager.create_test_suite(projects[0].id, "Suite")
+    assert list(storage._loaded) == [projects[0].id]
+    assert ProjectManager(storage=ShardedStorage(root)).get_test_suite(projects[0].id, suite.id).name == "Suite"
+
+
+def test_recordings_of_unloaded_projects_are_recovered(tmp_path):
+    root = str(tmp_path / "projects")
+    manager = ProjectManager(storage=ShardedStorage(root))
+    tests = []
+    for i in range(2):
+        project = manager.create_project(f"Project {i}")
+        suite = manager.create_test_suite(project.id, "Suite")
+        tests.append((project.id, suite.id, manager.create_test(project.id, suite.id, "Test").id))
+    recordings = tmp_path / "recordings"
+    recordings.mkdir()
+    for i, (project_id, suite_id, test_id) in enumerate(tests):
+        log = EventLog(str(recordings / f"{test_id}.rec"))
+        # An upload session knows where its test lives; a local recording only knows the test.
+        log.write_meta(**({'project_id': project_id, 'suite_id': suite_id} if i else {}), test_id=test_id)
+        log.append({"type": "custom", "action": "wait", "value": i})
+        log.close(finished=False)
+
+    storage = ShardedStorage(root)
+    reloaded = ProjectManager(storage=storage)
+    assert not any(storage.is_loaded(project) for project in reloaded.projects)
+    assert reloaded.recover_recordings(str(recordings)) == sorted(test_id for _, _, test_id in tests)
+    for i, (project_id, suite_id, test_id) in enumerate(tests):
+        assert reloaded.get_test_steps(project_id, suite_id, test_id) == [{"type": "custom", "action": "wait", "value": i}]
@@ -0,0 +1,44 @@
+from src.utils.project_manager import ProjectManager
+from src.utils.sqlite_storage import SqliteStorage
+
+
+def test_sqlite_row_level_round_trip(tmp_path):
+    db_path = str(tmp_path / "projects.db")
+    manager = ProjectManager(storage=SqliteStorage(db_path))
+    project = manager.create_project("SQLite Project", "stored in rows")
+    suite = manager.create_test_suite(project.id, "Suite")
+    test = manager.create_test(project.id, suite.id, "Test")
+    for target in ("#a", "#b", "#c"):
+        manager.add_step(project.id, suite.id, test.id, {"action": "click", "target": target})
+    manager.delete_step(project.id, suite.id, test.id, 0)
+    manager.update_step(project.id, suite.id, test.id, 1, {"action": "type", "target": "#d"})
+
+    storage = SqliteStorage(db_path)
+    assert [s["target"] for s in storage.load_steps(test.id)] == ["#b", "#d"]
+    loaded = storage.load_project(project.id)
+    assert loaded.description == "stored in rows"
+    assert loaded.test_suites[0].tests[0].name == "Test"
+
+
+def test_sqlite_shared_between_managers(tmp_path):
+    db_path = str(tmp_path / "projects.db")
+    # Two managers stand in for two Flask worker processes
+    worker_a = ProjectManager(storage=SqliteStorage(db_path))
+    worker_b = ProjectManager(storage=SqliteStorage(db_path))
+
+    project = worker_a.create_project("Shared Project")
+    assert worker_b.get_project(project.id).name == "Shared Project"
+
+    worker_b.create_test_suite(project.id, "Added by B")
+    assert [s.name for s in worker_a.get_project(project.id).test_suites] == ["Added by B"]
+
+    worker_a.delete_project(project.id)
+    assert worker_b.get_project(project.id) is None
+
+
+def test_sqlite_imports_json_store(tmp_path):
+    json_path = str(tmp_path / "projects.json")
+    project = ProjectManager(json_path).create_project("From JSON")
+
+    manager = ProjectManager(storage=SqliteStorage(str(tmp_path / "projects.db"), import_path=json_path))
+    assert manager.get_project(project.id).name == "From JSON"
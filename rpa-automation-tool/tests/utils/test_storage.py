@@ -0,0 +1,69 @@
+import json
+import os
+from src.utils import data
+from src.utils.project_manager import ProjectManager
+from src.utils.storage import JsonStorage
+
+
+def test_write_behind_coalesces_saves(tmp_path, monkeypatch):
+    filepath = str(tmp_path / "projects.json")
+    writes = []
+    save_projects = data.save_projects
+
+    def counting_save(projects, path, serialize=None):
+        writes.append(path)
+        save_projects(projects, path, serialize)
+    monkeypatch.setattr("src.utils.storage.save_projects", counting_save)
+
+    manager = ProjectManager(storage=JsonStorage(filepath, write_behind=True, coalesce_window=60))
+    project = manager.create_project("Bursty Project")
+    suite = manager.create_test_suite(project.id, "Suite")
+    test = manager.create_test(project.id, suite.id, "Test")
+    for i in range(20):
+        manager.add_step(project.id, suite.id, test.id, {"action": "click", "target": f"#{i}"})
+    # Nothing has been written on the request path yet
+    assert writes == []
+
+    manager.flush()
+    assert len(writes) == 1
+    with open(filepath) as f:
+        assert len(json.load(f)[0]["test_suites"][0]["tests"][0]["steps"]) == 20
+    manager.close()
+
+
+def test_failed_write_keeps_previous_file(tmp_path, monkeypatch):
+    filepath = str(tmp_path / "projects.json")
+    manager = ProjectManager(filepath)
+    manager.create_project("Safe Project")
+
+    def crash(*args, **kwargs):
+        raise OSError("disk full")
+    monkeypatch.setattr(os, "fsync", crash)
+    try:
+        manager.create_project("Lost Project")
+    except OSError:
+        pass
+
+    with open(filepath) as f:
+        assert [p["name"] for p in json.load(f)] == ["Safe Project"]
+
+
+def test_streaming_save_and_load_match_json_module(tmp_path):
+    filepath = str(tmp_path / "projects.json")
+    manager = ProjectManager(storage=JsonStorage(filepath))
+    for i in range(3):
+        project = manager.create_project(f"Project {i}", "multi\nline \"desc\"")
+        suite = manager.create_test_suite(project.id, "Suite")
+        test = manager.create_test(project.id, suite.id, "Test")
+        manager.add_step(project.id, suite.id, test.id, {"action": "type", "value": "ü ] , ["})
+
+    with open(filepath) as f:
+        text = f.read()
+    assert text == json.dumps(json.loads(text), indent=4)
+
+    # A tiny chunk size forces every project to straddle several reads.
+    loaded = list(data.iter_projects(filepath, chunk_size=7))
+    assert [p.to_dict() for p in loaded] == json.loads(text)
+
+    data.save_projects([], filepath)
+    assert data.load_projects(filepath) == []